@@ -254,10 +254,14 @@ cat = CatBoostClassifier(**best_cat_params)
 xgb = XGBClassifier(**best_xgb_params)
 
 # 개별 모델 성능 확인 (Cross Validation)
-models = [('LGBM', lgbm), ('CatBoost', cat), ('XGBoost', xgb)]
-for name, model in models:
-    scores = cross_val_score(model, X, y, cv=kfold, scoring='accuracy')
-    print(f"{name} CV Accuracy: {scores.mean():.4f}")
+# 각 모델을 fold마다 한 번씩만 학습(모델 x fold 병렬)하고 OOF 확률을 캐시에 저장
+from ensemble_cv import compute_oof, evaluate_ensembles, optimize_weights, fit_full, predict_proba_all, soft_vote, hard_vote
+
+models = {'lgbm': lgbm, 'cat': cat, 'xgb': xgb}
+oof = compute_oof(models, X, y, cv=kfold, n_jobs=-1, cache_path='oof_cache.npz')
+for name in oof.names:
+    acc = (oof.classes[oof.proba[name].argmax(axis=1)] == y.values).mean()
+    print(f"{name} CV Accuracy: {acc:.4f} (fit {oof.fit_times[name]:.1f}s)")
 """))
 
 nb.cells.append(nbf.v4.new_markdown_cell("""
@@ -267,29 +271,13 @@ Soft Voting 및 Hard Voting 방식을 사용하여 예측 성능을 극대화합
 """))
 
 nb.cells.append(nbf.v4.new_code_cell("""
-# Soft Voting Ensemble
-voting_soft = VotingClassifier(
-    estimators=[
-        ('lgbm', lgbm), 
-        ('cat', cat), 
-        ('xgb', xgb)
-    ],
-    voting='soft'
-)
-
-# Hard Voting Ensemble
-voting_hard = VotingClassifier(
-    estimators=[
-        ('lgbm', lgbm), 
-        ('cat', cat), 
-        ('xgb', xgb)
-    ],
-    voting='hard'
-)
-
-# 앙상블 모델 학습 및 평가
-voting_soft.fit(X, y)
-voting_hard.fit(X, y)
+# OOF 캐시만으로 Hard / Soft / Weighted Soft Voting 비교 (재학습 없음)
+best_weights, best_score = optimize_weights(oof, y)
+print("최적 가중치:", best_weights, f"(OOF Accuracy: {best_score:.4f})")
+print(evaluate_ensembles(oof, y, weights=best_weights))
+
+# 최종 모델: 각 베이스 모델을 전체 데이터로 한 번만 학습
+fitted = fit_full(models, X, y, n_jobs=-1)
 
 print("모델 학습 완료")
 """))
@@ -303,9 +291,10 @@ nb.cells.append(nbf.v4.new_markdown_cell("""
 """))
 
 nb.cells.append(nbf.v4.new_code_cell("""
-# 예측 수행
-pred_soft = voting_soft.predict(test_X)
-pred_hard = voting_hard.predict(test_X)
+# 예측 수행 (베이스 모델 확률을 한 번만 계산해서 Soft / Hard Voting 모두에 사용)
+test_proba = predict_proba_all(fitted, test_X)
+pred_soft = soft_vote(test_proba, weights=best_weights)
+pred_hard = hard_vote(test_proba)
 
 # 제출 파일 생성
 submission = pd.read_csv('./data/sample_submission.csv')
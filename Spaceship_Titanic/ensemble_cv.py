@@ -0,0 +1,228 @@
+"""
+Out-of-fold (OOF) ensemble evaluation with a shared fold cache.
+
+Every base model is fitted exactly once per fold, in parallel across models and
+folds, and its out-of-fold probabilities are cached. Hard, soft and weighted
+soft voting (plus a weight search) are then scored purely from that cache, so
+comparing ensemble variants costs no extra training.
+
+Usage (from the presentation notebook):
+
+    from ensemble_cv import compute_oof, evaluate_ensembles, optimize_weights
+
+    oof = compute_oof({'lgbm': lgbm, 'cat': cat, 'xgb': xgb}, X, y, cv=kfold,
+                      cache_path='oof_cache.npz')
+    print(evaluate_ensembles(oof, y))
+    weights, score = optimize_weights(oof, y)
+"""
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.utils import _safe_indexing
+
+
+class OOFCache:
+    """Out-of-fold class probabilities for a set of named base models."""
+
+    def __init__(self, proba, classes, folds, fit_times, key):
+        self.proba = proba            # name -> (n_samples, n_classes) array
+        self.classes = classes        # sorted class labels
+        self.folds = folds            # fold id per sample
+        self.fit_times = fit_times    # name -> total fit seconds over all folds
+        self.key = key                # fingerprint of (models, X, y, folds)
+
+    @property
+    def names(self):
+        return list(self.proba)
+
+    def save(self, path):
+        arrays = {f"proba__{name}": p for name, p in self.proba.items()}
+        np.savez_compressed(
+            path,
+            classes=self.classes,
+            folds=self.folds,
+            fit_names=np.array(list(self.fit_times), dtype=str),
+            fit_times=np.array(list(self.fit_times.values()), dtype=float),
+            key=np.array(self.key),
+            **arrays,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            proba = {k[len("proba__"):]: data[k] for k in data.files if k.startswith("proba__")}
+            fit_times = dict(zip(data["fit_names"].tolist(), data["fit_times"].tolist()))
+            return cls(proba, data["classes"], data["folds"], fit_times, str(data["key"]))
+
+
+def _fingerprint(models, X, y, folds):
+    h = hashlib.sha256()
+    for name, model in models.items():
+        h.update(name.encode())
+        h.update(repr(sorted(model.get_params(deep=False).items(), key=lambda kv: kv[0])).encode())
+    # Features too, so a feature-engineering change never reuses stale probabilities
+    if isinstance(X, pd.DataFrame):
+        h.update(repr(list(X.columns)).encode())
+        h.update(pd.util.hash_pandas_object(X, index=True).values.tobytes())
+    else:
+        X = np.ascontiguousarray(X)
+        h.update(repr((X.shape, X.dtype.str)).encode())
+        h.update(X.tobytes())
+    h.update(np.asarray(y).tobytes())
+    h.update(np.asarray(folds).tobytes())
+    return h.hexdigest()
+
+
+def _single_threaded(model):
+    """Clone of ``model`` limited to one thread, for running many fits side by side."""
+    est = clone(model)
+    # n_jobs=None (sklearn, LightGBM, XGBoost) follows OMP_NUM_THREADS, which _parallel sets to 1;
+    # an explicit n_jobs and CatBoost's thread_count (all cores by default) do not
+    if est.get_params(deep=False).get("n_jobs") not in (None, 1):
+        est.set_params(n_jobs=1)
+    if type(est).__module__.startswith("catboost"):
+        est.set_params(thread_count=1)
+    return est
+
+
+def _parallel(n_jobs):
+    # Worker processes are capped at one BLAS/OpenMP thread each
+    return Parallel(n_jobs=n_jobs, backend="loky", inner_max_num_threads=1)
+
+
+def _fit_fold(name, model, X, y, train_idx, valid_idx):
+    est = _single_threaded(model)
+    start = time.perf_counter()
+    est.fit(_safe_indexing(X, train_idx), _safe_indexing(y, train_idx))
+    elapsed = time.perf_counter() - start
+    proba = est.predict_proba(_safe_indexing(X, valid_idx))
+    return name, valid_idx, est.classes_, proba, elapsed
+
+
+def compute_oof(models, X, y, cv, n_jobs=-1, cache_path=None):
+    """Fit each model once per fold and collect out-of-fold probabilities.
+
+    ``models`` is a dict (or list of ``(name, estimator)`` pairs). The folds are
+    materialised once and shared by every model. If ``cache_path`` points to a
+    cache built from the same models, features, target and folds it is reused
+    as-is. Fits run side by side with one thread each.
+    """
+    models = dict(models)
+    y = np.asarray(y)
+    splits = list(cv.split(X, y))
+    folds = np.empty(len(y), dtype=np.int32)
+    for fold_id, (_, valid_idx) in enumerate(splits):
+        folds[valid_idx] = fold_id
+
+    key = _fingerprint(models, X, y, folds)
+    if cache_path and os.path.exists(cache_path):
+        cached = OOFCache.load(cache_path)
+        if cached.key == key:
+            return cached
+
+    classes = np.unique(y)
+    results = _parallel(n_jobs)(
+        delayed(_fit_fold)(name, model, X, y, train_idx, valid_idx)
+        for name, model in models.items()
+        for train_idx, valid_idx in splits
+    )
+
+    proba = {name: np.zeros((len(y), len(classes))) for name in models}
+    fit_times = {name: 0.0 for name in models}
+    for name, valid_idx, est_classes, p, elapsed in results:
+        # Align columns in case a fold did not see every class
+        cols = np.searchsorted(classes, est_classes)
+        proba[name][np.ix_(valid_idx, cols)] = p
+        fit_times[name] += elapsed
+
+    cache = OOFCache(proba, classes, folds, fit_times, key)
+    if cache_path:
+        cache.save(cache_path)
+    return cache
+
+
+def _select(cache, names, weights):
+    names = list(names) if names is not None else cache.names
+    if weights is None:
+        weights = np.ones(len(names))
+    elif isinstance(weights, dict):
+        weights = np.array([weights[name] for name in names], dtype=float)
+    else:
+        weights = np.asarray(weights, dtype=float)
+    return names, weights
+
+
+def soft_vote(cache, names=None, weights=None):
+    """Predict labels from the (weighted) average of cached probabilities."""
+    names, weights = _select(cache, names, weights)
+    avg = np.average(np.stack([cache.proba[n] for n in names]), axis=0, weights=weights)
+    return cache.classes[avg.argmax(axis=1)]
+
+
+def hard_vote(cache, names=None, weights=None):
+    """Predict labels by (weighted) majority vote; ties go to the lowest class, as in VotingClassifier."""
+    names, weights = _select(cache, names, weights)
+    votes = np.zeros_like(cache.proba[names[0]])
+    rows = np.arange(votes.shape[0])
+    for name, w in zip(names, weights):
+        votes[rows, cache.proba[name].argmax(axis=1)] += w
+    return cache.classes[votes.argmax(axis=1)]
+
+
+def evaluate_ensembles(cache, y, weights=None, scorer=accuracy_score):
+    """Score each base model and the hard / soft / weighted soft ensembles from the cache."""
+    y = np.asarray(y)
+    rows = []
+    for name in cache.names:
+        pred = cache.classes[cache.proba[name].argmax(axis=1)]
+        rows.append({"model": name, "score": scorer(y, pred), "fit_time": cache.fit_times[name]})
+    rows.append({"model": "hard_voting", "score": scorer(y, hard_vote(cache))})
+    rows.append({"model": "soft_voting", "score": scorer(y, soft_vote(cache))})
+    if weights is not None:
+        rows.append({"model": "weighted_soft_voting", "score": scorer(y, soft_vote(cache, weights=weights))})
+    return pd.DataFrame(rows).set_index("model")
+
+
+def optimize_weights(cache, y, n_trials=2000, random_state=42, scorer=accuracy_score):
+    """Search soft-voting weights on the simplex by random Dirichlet sampling.
+
+    Every trial only recombines the cached OOF probabilities, so thousands of
+    candidates take a fraction of a second. Returns ``(weights_dict, score)``.
+    """
+    y = np.asarray(y)
+    names = cache.names
+    stacked = np.stack([cache.proba[n] for n in names])
+    rng = np.random.default_rng(random_state)
+
+    candidates = np.vstack([np.full(len(names), 1.0 / len(names)),
+                            rng.dirichlet(np.ones(len(names)), size=n_trials)])
+    best_w, best_score = None, -np.inf
+    for w in candidates:
+        pred = cache.classes[np.tensordot(w, stacked, axes=1).argmax(axis=1)]
+        score = scorer(y, pred)
+        if score > best_score:
+            best_w, best_score = w, score
+    return {n: round(float(w), 4) for n, w in zip(names, best_w)}, best_score
+
+
+def _fit_one(name, model, X, y):
+    return name, _single_threaded(model).fit(X, y)
+
+
+def fit_full(models, X, y, n_jobs=-1):
+    """Fit every base model once on the full training data (in parallel, one thread each)."""
+    models = dict(models)
+    return dict(_parallel(n_jobs)(delayed(_fit_one)(n, m, X, y) for n, m in models.items()))
+
+
+def predict_proba_all(fitted, X):
+    """Collect test-set probabilities from fitted models in the same layout as an OOFCache."""
+    proba = {name: est.predict_proba(X) for name, est in fitted.items()}
+    classes = next(iter(fitted.values())).classes_
+    return OOFCache(proba, classes, np.zeros(len(X), dtype=np.int32), {}, "")
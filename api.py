@@ -1,16 +1,57 @@
+import time
+
+_IMPORT_START = time.perf_counter()
+
 import os
 import io
 import base64
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import re
+import hashlib
+import threading
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse
 import subprocess
 
-app = FastAPI()
+import metrics
+import model_race
+import profiling
+import progress
+import responses
+import result_cache
+from result_cache import ResultCache
+from upload_store import UploadStore
+from metrics import span
+from warmup import WarmUp, import_module
+
+# pandas / matplotlib / seaborn are imported on first use (or by the background
+# warm-up) so a fresh worker can start serving /upload immediately.
+
+
+def _plotting():
+    """matplotlib (headless Agg backend) and seaborn, imported on first use."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
+WARMUP = WarmUp([
+    ("pandas", import_module("pandas")),
+    ("matplotlib+seaborn", _plotting),
+])
+
+
+@asynccontextmanager
+async def lifespan(app):
+    WARMUP.start()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for Flask frontend (running on port 5000)
 origins = [
@@ -24,151 +65,465 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id", "X-Cache"],
 )
 
+# Per-stage timing, request counters/histograms and /metrics (see metrics.py)
+metrics.install(app)
+# Opt-in per-request CPU/allocation profiles and /profiles (see profiling.py)
+profiling.install(app)
+
 UPLOAD_DIR = "uploads"
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
+# Uploaded and preprocessed datasets are stored once per content hash, and
+# endpoint results are memoized on (dataset hash, operation, parameters)
+STORE = UploadStore(os.path.join(UPLOAD_DIR, "blobs"))
+RESULTS = ResultCache(os.path.join(UPLOAD_DIR, "cache"))
+
+# /model switches to chunked partial_fit training (incremental.py) for files
+# above this size, or when mode=incremental is requested
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("MODEL_STREAMING_BYTES", str(512 * 1024 * 1024)))
+
+# Rows per chunk when /analyze streams partial statistics
+ANALYZE_CHUNK_ROWS = 50_000
+
+# Rendered PNGs served by /plots/<id>.png when /visualize is called with inline=false
+PLOT_DIR = os.path.join(UPLOAD_DIR, "plots")
+MAX_STORED_PLOTS = 256
+PLOT_NAME = re.compile(r"^[0-9a-f]{32}\.png$")
+
+# Upper limit of the wall-clock budget a /model?mode=select race may ask for
+MAX_SELECT_BUDGET = float(os.environ.get("MODEL_SELECT_MAX_BUDGET", "600"))
+
+# /model with importances=true keeps the trained model and a sample of its test
+# split here (<key>.pkl) and writes permutation importances next to it
+# (<key>.importances.json) from a background job, one job at a time
+MODEL_DIR = os.path.join(UPLOAD_DIR, "models")
+MAX_STORED_MODELS = 32
+MODEL_KEY = re.compile(r"^[0-9a-f]{64}$")
+IMPORTANCE_SLOTS = threading.Semaphore(1)
+_IMPORTANCE_JOBS = {}  # key -> "queued" | "running"; read and written under _IMPORTANCE_LOCK
+_IMPORTANCE_LOCK = threading.Lock()
+
 # Global variable to store the processing state/filename (simplified for single user demo)
 CURRENT_FILE = None
 
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the background warm-up has finished."""
+    status = WARMUP.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/startup")
+async def startup_report():
+    """Module import time and per-step warm-up durations for this worker."""
+    return {"api_import_seconds": round(IMPORT_SECONDS, 4), **WARMUP.status()}
+
+
+@app.get("/cache")
+async def cache_stats():
+    return RESULTS.stats()
+
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     global CURRENT_FILE
     try:
-        file_location = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_location, "wb+") as file_object:
-            file_object.write(file.file.read())
+        with span("file_write"):
+            digest, file_location, deduplicated = STORE.put_stream(file.file, file.filename)
         CURRENT_FILE = file_location
-        return {"message": f"File '{file.filename}' uploaded successfully", "filename": file.filename}
+        return {"message": f"File '{file.filename}' uploaded successfully", "filename": file.filename,
+                "sha256": digest, "deduplicated": deduplicated}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _cache_lookup(request, operation, params):
+    """(key, cached body or None) for ``operation`` on the current dataset."""
+    key = RESULTS.key(STORE.digest(CURRENT_FILE), operation, params)
+    if result_cache.bypass(request):
+        return key, None
+    return key, RESULTS.get(key, operation)
+
+
+def _cached_response(request, body, media_type="application/json", hit=True):
+    return responses.respond(request, body, media_type=media_type, headers={"X-Cache": "hit" if hit else "miss"})
+
+
+def _cached_event_stream(body):
+    # A memoized result needs no progress: the stream is just the result event
+    return progress.event_stream(iter([progress.sse_raw("result", body)]))
+
+# Endpoints that parse, plot or cluster the dataset are plain defs: FastAPI runs
+# them in its threadpool, so the event loop keeps serving /ready, /metrics and
+# open streams meanwhile
+
 @app.get("/analyze")
-async def analyze_data():
+def analyze_data(
+    request: Request,
+    offset: int = Query(0, ge=0, description="first column of the page"),
+    limit: int = Query(responses.DEFAULT_COLUMN_LIMIT, description="columns per page (0 = all)"),
+    fmt: str = Query("json", alias="format", pattern="^(json|columnar|arrow)$"),
+):
     global CURRENT_FILE
     if not CURRENT_FILE:
         raise HTTPException(status_code=400, detail="No file uploaded")
+    if fmt == "arrow" and not responses.arrow_available():
+        raise HTTPException(status_code=400, detail="format=arrow needs the pyarrow package (pip install pyarrow)")
+    key, cached = _cache_lookup(request, "analyze", {"offset": offset, "limit": limit, "format": fmt})
+    media_type = "application/vnd.apache.arrow.stream" if fmt == "arrow" else "application/json"
+    if progress.wants_stream(request) and fmt != "arrow":
+        if cached is not None:
+            return _cached_event_stream(cached)
+        return progress.event_stream(_analyze_events(CURRENT_FILE, offset, limit, fmt, key))
+    if cached is not None:
+        return _cached_response(request, cached, media_type)
     
     try:
-        df = pd.read_csv(CURRENT_FILE)
-        description = df.describe().to_json()
-        head = df.head().to_json(orient="split")
-        info = {
-            "columns": list(df.columns),
-            "dtypes": df.dtypes.astype(str).to_dict(),
-            "shape": df.shape,
-            "missing_values": df.isnull().sum().to_dict()
-        }
-        return {"head": json.loads(head), "description": json.loads(description), "info": info}
+        import pandas as pd
+        with span("csv_parse"):
+            df = pd.read_csv(CURRENT_FILE)
+        with span("describe"):
+            if fmt == "arrow":
+                payload = responses.summary_arrow(df, offset, limit)
+            elif fmt == "columnar":
+                payload = responses.summary_columnar(df, offset, limit)
+            else:
+                payload = responses.summarize(df, offset, limit)
+        with span("serialize"):
+            body = payload if isinstance(payload, bytes) else responses.dumps(payload)
+        RESULTS.put(key, body)
+        return _cached_response(request, body, media_type, hit=False)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _analyze_events(path, offset, limit, fmt, cache_key):
+    """SSE body for /analyze: partial statistics per chunk, then the full result."""
+    try:
+        import pandas as pd
+        stats = responses.RunningStats()
+        throttle = progress.Throttle()
+        chunks = []
+        yield progress.stage("csv_parse", "started")
+        with span("csv_parse"):
+            sent_rows = 0
+            for chunk in pd.read_csv(path, chunksize=ANALYZE_CHUNK_ROWS):
+                chunks.append(chunk)
+                stats.update(chunk)
+                if throttle.ready():
+                    sent_rows = stats.rows
+                    yield progress.sse("partial", stats.summary())
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.read_csv(path)
+        if stats.rows != sent_rows:
+            yield progress.sse("partial", stats.summary())
+        yield progress.stage("csv_parse", "finished", rows=len(df))
+        yield progress.stage("describe", "started")
+        with span("describe"):
+            summarize = responses.summary_columnar if fmt == "columnar" else responses.summarize
+            payload = summarize(df, offset, limit)
+        yield progress.stage("describe", "finished")
+        body = responses.dumps(payload)
+        RESULTS.put(cache_key, body)
+        yield progress.sse_raw("result", body)
+    except Exception as e:
+        yield progress.sse("error", {"detail": str(e)})
+
+
+def _store_plot(png_bytes):
+    """Write a PNG under PLOT_DIR and return its URL path, pruning the oldest files."""
+    os.makedirs(PLOT_DIR, exist_ok=True)
+    # Named by content, so a memoized /visualize result keeps pointing at the same files
+    name = hashlib.sha256(png_bytes).hexdigest()[:32] + ".png"
+    path = os.path.join(PLOT_DIR, name)
+    if os.path.exists(path):
+        os.utime(path)
+    else:
+        with open(path, "wb") as f:
+            f.write(png_bytes)
+    stored = sorted(os.scandir(PLOT_DIR), key=lambda e: e.stat().st_mtime)
+    for entry in stored[:-MAX_STORED_PLOTS]:
+        os.remove(entry.path)
+    return f"/plots/{name}"
+
+
+@app.get("/plots/{name}")
+async def get_plot(name: str):
+    if not PLOT_NAME.match(name) or not os.path.exists(os.path.join(PLOT_DIR, name)):
+        raise HTTPException(status_code=404, detail="Plot not found")
+    return FileResponse(os.path.join(PLOT_DIR, name), media_type="image/png",
+                        headers={"Cache-Control": "private, max-age=3600, immutable"})
+
 @app.get("/visualize")
-async def visualize_data():
+def visualize_data(request: Request, inline: bool = True):
+    # inline=false returns /plots/<id>.png URLs instead of base64 PNGs in the JSON body
     global CURRENT_FILE
     if not CURRENT_FILE:
         raise HTTPException(status_code=400, detail="No file uploaded")
+    key, cached = _cache_lookup(request, "visualize", {"inline": inline})
+    if cached is not None and (inline or _plots_exist(cached)):
+        return _cached_response(request, cached)
 
     try:
-        df = pd.read_csv(CURRENT_FILE)
+        import pandas as pd
+        plt, sns = _plotting()
+        with span("csv_parse"):
+            df = pd.read_csv(CURRENT_FILE)
         numeric_df = df.select_dtypes(include=['float64', 'int64'])
         
         plots = []
         
         # 1. Correlation Heatmap
         if not numeric_df.empty:
-            plt.figure(figsize=(10, 8))
-            sns.heatmap(numeric_df.corr(), annot=True, cmap='coolwarm', fmt=".2f")
-            plt.title("Correlation Heatmap")
+            with span("plot_render"):
+                plt.figure(figsize=(10, 8))
+                sns.heatmap(numeric_df.corr(), annot=True, cmap='coolwarm', fmt=".2f")
+                plt.title("Correlation Heatmap")
             
             buf = io.BytesIO()
-            plt.savefig(buf, format="png")
-            buf.seek(0)
-            img_str = base64.b64encode(buf.read()).decode("utf-8")
-            plots.append({"name": "Correlation Heatmap", "image": img_str})
+            with span("png_encode"):
+                plt.savefig(buf, format="png")
+            plots.append(_plot_entry("Correlation Heatmap", buf.getvalue(), inline))
             plt.close()
 
             # 2. Distribution of first few numeric columns
             for col in numeric_df.columns[:3]:
-                plt.figure(figsize=(8, 6))
-                sns.histplot(df[col].dropna(), kde=True)
-                plt.title(f"Distribution of {col}")
+                with span("plot_render"):
+                    plt.figure(figsize=(8, 6))
+                    sns.histplot(df[col].dropna(), kde=True)
+                    plt.title(f"Distribution of {col}")
                 
                 buf = io.BytesIO()
-                plt.savefig(buf, format="png")
-                buf.seek(0)
-                img_str = base64.b64encode(buf.read()).decode("utf-8")
-                plots.append({"name": f"Distribution of {col}", "image": img_str})
+                with span("png_encode"):
+                    plt.savefig(buf, format="png")
+                plots.append(_plot_entry(f"Distribution of {col}", buf.getvalue(), inline))
                 plt.close()
 
-        return {"plots": plots}
+        body = responses.dumps({"plots": plots})
+        RESULTS.put(key, body)
+        return _cached_response(request, body, hit=False)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _plots_exist(body):
+    """False if a stored plot referenced by a memoized result has been pruned since."""
+    for plot in json.loads(body)["plots"]:
+        if not os.path.exists(os.path.join(PLOT_DIR, plot["url"].rsplit("/", 1)[-1])):
+            return False
+    return True
+
+def _plot_entry(name, png_bytes, inline):
+    if inline:
+        with span("base64_encode"):
+            return {"name": name, "image": base64.b64encode(png_bytes).decode("ascii")}
+    with span("plot_store"):
+        return {"name": name, "url": _store_plot(png_bytes)}
+
 @app.post("/preprocess")
-async def preprocess_data():
+def preprocess_data(request: Request):
     global CURRENT_FILE
     if not CURRENT_FILE:
         raise HTTPException(status_code=400, detail="No file uploaded")
 
+    key, cached = _cache_lookup(request, "preprocess", {})
+    if cached is not None:
+        processed_path = STORE.path_for(json.loads(cached)["processed_sha256"])
+        if os.path.exists(processed_path):
+            CURRENT_FILE = processed_path
+            if progress.wants_stream(request):
+                return _cached_event_stream(cached)
+            return _cached_response(request, cached)
+
+    if progress.wants_stream(request):
+        def events():
+            try:
+                for event, data in _preprocess_steps(CURRENT_FILE):
+                    if event == "result":
+                        body = responses.dumps(data)
+                        RESULTS.put(key, body)
+                        yield progress.sse_raw(event, body)
+                    else:
+                        yield progress.sse(event, data)
+            except Exception as e:
+                yield progress.sse("error", {"detail": str(e)})
+        return progress.event_stream(events())
+
     try:
-        df = pd.read_csv(CURRENT_FILE)
-        
-        # Simple Preprocessing: 
-        # 1. Fill missing numeric values with mean
-        # 2. Fill missing categorical values with mode
-        # 3. Drop duplicates
-        
-        initial_shape = df.shape
-        
-        numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns
-        categorical_cols = df.select_dtypes(include=['object']).columns
-        
-        for col in numeric_cols:
+        for event, data in _preprocess_steps(CURRENT_FILE):
+            if event == "result":
+                body = responses.dumps(data)
+                RESULTS.put(key, body)
+                return _cached_response(request, body, hit=False)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _preprocess_steps(path):
+    """Run the preprocessing, yielding ("progress", ...) events and finally ("result", response)."""
+    global CURRENT_FILE
+    import pandas as pd
+    yield "progress", {"stage": "csv_parse", "status": "started"}
+    with span("csv_parse"):
+        df = pd.read_csv(path)
+    yield "progress", {"stage": "csv_parse", "status": "finished", "rows": len(df)}
+    
+    # Simple Preprocessing: 
+    # 1. Fill missing numeric values with mean
+    # 2. Fill missing categorical values with mode
+    # 3. Drop duplicates
+    
+    initial_shape = df.shape
+    
+    numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns
+    categorical_cols = df.select_dtypes(include=['object']).columns
+    total_cols = len(numeric_cols) + len(categorical_cols)
+    
+    yield "progress", {"stage": "impute", "status": "started", "columns": total_cols}
+    throttle = progress.Throttle()
+    with span("impute"):
+        for i, col in enumerate(numeric_cols, 1):
             df[col] = df[col].fillna(df[col].mean())
+            if throttle.ready():
+                yield "progress", {"stage": "impute", "status": "running", "done": i, "columns": total_cols}
             
-        for col in categorical_cols:
+        for i, col in enumerate(categorical_cols, len(numeric_cols) + 1):
             if not df[col].mode().empty:
                 df[col] = df[col].fillna(df[col].mode()[0])
-        
+            if throttle.ready():
+                yield "progress", {"stage": "impute", "status": "running", "done": i, "columns": total_cols}
+    yield "progress", {"stage": "impute", "status": "finished"}
+    
+    yield "progress", {"stage": "dedupe", "status": "started"}
+    with span("dedupe"):
         df.drop_duplicates(inplace=True)
-        
-        # Save processed file
-        processed_file_path = os.path.join(UPLOAD_DIR, "processed_" + os.path.basename(CURRENT_FILE))
-        df.to_csv(processed_file_path, index=False)
-        CURRENT_FILE = processed_file_path # Update current file to processed one
-        
-        return {
-            "message": "Data preprocessed successfully",
-            "initial_shape": initial_shape,
-            "final_shape": df.shape,
-            "processed_file": os.path.basename(processed_file_path)
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-@app.post("/model")
-async def run_model(target_column: str = Form(...)):
-    global CURRENT_FILE
-    if not CURRENT_FILE:
-        raise HTTPException(status_code=400, detail="No file uploaded")
+    yield "progress", {"stage": "dedupe", "status": "finished", "rows": len(df)}
     
-    try:
-        # Generate Python Code for Modeling
-        code_content = f"""
+    # Save processed file (content-addressed like uploads)
+    yield "progress", {"stage": "csv_write", "status": "started"}
+    with span("csv_write"):
+        tmp_path = STORE.temp_path()
+        df.to_csv(tmp_path, index=False)
+        processed_digest, processed_file_path, _ = STORE.put_file(tmp_path)
+    yield "progress", {"stage": "csv_write", "status": "finished"}
+    CURRENT_FILE = processed_file_path # Update current file to processed one
+    
+    yield "result", {
+        "message": "Data preprocessed successfully",
+        "initial_shape": initial_shape,
+        "final_shape": df.shape,
+        "processed_file": os.path.basename(processed_file_path),
+        "processed_sha256": processed_digest
+    }
+
+def _model_script(data_path, target_column, mode, bundle_path=None, budget=None):
+    """Source of the generated training script; progress goes to stderr as PROGRESS lines."""
+    if mode == "incremental":
+        # Streams the CSV in chunks; memory stays flat whatever the row count
+        return f"""
+import json
+import sys
+
+sys.path.insert(0, r"{profiling.BASE_DIR}")
+import incremental
+from progress import emit
+
+data_path = r"{data_path}"
+target = "{target_column}"
+
+results = incremental.train(data_path, target, chunksize=incremental.CHUNKSIZE, epochs=2, progress=emit)
+print(json.dumps(results))
+"""
+    if mode == "select":
+        # Races several model families with successive halving (model_race.py)
+        return f"""
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
+from sklearn.preprocessing import LabelEncoder
+import json
+import sys
+import time
+
+sys.path.insert(0, r"{profiling.BASE_DIR}")
+import model_race
+from progress import emit
+
+# Load Data
+emit("load", status="started")
+data_path = r"{data_path}"
+df = pd.read_csv(data_path)
+target = "{target_column}"
+emit("load", status="finished", rows=len(df))
+
+# Encode Categorical Variables
+le = LabelEncoder()
+for col in df.select_dtypes(include=['object']).columns:
+    df[col] = le.fit_transform(df[col].astype(str))
+
+# Split Data
+X = df.drop(columns=[target])
+y = df[target]
+
+X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+# Determine Task Type (Classification/Regression) based on target unique values
+is_classification = False
+if y.nunique() < 20 or y.dtype == 'object':
+    is_classification = True
+
+results = {{}}
+
+# Race the candidates within the budget
+fit_start = time.perf_counter()
+model, name, selection = model_race.race(X_train, y_train, is_classification, budget={budget}, progress=emit)
+results['fit_seconds'] = time.perf_counter() - fit_start
+emit("evaluate", status="started", test_rows=len(X_test))
+y_pred = model.predict(X_test.to_numpy(dtype=float))
+if is_classification:
+    results['type'] = 'Classification'
+    results['accuracy'] = accuracy_score(y_test, y_pred)
+else:
+    results['type'] = 'Regression'
+    results['mse'] = mean_squared_error(y_test, y_pred)
+    results['r2'] = r2_score(y_test, y_pred)
+results['model'] = name
+results['selection'] = selection
+
+print(json.dumps(results))
+"""
+    return f"""
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
 from sklearn.preprocessing import LabelEncoder
 import json
+import sys
+import time
+
+
+def progress(stage, **fields):
+    print("PROGRESS " + json.dumps({{"stage": stage, **fields}}), file=sys.stderr, flush=True)
+
+
+def fit_forest(model, X, y, n_trees=100, step=10):
+    # warm_start grows the same forest a batch of trees at a time
+    for n in range(step, n_trees + 1, step):
+        model.set_params(n_estimators=n)
+        model.fit(X, y)
+        progress("fit", trees_built=n, n_trees=n_trees)
+
 
 # Load Data
-data_path = r"{CURRENT_FILE}"
+progress("load", status="started")
+data_path = r"{data_path}"
 df = pd.read_csv(data_path)
 target = "{target_column}"
+progress("load", status="finished", rows=len(df))
 
 # Encode Categorical Variables
 le = LabelEncoder()
@@ -188,17 +543,24 @@ if y.nunique() < 20 or y.dtype == 'object':
 
 results = {{}}
 
+progress("fit", status="started", train_rows=len(X_train))
 if is_classification:
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    model = RandomForestClassifier(n_estimators=10, random_state=42, warm_start=True)
+    fit_start = time.perf_counter()
+    fit_forest(model, X_train, y_train)
+    results['fit_seconds'] = time.perf_counter() - fit_start
+    progress("evaluate", status="started", test_rows=len(X_test))
     y_pred = model.predict(X_test)
     acc = accuracy_score(y_test, y_pred)
     results['type'] = 'Classification'
     results['accuracy'] = acc
     results['model'] = 'RandomForestClassifier'
 else:
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    model = RandomForestRegressor(n_estimators=10, random_state=42, warm_start=True)
+    fit_start = time.perf_counter()
+    fit_forest(model, X_train, y_train)
+    results['fit_seconds'] = time.perf_counter() - fit_start
+    progress("evaluate", status="started", test_rows=len(X_test))
     y_pred = model.predict(X_test)
     mse = mean_squared_error(y_test, y_pred)
     r2 = r2_score(y_test, y_pred)
@@ -206,31 +568,253 @@ else:
     results['mse'] = mse
     results['r2'] = r2
     results['model'] = 'RandomForestRegressor'
-
+{_importances_block(bundle_path)}
 print(json.dumps(results))
 """
+
+
+def _importances_block(bundle_path):
+    if not bundle_path:
+        return ""
+    return f"""
+# Impurity importances now; the model and a sample of the test split are kept
+# for the permutation importance job
+sys.path.insert(0, r"{profiling.BASE_DIR}")
+import importances
+results['impurity_importances'] = importances.impurity(model, list(X.columns))
+importances.save_bundle(r"{bundle_path}", model, X_test, y_test, is_classification)
+"""
+
+
+def _model_file(key, suffix):
+    return os.path.join(MODEL_DIR, key + suffix)
+
+
+def _run_importances(key):
+    out_path = _model_file(key, ".importances.json")
+    with IMPORTANCE_SLOTS:
+        with _IMPORTANCE_LOCK:
+            _IMPORTANCE_JOBS[key] = "running"
+        try:
+            result = subprocess.run(["python", os.path.join(profiling.BASE_DIR, "importances.py"),
+                                     _model_file(key, ".pkl"), "--out", out_path],
+                                    capture_output=True, text=True)
+            if result.returncode != 0 and not os.path.exists(out_path):
+                with open(out_path, "w", encoding="utf-8") as f:
+                    json.dump({"status": "failed", "error": result.stderr[-2000:]}, f)
+        finally:
+            with _IMPORTANCE_LOCK:
+                _IMPORTANCE_JOBS.pop(key, None)
+
+
+def _start_importances(key):
+    """Queue the permutation importance job for a saved model; returns the status block for /model."""
+    with _IMPORTANCE_LOCK:
+        start = key not in _IMPORTANCE_JOBS and not os.path.exists(_model_file(key, ".importances.json"))
+        if start:
+            _IMPORTANCE_JOBS[key] = "queued"
+    if start:
+        threading.Thread(target=_run_importances, args=(key,), daemon=True).start()
+    bundles = sorted((e for e in os.scandir(MODEL_DIR) if e.name.endswith(".pkl")), key=lambda e: e.stat().st_mtime)
+    for entry in bundles[:-MAX_STORED_MODELS]:
+        old_key = entry.name[:-len(".pkl")]
+        # Under the lock, so a job cannot be queued for a bundle while it is being removed
+        with _IMPORTANCE_LOCK:
+            if old_key not in _IMPORTANCE_JOBS:
+                for suffix in (".pkl", ".importances.json"):
+                    if os.path.exists(_model_file(old_key, suffix)):
+                        os.remove(_model_file(old_key, suffix))
+    return {"status": "pending", "url": f"/model/importances/{key}"}
+
+
+@app.get("/model/importances/{key}")
+async def model_importances(request: Request, key: str):
+    """Permutation importances for a /model run with importances=true (poll until status is done)."""
+    if not MODEL_KEY.match(key):
+        raise HTTPException(status_code=404, detail="Unknown model")
+    result_path = _model_file(key, ".importances.json")
+    if os.path.exists(result_path):
+        with open(result_path, "rb") as f:
+            return responses.respond(request, f.read(), media_type="application/json")
+    with _IMPORTANCE_LOCK:
+        status = _IMPORTANCE_JOBS.get(key)
+    if status:
+        return {"status": status}
+    if os.path.exists(_model_file(key, ".pkl")):
+        # Server restarted while the job was queued or running
+        return _start_importances(key) | {"status": "queued"}
+    raise HTTPException(status_code=404, detail="No importances for this model (never requested or evicted)")
+
+
+def _model_command(script_path):
+    command = ["python", script_path]
+    profile = profiling.current_profile_id.get()
+    if profile:
+        # Profile the training job too; results land next to the request profile
+        profile_id, profile_mode = profile
+        command = ["python", os.path.join(profiling.BASE_DIR, "profiling.py"),
+                   "--id", profile_id, "--prefix", "train_", script_path]
+        if profile_mode == "cpu":
+            command.insert(-1, "--cpu-only")
+    return command
+
+
+def _model_response(returncode, stdout, stderr, run_seconds, script_path, code_content, importance_key=None):
+    if returncode != 0:
+        return {"error": "Model execution failed", "stderr": progress.strip_progress(stderr)}
+
+    model_results = json.loads(stdout)
+    # Split the subprocess wall time into model fit and everything else
+    # (interpreter startup, imports, CSV load, encoding, evaluation)
+    fit_seconds = model_results.get("fit_seconds", 0.0)
+    metrics.record("model_fit", fit_seconds)
+    metrics.record("subprocess_overhead", run_seconds - fit_seconds)
+    
+    response = {
+        "message": "Model generated and trained successfully",
+        "generated_code_path": script_path,
+        "results": model_results,
+        "code_preview": code_content
+    }
+    if importance_key:
+        # Returned now; the permutation job runs after the response in the background
+        response["importances"] = _start_importances(importance_key)
+    return response
+
+
+@app.post("/model")
+async def run_model(request: Request, target_column: str = Form(...), mode: str = Form("auto"),
+                    importances: bool = Form(False), budget_seconds: float = Form(model_race.DEFAULT_BUDGET)):
+    global CURRENT_FILE
+    if not CURRENT_FILE:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+    if mode not in ("auto", "full", "incremental", "select"):
+        raise HTTPException(status_code=400, detail="mode must be auto, full, incremental or select")
+    if not 0 < budget_seconds <= MAX_SELECT_BUDGET:
+        raise HTTPException(status_code=400, detail=f"budget_seconds must be in (0, {MAX_SELECT_BUDGET:.0f}]")
+    if mode == "auto":
+        mode = "incremental" if os.path.getsize(CURRENT_FILE) > STREAMING_THRESHOLD_BYTES else "full"
+    
+    # Importances need the fitted forest, which incremental mode does not produce
+    importances = importances and mode == "full"
+    params = {"target_column": target_column, "mode": mode, "importances": importances}
+    if mode == "select":
+        params["budget_seconds"] = budget_seconds
+    # Profiled requests always run the training job
+    if profiling.current_profile_id.get():
+        key, cached = None, None
+    else:
+        key, cached = _cache_lookup(request, "model", params)
+    if cached is not None:
+        if progress.wants_stream(request):
+            return _cached_event_stream(cached)
+        return _cached_response(request, cached)
+
+    try:
+        importance_key = None
+        if importances:
+            importance_key = key or RESULTS.key(STORE.digest(CURRENT_FILE), "model", params)
+            os.makedirs(MODEL_DIR, exist_ok=True)
+        # Generate Python Code for Modeling
+        bundle_path = _model_file(importance_key, ".pkl") if importance_key else None
+        code_content = _model_script(CURRENT_FILE, target_column, mode, bundle_path, budget_seconds)
         generated_script_path = os.path.join(UPLOAD_DIR, "generated_model.py")
         with open(generated_script_path, "w", encoding="utf-8") as f:
             f.write(code_content)
-        
-        # Execute the generated script
-        result = subprocess.run(["python", generated_script_path], capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            return {"error": "Model execution failed", "stderr": result.stderr}
-            
-        model_results = json.loads(result.stdout)
-        
-        return {
-            "message": "Model generated and trained successfully",
-            "generated_code_path": generated_script_path,
-            "results": model_results,
-            "code_preview": code_content
-        }
+        command = _model_command(generated_script_path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
+    if progress.wants_stream(request):
+        async def events():
+            try:
+                yield progress.stage("train", "started", mode=mode)
+                run_start = time.perf_counter()
+                # aclosing: a disconnected client closes events(), which kills the training script
+                async with aclosing(progress.run_streaming(command)) as run:
+                    async for kind, data in run:
+                        if kind == "progress":
+                            yield progress.sse("progress", data)
+                        else:
+                            returncode, stdout, stderr = data
+                run_seconds = time.perf_counter() - run_start
+                response = _model_response(returncode, stdout, stderr, run_seconds,
+                                           generated_script_path, code_content, importance_key)
+                body = responses.dumps(response)
+                if key and "error" not in response:
+                    RESULTS.put(key, body)
+                yield progress.sse_raw("result", body)
+            except Exception as e:
+                yield progress.sse("error", {"detail": str(e)})
+        return progress.event_stream(events())
+
+    try:
+        # Execute the generated script without blocking the event loop
+        run_start = time.perf_counter()
+        async with aclosing(progress.run_streaming(command)) as run:
+            async for kind, data in run:
+                if kind == "exit":
+                    returncode, stdout, stderr = data
+        run_seconds = time.perf_counter() - run_start
+        response = _model_response(returncode, stdout, stderr, run_seconds,
+                                   generated_script_path, code_content, importance_key)
+        body = responses.dumps(response)
+        if key and "error" not in response:
+            RESULTS.put(key, body)
+        return _cached_response(request, body, hit=False)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/cluster")
+def cluster_data(
+    request: Request,
+    k: int = Query(5, ge=2, le=50, description="number of clusters"),
+    method: str = Query("kmeans", pattern="^(kmeans|birch)$"),
+    n_init: int = Query(4, ge=1, le=32, description="k-means++ restarts on the sample"),
+    max_epochs: int = Query(5, ge=1, le=50, description="passes over the file (kmeans)"),
+    columns: str = Query(None, description="comma separated (default: all numeric columns)"),
+):
+    if not CURRENT_FILE:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+    import clustering  # numpy/pandas, kept off the startup path
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+    params = {"k": k, "method": method, "n_init": n_init, "max_epochs": max_epochs, "columns": selected}
+    key, cached = _cache_lookup(request, "cluster", params)
+    if cached is not None:
+        if progress.wants_stream(request):
+            return _cached_event_stream(cached)
+        return _cached_response(request, cached)
+
+    def steps():
+        return clustering.run(CURRENT_FILE, k, method, selected, n_init, max_epochs)
+
+    if progress.wants_stream(request):
+        def events():
+            try:
+                for event, data in steps():
+                    if event == "result":
+                        body = responses.dumps(data)
+                        RESULTS.put(key, body)
+                        yield progress.sse_raw(event, body)
+                    else:
+                        yield progress.sse(event, data)
+            except Exception as e:
+                yield progress.sse("error", {"detail": str(e)})
+        return progress.event_stream(events())
+
+    try:
+        for event, data in steps():
+            if event == "result":
+                body = responses.dumps(data)
+                RESULTS.put(key, body)
+                return _cached_response(request, body, hit=False)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,162 @@
+"""
+Side-by-side report of the "exact" and "fast" ensemble backends in
+train_and_save_model.py.
+
+For each dataset size and backend, the pipeline is trained on synthetic
+Titanic rows (datagen.py) and evaluated on a held-out 20%:
+
+    fit_s            pipeline fit time
+    member_fit_s     fit time of each ensemble member on its own (same data)
+    predict_row_ms   median latency of a single-row predict_proba
+    predict_batch_s  predict_proba on the whole test split
+    size_mb          pickled model size
+    accuracy         test accuracy
+
+Each (size, backend) run happens in a fresh process with a timeout, so an
+exact backend that does not finish at 1M rows is reported as "timeout"
+instead of blocking the report.
+
+Examples:
+    python backend_report.py                          # 10k and 100k rows
+    python backend_report.py --sizes 10k,1m --timeout 1800
+    python backend_report.py --no-members --json report.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import pickle
+import queue as queue_module
+import time
+
+from benchmark import RESULTS_DIR, parse_size, synthesize
+
+DEFAULT_SIZES = "10k,100k"
+
+
+def measure(backend, n_rows, seed=0, members=True, n_calls=50):
+    import numpy as np
+    from sklearn.base import clone
+    from sklearn.model_selection import train_test_split
+    from train_and_save_model import build_model_pipeline, features, target
+
+    df = synthesize("titanic", n_rows, seed)
+    X_train, X_test, y_train, y_test = train_test_split(df[features], df[target], test_size=0.2, random_state=42)
+    pipeline = build_model_pipeline(backend)
+
+    start = time.perf_counter()
+    pipeline.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    member_fit = {}
+    if members:
+        # Members refit alone on the preprocessed matrix to show where the time goes
+        Xt = pipeline.named_steps["preprocessor"].transform(X_train)
+        for name, estimator in pipeline.named_steps["classifier"].estimators:
+            start = time.perf_counter()
+            clone(estimator).fit(Xt, y_train)
+            member_fit[name] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    proba = pipeline.predict_proba(X_test)
+    batch_seconds = time.perf_counter() - start
+    accuracy = float((pipeline.classes_[proba.argmax(axis=1)] == y_test.to_numpy()).mean())
+
+    rows = X_test.sample(n_calls, replace=True, random_state=seed)
+    latencies = []
+    for i in range(n_calls):
+        row = rows.iloc[[i]]
+        t0 = time.perf_counter()
+        pipeline.predict_proba(row)
+        latencies.append(time.perf_counter() - t0)
+
+    return {
+        "backend": backend,
+        "rows": n_rows,
+        "fit_s": round(fit_seconds, 3),
+        "member_fit_s": member_fit,
+        "predict_row_ms": round(float(np.median(latencies)) * 1000, 2),
+        "predict_batch_s": round(batch_seconds, 3),
+        "size_mb": round(len(pickle.dumps(pipeline)) / 1e6, 2),
+        "accuracy": round(accuracy, 4),
+    }
+
+
+def _child(queue, *args):
+    try:
+        queue.put(measure(*args))
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run(backend, n_rows, seed, members, timeout):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(queue, backend, n_rows, seed, members))
+    proc.start()
+    # Read before joining: a child blocks on exit until its queued result is consumed
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except queue_module.Empty:
+            if not proc.is_alive():
+                try:
+                    result = queue.get(timeout=1)
+                except queue_module.Empty:
+                    result = {"error": f"exit code {proc.exitcode}"}
+                break
+            if time.monotonic() > deadline:
+                proc.terminate()
+                proc.join()
+                return {"backend": backend, "rows": n_rows, "error": f"timeout after {timeout:.0f}s"}
+    proc.join()
+    return {"backend": backend, "rows": n_rows, **result}
+
+
+def format_table(results):
+    members = sorted({m for r in results for m in r.get("member_fit_s", {})})
+    header = ["rows", "backend", "fit_s", *[f"{m}_fit_s" for m in members],
+              "predict_row_ms", "predict_batch_s", "size_mb", "accuracy"]
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    for r in results:
+        if "error" in r:
+            cells = [f"{r['rows']:,}", r["backend"], r["error"]] + [""] * (len(header) - 3)
+        else:
+            cells = [f"{r['rows']:,}", r["backend"], str(r["fit_s"]),
+                     *[str(r["member_fit_s"].get(m, "")) for m in members],
+                     str(r["predict_row_ms"]), str(r["predict_batch_s"]), str(r["size_mb"]), str(r["accuracy"])]
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--backends", default="exact,fast")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds per (size, backend) run")
+    parser.add_argument("--no-members", action="store_true", help="skip the per-member fit timings")
+    parser.add_argument("--json", default=None, help="write results to this file (default: benchmark_results/)")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes.split(","):
+        n_rows = parse_size(size)
+        for backend in args.backends.split(","):
+            print(f"{backend} @ {n_rows:,} rows ...", flush=True)
+            results.append(run(backend, n_rows, args.seed, not args.no_members, args.timeout))
+
+    print()
+    print(format_table(results))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.json or os.path.join(RESULTS_DIR, time.strftime("backends_%Y%m%d_%H%M%S.json"))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
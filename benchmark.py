@@ -0,0 +1,280 @@
+"""
+Reproducible benchmark suite for the training and serving paths.
+
+Each case runs in a fresh process so wall time, throughput and peak RSS are
+measured in isolation. Results are written as JSON under ``benchmark_results/``
+and can be compared against a saved baseline to flag regressions.
+
+Examples:
+    python benchmark.py                                # all cases at 10k rows
+    python benchmark.py --sizes 10k,1m --cases train_fit,submission_fe
+    python benchmark.py --save-baseline                # store as baseline.json
+    python benchmark.py --compare                      # exit 1 on regressions
+
+Everything runs offline: datasets are generated by datagen.py from profiles
+learned on the CSVs in the repo, and the FastAPI endpoints are exercised
+in-process with ``TestClient``.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmark_results")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+
+TARGETS = {"titanic": "Survived", "spaceship": "Transported", "wine": "quality"}
+
+SIZE_ALIASES = {"10k": 10_000, "50k": 50_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def synthesize(schema, n_rows, seed=0):
+    """Generate ``n_rows`` rows matching one of the project's schemas (see datagen.py)."""
+    import datagen
+    return datagen.generate_frame(schema, n_rows, seed=seed)
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    return SIZE_ALIASES.get(text, None) or int(float(text))
+
+
+# ---------------------------------------------------------------------------
+# Cases: each returns a dict with at least wall_time (s) and items (rows/calls)
+# ---------------------------------------------------------------------------
+
+def case_train_fit(n_rows, seed, backend="exact"):
+    """Fit time of the Titanic voting pipeline from train_and_save_model.py."""
+    from train_and_save_model import build_model_pipeline, features, target
+
+    df = synthesize("titanic", n_rows, seed)
+    pipeline = build_model_pipeline(backend)
+    start = time.perf_counter()
+    pipeline.fit(df[features], df[target])
+    return {"wall_time": time.perf_counter() - start, "items": n_rows}
+
+
+def case_train_fit_fast(n_rows, seed):
+    """Fit time of the same pipeline with the "fast" backend."""
+    return case_train_fit(n_rows, seed, backend="fast")
+
+
+def case_predict_row(n_rows, seed, n_calls=200):
+    """Per-row latency of web_app.predict_survival (model fitted on n_rows)."""
+    from train_and_save_model import build_model_pipeline, features, target
+    import web_app
+
+    df = synthesize("titanic", n_rows, seed)
+    web_app.HOLDER.swap(build_model_pipeline().fit(df[features], df[target]), "benchmark")
+
+    rows = df[features].sample(n_calls, replace=True, random_state=seed).fillna({"Age": 30, "Embarked": "S"})
+    latencies = []
+    start = time.perf_counter()
+    for r in rows.itertuples(index=False):
+        t0 = time.perf_counter()
+        web_app.predict_survival(r.Pclass, r.Sex, r.Age, r.SibSp, r.Parch, r.Fare, r.Embarked)
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+    return {"wall_time": wall, "items": n_calls, **_latency_stats(latencies)}
+
+
+def case_submission_fe(n_rows, seed):
+    """Runtime of the Spaceship Titanic feature engineering in generate_submission.py."""
+    sys.path.insert(0, os.path.join(BASE_DIR, "Spaceship_Titanic"))
+    from generate_submission import engineer_features
+
+    df = synthesize("spaceship", n_rows, seed)
+    start = time.perf_counter()
+    engineer_features(df)
+    return {"wall_time": time.perf_counter() - start, "items": n_rows}
+
+
+def _api_case(endpoint, schema):
+    def run(n_rows, seed, repeats=3):
+        # api.py creates its upload dir relative to the cwd, so isolate it
+        os.chdir(tempfile.mkdtemp(prefix="bench_api_"))
+        sys.path.insert(0, BASE_DIR)
+        from fastapi.testclient import TestClient
+        import api
+        import datagen
+
+        client = TestClient(api.app)
+        path = os.path.join(os.getcwd(), f"{schema}.csv")
+        datagen.write(datagen.load_profile(schema), n_rows, path, seed=seed)
+        with open(path, "rb") as f:
+            client.post("/upload", files={"file": (f"{schema}.csv", f, "text/csv")}).raise_for_status()
+
+        # Measure the computation, not the result cache (see result_cache.py)
+        headers = {"Cache-Control": "no-cache"}
+        latencies = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            if endpoint == "model":
+                resp = client.post("/model", data={"target_column": TARGETS[schema]}, headers=headers)
+            elif endpoint == "preprocess":
+                api.CURRENT_FILE = path  # always preprocess the raw upload
+                resp = client.post("/preprocess", headers=headers)
+            else:
+                resp = client.get(f"/{endpoint}", headers=headers)
+            latencies.append(time.perf_counter() - t0)
+            resp.raise_for_status()
+        return {"wall_time": sum(latencies), "items": n_rows * repeats,
+                "response_bytes": len(resp.content), **_latency_stats(latencies)}
+
+    run.__doc__ = f"Latency of api.py /{endpoint} on a synthetic {schema} upload."
+    return run
+
+
+CASES = {
+    "train_fit": case_train_fit,
+    "train_fit_fast": case_train_fit_fast,
+    "predict_row": case_predict_row,
+    "submission_fe": case_submission_fe,
+    "api_analyze": _api_case("analyze", "titanic"),
+    "api_visualize": _api_case("visualize", "titanic"),
+    "api_preprocess": _api_case("preprocess", "titanic"),
+    "api_model": _api_case("model", "wine"),
+}
+
+
+def _latency_stats(latencies):
+    arr = np.asarray(latencies) * 1000
+    return {"latency_ms_p50": float(np.percentile(arr, 50)),
+            "latency_ms_p95": float(np.percentile(arr, 95)),
+            "latency_ms_max": float(arr.max())}
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _child(name, n_rows, seed, queue):
+    try:
+        result = CASES[name](n_rows, seed)
+        result["status"] = "ok"
+    except Exception as e:
+        result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    # ru_maxrss is in KiB on Linux
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put(result)
+
+
+def run_case(name, n_rows, seed, timeout):
+    # spawn gives each case a clean interpreter, so peak RSS is not inherited
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(name, n_rows, seed, queue))
+    start = time.perf_counter()
+    proc.start()
+    try:
+        result = queue.get(timeout=timeout)
+    except Exception:
+        result = {"status": "timeout", "error": f"exceeded {timeout}s"}
+        proc.kill()
+    proc.join()
+    result["total_time"] = time.perf_counter() - start
+    if result.get("wall_time"):
+        result["throughput"] = result["items"] / result["wall_time"]
+    result.update({"case": name, "n_rows": n_rows, "seed": seed})
+    return result
+
+
+def environment():
+    versions = {}
+    for pkg in ["numpy", "pandas", "sklearn", "fastapi", "matplotlib"]:
+        try:
+            versions[pkg] = __import__(pkg).__version__
+        except ImportError:
+            versions[pkg] = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "packages": versions}
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regressions (wall_time or peak_rss worse than threshold)."""
+    base = {(r["case"], r["n_rows"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = base.get((r["case"], r["n_rows"]))
+        if not old or r["status"] != "ok" or old.get("status") != "ok":
+            continue
+        for metric in ["wall_time", "peak_rss_mb"]:
+            ratio = r[metric] / old[metric] if old[metric] else 1.0
+            if ratio > 1 + threshold:
+                regressions.append({"case": r["case"], "n_rows": r["n_rows"], "metric": metric,
+                                    "baseline": old[metric], "current": r[metric], "ratio": ratio})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", default=",".join(CASES), help="comma separated case names")
+    parser.add_argument("--sizes", default="10k", help="comma separated row counts (10k, 1m, 10m, ...)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=3600, help="per-case timeout in seconds")
+    parser.add_argument("--output", help="results file (default: benchmark_results/<timestamp>.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="compare against the saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--list", action="store_true", help="list available cases")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, fn in CASES.items():
+            print(f"{name:16s} {fn.__doc__}")
+        return
+
+    results = []
+    for n_rows in [parse_size(s) for s in args.sizes.split(",")]:
+        for name in args.cases.split(","):
+            print(f"Running {name} @ {n_rows:,} rows...", flush=True)
+            r = run_case(name, n_rows, args.seed, args.timeout)
+            results.append(r)
+            if r["status"] == "ok":
+                print(f"  {r['wall_time']:.3f}s  {r['throughput']:.1f} items/s  peak RSS {r['peak_rss_mb']:.0f} MB")
+            else:
+                print(f"  {r['status']}: {r.get('error')}")
+
+    report = {"timestamp": datetime.now().isoformat(timespec="seconds"),
+              "environment": environment(), "results": results}
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+
+    if args.compare:
+        if not os.path.exists(BASELINE_PATH):
+            print("No baseline found; run with --save-baseline first.")
+            sys.exit(2)
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['case']} @ {r['n_rows']:,}: {r['metric']} "
+                  f"{r['baseline']:.3f} -> {r['current']:.3f} ({r['ratio']:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Out-of-core clustering for /cluster.
+
+The uploaded CSV is read in chunks and never loaded whole:
+
+1. ``scan``: mean/std of every numeric column (bool columns count as 0/1,
+   text columns are ignored) and a uniform sample of SAMPLE_ROWS rows (each
+   row gets a seeded random key; the smallest keys are kept)
+2. init (kmeans): k-means++ on the sample, ``n_init`` restarts in parallel
+   processes (one core each); the centers of the lowest-inertia restart seed
+   the streaming fit
+3. fit:
+       kmeans   MiniBatchKMeans.partial_fit on BATCH_SIZE-row batches of every
+                chunk, for up to ``max_epochs`` passes. After each pass the
+                largest center shift (in standard deviations) and the sample
+                inertia are reported; the fit stops once the shift is below
+                ``tol``.
+       birch    one pass of Birch.partial_fit: a CF-tree of small dense
+                subclusters (a streaming density summary), which are then
+                merged into ``k`` clusters. The subcluster radius is
+                calibrated on the sample so that it gives at most
+                MAX_SUBCLUSTERS subclusters (a radius that is too small makes
+                the tree, and the time per row, grow without bound).
+4. summarize: one more pass labels every row, for cluster sizes and centroids
+   in the original units. A 2-D PCA of the sample gives at most PLOT_POINTS
+   labelled points plus the projected centroids, for plotting.
+
+Values are standardized with the scan statistics; missing values become the
+column mean. Peak memory is one chunk plus the sample, whatever the file size.
+``run`` yields ("progress", {...}) events and finally ("result", {...}).
+
+Example:
+    python clustering.py uploads/big.csv --k 8
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+CHUNKSIZE = 50_000
+BATCH_SIZE = 4096
+SAMPLE_ROWS = 20_000
+PLOT_POINTS = 2000
+MAX_SUBCLUSTERS = 500
+METHODS = ("kmeans", "birch")
+
+
+def _chunks(path, chunksize):
+    return pd.read_csv(path, chunksize=chunksize, low_memory=False)
+
+
+def _numeric(chunk, columns):
+    return chunk[columns].astype(float).to_numpy()
+
+
+def scan(path, columns=None, chunksize=CHUNKSIZE, seed=42):
+    """(columns, ignored, mean, std, rows, sample as raw values)."""
+    count = total = sq_total = None
+    sample, keys = None, None
+    rows = 0
+    ignored = []
+    for i, chunk in enumerate(_chunks(path, chunksize)):
+        if columns is None:
+            usable = chunk.select_dtypes(include=["number", "bool"]).columns
+            columns = list(usable)
+            ignored = [c for c in chunk.columns if c not in usable]
+            if not columns:
+                raise ValueError("No numeric columns to cluster")
+        X = _numeric(chunk, columns)
+        valid = ~np.isnan(X)
+        if count is None:
+            count, total, sq_total = np.zeros(len(columns)), np.zeros(len(columns)), np.zeros(len(columns))
+        count += valid.sum(axis=0)
+        total += np.where(valid, X, 0.0).sum(axis=0)
+        sq_total += np.where(valid, X ** 2, 0.0).sum(axis=0)
+        rows += len(X)
+        chunk_keys = np.random.default_rng([seed, i]).random(len(X))
+        if sample is None:
+            sample, keys = X, chunk_keys
+        else:
+            sample, keys = np.vstack([sample, X]), np.concatenate([keys, chunk_keys])
+        if len(keys) > SAMPLE_ROWS:
+            keep = np.argpartition(keys, SAMPLE_ROWS)[:SAMPLE_ROWS]
+            sample, keys = sample[keep], keys[keep]
+    if not rows:
+        raise ValueError("The file has no rows")
+    mean = total / np.maximum(count, 1)
+    std = np.sqrt(np.maximum(sq_total / np.maximum(count, 1) - mean ** 2, 0.0))
+    std[std == 0] = 1.0
+    return columns, ignored, mean, std, rows, sample[np.argsort(keys)]
+
+
+def _standardize(X, mean, std):
+    Z = (X - mean) / std
+    Z[np.isnan(Z)] = 0.0
+    return Z
+
+
+def _kmeanspp(sample, k, seed):
+    from sklearn.cluster import KMeans
+    model = KMeans(n_clusters=k, init="k-means++", n_init=1, max_iter=100, random_state=seed).fit(sample)
+    return float(model.inertia_), model.cluster_centers_
+
+
+def birch_threshold(sample, start=0.5, step=1.5):
+    """Smallest threshold in start * step**i giving at most MAX_SUBCLUSTERS subclusters on ``sample``."""
+    from sklearn.cluster import Birch
+    threshold = start
+    while len(Birch(n_clusters=None, threshold=threshold).fit(sample).subcluster_centers_) > MAX_SUBCLUSTERS:
+        threshold *= step
+    return threshold
+
+
+def n_jobs(n_tasks):
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:  # not Linux
+        available = os.cpu_count() or 1
+    return max(1, min(n_tasks, available))
+
+
+def run(path, k=5, method="kmeans", columns=None, n_init=4, max_epochs=5, tol=1e-3,
+        chunksize=CHUNKSIZE, seed=42):
+    """Cluster the CSV at ``path``; yields ("progress", ...) events, then ("result", dict)."""
+    from sklearn.decomposition import PCA
+
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    start = time.perf_counter()
+
+    yield "progress", {"stage": "scan", "status": "started"}
+    columns, ignored, mean, std, rows, sample = scan(path, columns, chunksize, seed)
+    yield "progress", {"stage": "scan", "status": "finished", "rows": rows, "columns": len(columns)}
+    if rows < k:
+        raise ValueError(f"k={k} is larger than the number of rows ({rows})")
+    Z_sample = _standardize(sample, mean, std)
+
+    def batches():
+        for chunk in _chunks(path, chunksize):
+            Z = _standardize(_numeric(chunk, columns), mean, std)
+            for b in range(0, len(Z), BATCH_SIZE):
+                yield Z[b:b + BATCH_SIZE]
+
+    result = {"method": method, "k": k, "rows": rows, "columns": columns, "ignored_columns": ignored}
+    convergence = []
+    if method == "kmeans":
+        from joblib import Parallel, delayed
+        from sklearn.cluster import MiniBatchKMeans
+
+        yield "progress", {"stage": "init", "status": "started", "restarts": n_init}
+        restarts = Parallel(n_jobs=n_jobs(n_init), backend="loky", inner_max_num_threads=1)(
+            delayed(_kmeanspp)(Z_sample, k, seed + r) for r in range(n_init))
+        best_inertia, centers = min(restarts, key=lambda r: r[0])
+        result["init"] = {"restarts": n_init, "sample_rows": len(Z_sample),
+                          "sample_inertia": [round(r[0], 4) for r in restarts]}
+        yield "progress", {"stage": "init", "status": "finished", "sample_inertia": round(best_inertia, 4)}
+
+        model = MiniBatchKMeans(n_clusters=k, init=centers, n_init=1, batch_size=BATCH_SIZE, random_state=seed)
+        converged = False
+        for epoch in range(1, max_epochs + 1):
+            previous = centers.copy()
+            for Z in batches():
+                model.partial_fit(Z)
+            centers = model.cluster_centers_.copy()
+            shift = float(np.linalg.norm(centers - previous, axis=1).max())
+            inertia = float(-model.score(Z_sample))
+            convergence.append({"epoch": epoch, "center_shift": round(shift, 6), "sample_inertia": round(inertia, 4)})
+            yield "progress", {"stage": "fit", "epoch": epoch, "epochs": max_epochs, "center_shift": round(shift, 6)}
+            if shift < tol:
+                converged = True
+                break
+        result["converged"] = converged
+    else:
+        from sklearn.cluster import Birch
+
+        yield "progress", {"stage": "init", "status": "started"}
+        threshold = birch_threshold(Z_sample)
+        result["threshold"] = round(threshold, 4)
+        yield "progress", {"stage": "init", "status": "finished", "threshold": round(threshold, 4)}
+        model = Birch(n_clusters=None, threshold=threshold)
+        yield "progress", {"stage": "fit", "status": "started"}
+        for Z in batches():
+            model.partial_fit(Z)
+        subclusters = len(model.subcluster_centers_)
+        model.set_params(n_clusters=min(k, subclusters))
+        model.partial_fit()  # only the global step: merge the subclusters into k clusters
+        result["subclusters"] = subclusters
+        yield "progress", {"stage": "fit", "status": "finished", "subclusters": subclusters}
+    result["convergence"] = convergence
+
+    # Label every row
+    yield "progress", {"stage": "assign", "status": "started"}
+    n_clusters = k if method == "kmeans" else model.n_clusters
+    sizes = np.zeros(n_clusters, dtype=np.int64)
+    sums = np.zeros((n_clusters, len(columns)))
+    inertia = 0.0
+    for Z in batches():
+        labels = model.predict(Z)
+        sizes += np.bincount(labels, minlength=n_clusters)
+        np.add.at(sums, labels, Z)
+        if method == "kmeans":
+            inertia += float(-model.score(Z))
+    centroids = sums / np.maximum(sizes, 1)[:, None]
+    result["inertia"] = inertia if method == "kmeans" else None
+    result["clusters"] = [
+        {"cluster": c, "size": int(sizes[c]), "fraction": round(float(sizes[c]) / rows, 6),
+         "centroid": {col: float(v) for col, v in zip(columns, centroids[c] * std + mean)}}
+        for c in range(n_clusters)
+    ]
+
+    # 2-D projection of the sample for plotting
+    if len(columns) >= 2:
+        pca = PCA(n_components=2, random_state=seed).fit(Z_sample)
+        points = Z_sample[:PLOT_POINTS]
+        xy = pca.transform(points)
+        result["projection"] = {
+            "explained_variance_ratio": [round(float(v), 4) for v in pca.explained_variance_ratio_],
+            "points": [[round(float(x), 4), round(float(y), 4), int(label)]
+                       for (x, y), label in zip(xy, model.predict(points))],
+            "centroids": [[round(float(x), 4), round(float(y), 4)] for x, y in pca.transform(centroids)],
+        }
+    else:
+        result["projection"] = None
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    yield "progress", {"stage": "assign", "status": "finished"}
+    yield "result", result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--method", choices=METHODS, default="kmeans")
+    parser.add_argument("--columns", default=None, help="comma separated (default: all numeric columns)")
+    parser.add_argument("--n-init", type=int, default=4)
+    parser.add_argument("--max-epochs", type=int, default=5)
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+
+    columns = args.columns.split(",") if args.columns else None
+    for event, data in run(args.path, args.k, args.method, columns, args.n_init, args.max_epochs,
+                           chunksize=args.chunksize):
+        if event == "result":
+            data.pop("projection", None)
+            print(json.dumps(data, indent=2))
+        else:
+            print(json.dumps(data))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+Synthetic large-scale dataset generator matching the project's schemas.
+
+A profile is learned from one of the CSVs in the repo (per-column marginals, a
+Gaussian copula over all columns for pairwise dependencies, and a few
+structural rules) and can then emit arbitrarily many rows in fixed-size chunks.
+No source row is ever copied: numeric values come from the learned quantile
+functions, identifiers are regenerated and free text is rebuilt from tokens or
+digit-randomised templates.
+
+Learned structure:
+    - marginals: quantile functions (continuous), value frequencies
+      (discrete / categorical) and missing rates
+    - Gaussian copula over every modelled column (e.g. Sex <-> Survived,
+      alcohol <-> quality)
+    - zero rules: "if CryoSleep is True then spending is 0"
+    - PassengerId group structure (``gggg_pp``) with group-shared columns
+      (HomePlanet, Cabin deck/side, surname, ...)
+    - composite ``Cabin`` values in ``Deck/Num/Side`` format
+
+Chunks use seeds derived from ``(seed, chunk_index)`` so output is
+deterministic and memory stays bounded by ``chunk_size``.
+
+Examples:
+    python datagen.py --schema spaceship --rows 10000000 --out big_spaceship.csv
+    python datagen.py --schema wine --rows 1000000 --out wine.parquet --format parquet
+    python datagen.py --source my.csv --save-profile my_profile.json
+"""
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SOURCES = {
+    "titanic": os.path.join(BASE_DIR, "data", "titanic", "train.csv"),
+    "spaceship": os.path.join(BASE_DIR, "Spaceship_Titanic", "data", "train.csv"),
+    "wine": os.path.join(BASE_DIR, "winequality-red.csv"),
+}
+
+N_QUANTILES = 513
+MAX_CATEGORIES = 50
+MAX_TEMPLATES = 1000
+
+GROUP_ID_RE = re.compile(r"^\d+_\d+$")
+CABIN_RE = re.compile(r"^[A-Z]/\d+/[A-Z]$")
+
+
+# ---------------------------------------------------------------------------
+# Learning
+# ---------------------------------------------------------------------------
+
+def _native(v):
+    """Convert numpy scalars to JSON-friendly Python values."""
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+
+def _decimals(s):
+    for d in range(5):
+        if np.allclose(s, s.round(d)):
+            return d
+    return None
+
+
+def _dtype(s):
+    if pd.api.types.is_bool_dtype(s):
+        return "bool"
+    if pd.api.types.is_integer_dtype(s):
+        return "int"
+    if pd.api.types.is_float_dtype(s):
+        return "float"
+    return "object"
+
+
+def _categorical(s):
+    counts = s.dropna().value_counts(normalize=True)
+    return {"kind": "categorical",
+            "values": [_native(v) for v in counts.index],
+            "probs": counts.values.tolist()}
+
+
+def _numeric(s):
+    values = s.dropna().astype(float)
+    if s.nunique() <= 30 and np.allclose(values, values.round()):
+        counts = values.value_counts(normalize=True).sort_index()
+        return {"kind": "discrete", "values": counts.index.tolist(), "probs": counts.values.tolist()}
+    levels = np.linspace(0, 1, N_QUANTILES)
+    return {"kind": "continuous",
+            "levels": levels.tolist(),
+            "quantiles": np.quantile(values, levels).tolist(),
+            "decimals": _decimals(values)}
+
+
+def _name_spec(s):
+    names = s.dropna().astype(str)
+    if names.str.contains(",").mean() > 0.9:
+        # Titanic style: "Surname, Title. Given names"
+        parts = names.str.extract(r"^([^,]+),\s*([^.]+\.)\s*(.*)$")
+        spec = {"kind": "name", "style": "surname_title",
+                "surnames": sorted(parts[0].dropna().unique().tolist()),
+                "given": sorted(set(" ".join(parts[2].dropna()).replace('"', "").replace("(", "").replace(")", "").split()))}
+        return spec, parts[1]
+    split = names.str.split(n=1, expand=True)
+    return {"kind": "name", "style": "first_last",
+            "first": sorted(split[0].dropna().unique().tolist()),
+            "surnames": sorted(split[1].dropna().unique().tolist())}, None
+
+
+def _template_spec(s):
+    values = s.dropna().astype(str)
+    sample = values.sample(min(len(values), MAX_TEMPLATES), random_state=0)
+    return {"kind": "template", "templates": sample.tolist()}
+
+
+def learn_profile(df, name=None):
+    """Learn a generation profile from a DataFrame. The result is JSON-serialisable."""
+    df = df.copy()
+    profile = {"name": name, "n_source_rows": len(df), "columns": {}, "order": list(df.columns),
+               "composites": {}, "zero_rules": [], "groups": None}
+    cols = profile["columns"]
+
+    for col in list(df.columns):
+        s = df[col]
+        dtype = _dtype(s)
+        missing = float(s.isna().mean())
+        non_null = s.dropna()
+        as_str = non_null.astype(str)
+
+        if dtype == "object" and len(non_null) and as_str.str.match(GROUP_ID_RE).mean() > 0.99:
+            group = as_str.str.split("_").str[0]
+            sizes = group.value_counts().value_counts(normalize=True).sort_index()
+            profile["groups"] = {"id_column": col, "sizes": sizes.index.tolist(),
+                                 "probs": sizes.values.tolist(), "shared": []}
+            df["__group"] = s.astype(str).str.split("_").str[0]
+            cols[col] = {"kind": "group_id", "dtype": dtype, "missing": 0.0}
+        elif dtype == "int" and s.is_unique and s.is_monotonic_increasing:
+            cols[col] = {"kind": "sequence", "dtype": dtype, "missing": 0.0, "start": int(s.iloc[0])}
+        elif dtype == "object" and len(non_null) and as_str.str.match(CABIN_RE).mean() > 0.9:
+            parts = s.str.split("/", expand=True)
+            names = [f"{col}__deck", f"{col}__num", f"{col}__side"]
+            df[names[0]], df[names[2]] = parts[0], parts[2]
+            df[names[1]] = pd.to_numeric(parts[1], errors="coerce")
+            cols[names[0]] = {**_categorical(df[names[0]]), "dtype": "object", "missing": 0.0}
+            cols[names[1]] = {**_numeric(df[names[1]]), "dtype": "int", "missing": 0.0}
+            cols[names[2]] = {**_categorical(df[names[2]]), "dtype": "object", "missing": 0.0}
+            profile["composites"][col] = {"parts": names, "missing": missing}
+            cols[col] = {"kind": "composite", "dtype": dtype, "missing": missing}
+        elif col.lower() == "name" and dtype == "object":
+            spec, titles = _name_spec(s)
+            cols[col] = {**spec, "dtype": dtype, "missing": missing}
+            if titles is not None:
+                df["__title"] = titles
+                cols["__title"] = {**_categorical(titles), "dtype": "object", "missing": 0.0}
+                cols[col]["title_column"] = "__title"
+            if spec["style"] == "first_last":
+                df["__surname"] = s.str.split(n=1).str[1]
+        elif dtype in ("int", "float"):
+            cols[col] = {**_numeric(s), "dtype": dtype, "missing": missing}
+        elif non_null.nunique() <= MAX_CATEGORIES:
+            cols[col] = {**_categorical(s), "dtype": dtype, "missing": missing}
+        else:
+            cols[col] = {**_template_spec(s), "dtype": dtype, "missing": missing}
+
+    # Gaussian copula over every marginal we sample directly
+    copula_cols = [c for c, spec in cols.items() if spec["kind"] in ("continuous", "discrete", "categorical")]
+    rng = np.random.default_rng(0)
+    scores = np.column_stack([_normal_scores(df[c], cols[c], rng) for c in copula_cols])
+    corr = np.corrcoef(scores, rowvar=False)
+    profile["copula"] = {"columns": copula_cols, "corr": _nearest_psd(corr).tolist()}
+
+    profile["zero_rules"] = _learn_zero_rules(df, cols)
+    if profile["groups"]:
+        profile["groups"]["shared"] = _learn_shared(df, cols)
+    return profile
+
+
+def _normal_scores(s, spec, rng):
+    """Map a column to standard normal scores (randomised within ties / categories)."""
+    n = len(s)
+    out = np.zeros(n)
+    mask = s.notna().values
+    if spec["kind"] == "continuous":
+        ranks = s[mask].rank(method="average").values
+        out[mask] = ndtri(ranks / (mask.sum() + 1))
+        return out
+    values = spec["values"]
+    cum = np.concatenate([[0.0], np.cumsum(spec["probs"])])
+    lookup = {v: i for i, v in enumerate(values)}
+    idx = s[mask].map(lambda v: lookup.get(_native(v), 0)).values.astype(int)
+    u = cum[idx] + rng.random(len(idx)) * (cum[idx + 1] - cum[idx])
+    out[mask] = ndtri(np.clip(u, 1e-6, 1 - 1e-6))
+    return out
+
+
+def _nearest_psd(corr, eps=1e-6):
+    corr = np.nan_to_num(corr)
+    np.fill_diagonal(corr, 1.0)
+    w, v = np.linalg.eigh(corr)
+    corr = v @ np.diag(np.clip(w, eps, None)) @ v.T
+    d = np.sqrt(np.diag(corr))
+    return corr / np.outer(d, d)
+
+
+def _learn_zero_rules(df, cols, min_support=30, threshold=0.99):
+    """Find 'column == value implies numeric is 0' rules (e.g. CryoSleep => no spending)."""
+    rules = []
+    numeric = [c for c, s in cols.items() if s["kind"] == "continuous" and not c.startswith("__")]
+    for col, spec in cols.items():
+        if spec["kind"] != "categorical" or len(spec["values"]) > 5 or col.startswith("__"):
+            continue
+        for value in spec["values"]:
+            rows = df[col] == value
+            if rows.sum() < min_support:
+                continue
+            zeroed = [n for n in numeric
+                      if (df.loc[rows, n].dropna() == 0).mean() >= threshold and (df[n].dropna() == 0).mean() < 0.9]
+            if zeroed:
+                rules.append({"column": col, "value": _native(value), "zero": zeroed})
+    return rules
+
+
+def _learn_shared(df, cols, threshold=0.8):
+    """Columns whose value is (almost) always identical within a multi-member group."""
+    multi = df[df.groupby("__group")["__group"].transform("size") > 1]
+    candidates = [c for c, s in cols.items() if s["kind"] in ("categorical", "discrete") and c != "__title"]
+    if "__surname" in df:
+        candidates.append("__surname")
+    shared = []
+    for col in candidates:
+        same = multi.groupby("__group")[col].nunique(dropna=True) <= 1
+        if len(same) and same.mean() >= threshold:
+            shared.append(col)
+    return shared
+
+
+# ---------------------------------------------------------------------------
+# Generation
+# ---------------------------------------------------------------------------
+
+def _sample_marginal(spec, u):
+    if spec["kind"] == "continuous":
+        values = np.interp(u, spec["levels"], spec["quantiles"])
+        if spec.get("decimals") is not None:
+            values = values.round(spec["decimals"])
+        return values
+    cum = np.cumsum(spec["probs"])
+    idx = np.minimum(np.searchsorted(cum, u * cum[-1], side="right"), len(cum) - 1)
+    return np.asarray(spec["values"], dtype=object if spec["kind"] == "categorical" else float)[idx]
+
+
+def _fill_template(templates, rng, n):
+    """Pick observed templates and randomise every digit (e.g. tickets 'A/5 21171')."""
+    picks = rng.integers(0, len(templates), n)
+    out = np.empty(n, dtype=object)
+    for t_idx in np.unique(picks):
+        rows = np.flatnonzero(picks == t_idx)
+        template = templates[t_idx]
+        fmt = re.sub(r"\d", "{}", template.replace("{", "{{").replace("}", "}}"))
+        n_digits = sum(ch.isdigit() for ch in template)
+        digits = rng.integers(0, 10, (len(rows), n_digits))
+        out[rows] = [fmt.format(*d) for d in digits]
+    return out
+
+
+def _group_layout(profile, rng, n):
+    """Sample group sizes for a chunk; return (group index per row, member number per row)."""
+    spec = profile["groups"]
+    sizes = []
+    total = 0
+    while total < n:
+        batch = rng.choice(spec["sizes"], size=max(16, (n - total) // 2), p=spec["probs"])
+        sizes.extend(batch.tolist())
+        total += int(batch.sum())
+    sizes = np.asarray(sizes)
+    group = np.repeat(np.arange(len(sizes)), sizes)[:n]
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    member = np.arange(n) - starts[group] + 1
+    return group, member
+
+
+def generate_chunk(profile, n, seed, chunk_index=0, start_row=0):
+    """Generate ``n`` rows; deterministic for a given (seed, chunk_index)."""
+    rng = np.random.default_rng([seed, chunk_index])
+    cols = profile["columns"]
+    data = {}
+
+    copula = profile["copula"]
+    if copula["columns"]:
+        chol = np.linalg.cholesky(np.asarray(copula["corr"]))
+        u = ndtr(rng.standard_normal((n, len(copula["columns"]))) @ chol.T)
+        for j, col in enumerate(copula["columns"]):
+            data[col] = _sample_marginal(cols[col], u[:, j])
+
+    for rule in profile["zero_rules"]:
+        rows = data[rule["column"]] == rule["value"]
+        for col in rule["zero"]:
+            data[col] = np.where(rows, 0.0, data[col])
+
+    group = member = None
+    if profile["groups"]:
+        group, member = _group_layout(profile, rng, n)
+        leader = np.flatnonzero(member == 1)[group]
+        for col in profile["groups"]["shared"]:
+            if col in data:
+                data[col] = data[col][leader]
+
+    for col, spec in cols.items():
+        kind = spec["kind"]
+        if kind == "sequence":
+            data[col] = np.arange(spec["start"] + start_row, spec["start"] + start_row + n)
+        elif kind == "group_id":
+            width = max(4, len(str(start_row + n)))
+            gid = pd.Series(group + start_row + 1).astype(str).str.zfill(width)
+            data[col] = (gid + "_" + pd.Series(member).astype(str).str.zfill(2)).values
+        elif kind == "template":
+            data[col] = _fill_template(spec["templates"], rng, n)
+        elif kind == "name":
+            surnames = np.asarray(spec["surnames"], dtype=object)[rng.integers(0, len(spec["surnames"]), n)]
+            if spec["style"] == "surname_title":
+                given = np.asarray(spec["given"], dtype=object)
+                first = pd.Series(given[rng.integers(0, len(given), n)])
+                second = pd.Series(given[rng.integers(0, len(given), n)])
+                two = rng.random(n) < 0.5
+                first = first.where(~two, first + " " + second)
+                titles = pd.Series(data.pop(spec["title_column"]))
+                data[col] = (pd.Series(surnames) + ", " + titles + " " + first).values
+            else:
+                if group is not None and "__surname" in profile["groups"]["shared"]:
+                    surnames = surnames[np.flatnonzero(member == 1)[group]]
+                first = np.asarray(spec["first"], dtype=object)[rng.integers(0, len(spec["first"]), n)]
+                data[col] = (pd.Series(first) + " " + pd.Series(surnames)).values
+
+    for col, comp in profile["composites"].items():
+        deck, num, side = (data.pop(p) for p in comp["parts"])
+        data[col] = (pd.Series(deck) + "/" + pd.Series(num.astype(int)).astype(str) + "/" + pd.Series(side)).values
+
+    out = {}
+    for col in profile["order"]:
+        spec = cols[col]
+        values = np.asarray(data[col])
+        miss = profile["composites"][col]["missing"] if col in profile["composites"] else spec["missing"]
+        if miss:
+            values = values.astype(float if values.dtype.kind in "fiu" else object)
+            values[rng.random(n) < miss] = np.nan
+        out[col] = _restore_dtype(pd.Series(values), spec["dtype"])
+    return pd.DataFrame(out)
+
+
+def _restore_dtype(s, dtype):
+    if dtype == "bool":
+        return s.astype(bool)
+    if dtype == "int":
+        return s.astype("int64") if s.notna().all() else s.astype(float)
+    if dtype == "float":
+        return s.astype(float)
+    return s
+
+
+def generate(profile, n_rows, chunk_size=100_000, seed=0):
+    """Yield DataFrame chunks totalling ``n_rows`` rows."""
+    for chunk_index, start in enumerate(range(0, n_rows, chunk_size)):
+        n = min(chunk_size, n_rows - start)
+        yield generate_chunk(profile, n, seed, chunk_index, start)
+
+
+def generate_frame(schema, n_rows, seed=0, chunk_size=100_000):
+    """Convenience: learn the profile for a built-in schema and return one DataFrame."""
+    return pd.concat(generate(load_profile(schema), n_rows, chunk_size, seed), ignore_index=True)
+
+
+def write(profile, n_rows, path, fmt=None, chunk_size=100_000, seed=0):
+    """Stream generated rows to CSV or Parquet without holding more than one chunk."""
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+    writer = None
+    try:
+        for i, chunk in enumerate(generate(profile, n_rows, chunk_size, seed)):
+            if fmt == "csv":
+                chunk.to_csv(path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+_PROFILE_CACHE = {}
+
+
+def load_profile(schema_or_path):
+    """Profile for a built-in schema name, a source CSV, or a saved profile JSON."""
+    if schema_or_path in _PROFILE_CACHE:
+        return _PROFILE_CACHE[schema_or_path]
+    if schema_or_path.endswith(".json"):
+        with open(schema_or_path, encoding="utf-8") as f:
+            profile = json.load(f)
+    else:
+        path = SOURCES.get(schema_or_path, schema_or_path)
+        profile = learn_profile(pd.read_csv(path), name=schema_or_path)
+    _PROFILE_CACHE[schema_or_path] = profile
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--schema", choices=sorted(SOURCES))
+    source.add_argument("--source", help="CSV to learn from, or a saved profile .json")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--out", help="output .csv or .parquet path")
+    parser.add_argument("--format", choices=["csv", "parquet"])
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-profile", help="write the learned profile as JSON")
+    args = parser.parse_args()
+
+    profile = load_profile(args.schema or args.source)
+    if args.save_profile:
+        with open(args.save_profile, "w", encoding="utf-8") as f:
+            json.dump(profile, f)
+        print(f"Profile saved to {args.save_profile}")
+    if args.out:
+        write(profile, args.rows, args.out, args.format, args.chunk_size, args.seed)
+        print(f"Wrote {args.rows:,} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Feature importances for the model trained by /model.
+
+Impurity importances come free with the random forest and are returned with
+the training result. Permutation importances need one re-prediction per
+(feature, repeat), so they run afterwards in a separate low-priority process:
+
+    python importances.py uploads/models/<key>.pkl --out uploads/models/<key>.importances.json
+
+The bundle holds the fitted model and a held-out sample of at most
+MAX_EVAL_ROWS rows (``save_bundle``, called by the training script). The
+(feature, repeat) pairs are spread over ``--n-jobs`` worker processes one
+repeat at a time. Before another repeat, and in the workers before another
+feature, the job checks that it still fits in ``--budget`` seconds, so a wide
+dataset returns fewer repeats (or, past the budget within the first one, some
+features without a score) instead of running late: ``repeats_done``,
+``truncated`` and each feature's ``repeats`` say so.
+
+The default CPU budget (``cpu_budget``) is half of the cores this process may
+use, or IMPORTANCE_CPUS; workers are limited to one BLAS/OpenMP thread each.
+"""
+import argparse
+import json
+import math
+import os
+import pickle
+import tempfile
+import time
+
+MAX_EVAL_ROWS = int(os.environ.get("IMPORTANCE_MAX_ROWS", "2000"))
+TIME_BUDGET = float(os.environ.get("IMPORTANCE_BUDGET_SECONDS", "60"))
+N_REPEATS = int(os.environ.get("IMPORTANCE_REPEATS", "5"))
+NICENESS = 10
+
+
+def cpu_budget():
+    if os.environ.get("IMPORTANCE_CPUS"):
+        return max(1, int(os.environ["IMPORTANCE_CPUS"]))
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:  # not Linux
+        available = os.cpu_count() or 1
+    return max(1, available // 2)
+
+
+def impurity(model, feature_names):
+    """{feature: mean decrease in impurity}, largest first."""
+    values = getattr(model, "feature_importances_", None)
+    if values is None:
+        return {}
+    pairs = sorted(zip(feature_names, values), key=lambda p: p[1], reverse=True)
+    return {name: round(float(value), 6) for name, value in pairs}
+
+
+def save_bundle(path, model, X_test, y_test, is_classification, max_rows=MAX_EVAL_ROWS, seed=42):
+    """Pickle the model with a sample of the evaluation split for the permutation job."""
+    if len(X_test) > max_rows:
+        X_test = X_test.sample(max_rows, random_state=seed)
+        y_test = y_test.loc[X_test.index]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    _atomic_write(path, pickle.dumps({"model": model, "X": X_test, "y": y_test,
+                                      "is_classification": bool(is_classification)}))
+
+
+def _atomic_write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _score(model, X, y, is_classification):
+    from sklearn.metrics import accuracy_score, r2_score
+    pred = model.predict(X)
+    return accuracy_score(y, pred) if is_classification else r2_score(y, pred)
+
+
+def _permuted_scores(model, X, y, is_classification, tasks, seed, deadline=math.inf):
+    """Score after shuffling one column, for each (repeat, column) in ``tasks``.
+
+    Stops early when the next column would likely end after ``deadline`` (time.time()).
+    """
+    import numpy as np
+    scores = []
+    X = X.copy()
+    start = time.time()
+    for repeat, column in tasks:
+        if scores and time.time() + (time.time() - start) / len(scores) > deadline:
+            break
+        original = X[column].to_numpy()
+        rng = np.random.default_rng([seed, repeat, X.columns.get_loc(column)])
+        X[column] = rng.permutation(original)
+        scores.append((repeat, column, _score(model, X, y, is_classification)))
+        X[column] = original
+    return scores
+
+
+def permutation(model, X, y, is_classification, n_repeats=N_REPEATS, time_budget=TIME_BUDGET,
+                n_jobs=None, seed=42):
+    """Mean/std drop in score per feature when it is shuffled, over up to ``n_repeats`` repeats."""
+    import numpy as np
+    from joblib import Parallel, delayed
+
+    n_jobs = n_jobs or cpu_budget()
+    start = time.perf_counter()
+    baseline = _score(model, X, y, is_classification)
+    columns = list(X.columns)
+    # Enough batches to keep every worker busy, few enough that the model is not pickled per feature
+    batch = max(1, math.ceil(len(columns) / n_jobs))
+    drops = {column: [] for column in columns}
+    repeats_done = 0
+    with Parallel(n_jobs=n_jobs, backend="loky", inner_max_num_threads=1) as parallel:
+        for repeat in range(n_repeats):
+            elapsed = time.perf_counter() - start
+            per_repeat = elapsed / repeats_done if repeats_done else 0.0
+            if repeats_done and elapsed + per_repeat > time_budget:
+                break
+            tasks = [(repeat, column) for column in columns]
+            batches = [tasks[i:i + batch] for i in range(0, len(tasks), batch)]
+            deadline = time.time() + time_budget - (time.perf_counter() - start)
+            done = 0
+            for scores in parallel(delayed(_permuted_scores)(model, X, y, is_classification, b, seed, deadline)
+                                   for b in batches):
+                for _, column, score in scores:
+                    drops[column].append(baseline - score)
+                done += len(scores)
+            if done < len(tasks):
+                break
+            repeats_done += 1
+
+    features = sorted(({"feature": column, "repeats": len(values),
+                        "mean": round(float(np.mean(values)), 6) if values else None,
+                        "std": round(float(np.std(values)), 6) if values else None}
+                       for column, values in drops.items()),
+                      key=lambda f: -math.inf if f["mean"] is None else f["mean"], reverse=True)
+    return {
+        "scoring": "accuracy" if is_classification else "r2",
+        "baseline": round(float(baseline), 6),
+        "eval_rows": len(X),
+        "repeats_done": repeats_done,
+        "truncated": repeats_done < n_repeats,
+        "n_jobs": n_jobs,
+        "seconds": round(time.perf_counter() - start, 3),
+        "features": features,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("bundle", help="pickle written by save_bundle")
+    parser.add_argument("--out", required=True, help="JSON result (written atomically)")
+    parser.add_argument("--repeats", type=int, default=N_REPEATS)
+    parser.add_argument("--budget", type=float, default=TIME_BUDGET, help="seconds")
+    parser.add_argument("--n-jobs", type=int, default=None, help="worker processes (default: cpu_budget())")
+    args = parser.parse_args()
+
+    if hasattr(os, "nice"):
+        os.nice(NICENESS)  # never compete with the API for CPU
+    with open(args.bundle, "rb") as f:
+        bundle = pickle.load(f)
+    try:
+        result = permutation(bundle["model"], bundle["X"], bundle["y"], bundle["is_classification"],
+                             n_repeats=args.repeats, time_budget=args.budget, n_jobs=args.n_jobs)
+        result["status"] = "done"
+    except Exception as e:
+        result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+    _atomic_write(args.out, json.dumps(result).encode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Out-of-core training for /model on CSVs that do not fit in memory.
+
+The file is streamed with ``pd.read_csv(chunksize=...)`` and never loaded whole:
+
+1. ``scan`` makes one pass to learn the encoding state: mean/std per numeric
+   column (for imputation and scaling), the most frequent categories per text
+   column (one-hot, rarer values share an "other" slot) and the target's
+   classes, which also decide classification vs. regression the same way the
+   in-memory script does (< 20 unique values or a text target)
+2. every row is assigned to train or test by a seeded draw per chunk
+   (``default_rng([seed, chunk_index])``), so the split is reproducible
+   without knowing the row count up front
+3. ``train`` feeds the encoded train rows of each chunk to ``partial_fit``
+   estimators (SGD, naive Bayes) for ``epochs`` passes, then streams the test
+   rows once and accumulates accuracy or MSE/R2
+
+Peak memory is one chunk plus the encoder state, whatever the file size.
+The results dict has the same keys as the in-memory script's, plus
+``mode``, ``rows`` and per-candidate scores.
+
+Example:
+    python incremental.py uploads/big.csv --target Transported --chunksize 100000
+"""
+import argparse
+import json
+import os
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+
+CHUNKSIZE = 50_000
+TEST_SIZE = 0.2
+MAX_CATEGORIES = 20     # one-hot slots per text column (plus one for "other")
+MAX_CLASSES = 20        # same threshold the in-memory script uses
+
+
+def _candidates(is_classification):
+    from sklearn.linear_model import SGDClassifier, SGDRegressor
+    from sklearn.naive_bayes import GaussianNB
+
+    if is_classification:
+        # average=True (averaged SGD) is much less sensitive to the step size
+        return {
+            "SGDClassifier": SGDClassifier(loss="log_loss", alpha=1e-4, average=True, random_state=42),
+            "GaussianNB": GaussianNB(),
+        }
+    return {
+        "SGDRegressor": SGDRegressor(alpha=1e-4, average=True, random_state=42),
+        "SGDRegressor(huber)": SGDRegressor(loss="huber", alpha=1e-4, average=True, random_state=42),
+    }
+
+
+def _chunks(path, chunksize):
+    return pd.read_csv(path, chunksize=chunksize, low_memory=False)
+
+
+def _split_mask(n_rows, chunk_index, seed, test_size=TEST_SIZE):
+    return np.random.default_rng([seed, chunk_index]).random(n_rows) < test_size
+
+
+class StreamEncoder:
+    """Encoding state learned in one pass: impute + standardise numbers, one-hot text."""
+
+    def __init__(self, target):
+        self.target = target
+        self.numeric = {}       # column -> (mean, std)
+        self.categories = {}    # column -> [category, ...]
+        self.classes = None     # sorted target classes, None for regression
+        self.target_is_text = False
+        self.target_mean = 0.0
+        self.target_std = 1.0
+        self.rows = 0
+
+    @property
+    def is_classification(self):
+        return self.classes is not None
+
+    def fit(self, chunks):
+        sums, sq_sums, counts = {}, {}, {}
+        value_counts = {}
+        targets = set()
+        target_is_text = False
+        y_sum = y_sq_sum = 0.0
+        y_count = 0
+
+        for chunk in chunks:
+            if self.target not in chunk:
+                raise ValueError(f"Target column '{self.target}' not found")
+            self.rows += len(chunk)
+            y = chunk[self.target]
+            X = chunk.drop(columns=[self.target])
+            for col in X.columns:
+                values = X[col]
+                if pd.api.types.is_numeric_dtype(values) and col not in value_counts:
+                    values = values.astype(float)
+                    sums[col] = sums.get(col, 0.0) + values.sum()
+                    sq_sums[col] = sq_sums.get(col, 0.0) + (values ** 2).sum()
+                    counts[col] = counts.get(col, 0) + values.count()
+                else:
+                    # A column is text as soon as one chunk says so
+                    for d in (sums, sq_sums, counts):
+                        d.pop(col, None)
+                    vc = values.astype(str).value_counts()
+                    value_counts[col] = value_counts[col].add(vc, fill_value=0) if col in value_counts else vc
+                    # Keep the tally bounded for ID-like columns
+                    if len(value_counts[col]) > 50 * MAX_CATEGORIES:
+                        value_counts[col] = value_counts[col].nlargest(10 * MAX_CATEGORIES)
+
+            if not pd.api.types.is_numeric_dtype(y) or pd.api.types.is_bool_dtype(y):
+                target_is_text = True
+            if len(targets) <= MAX_CLASSES:
+                targets.update(y.dropna().unique().tolist())
+            if pd.api.types.is_numeric_dtype(y):
+                y_num = y.astype(float).dropna()
+                y_sum += y_num.sum()
+                y_sq_sum += (y_num ** 2).sum()
+                y_count += len(y_num)
+
+        for col, n in counts.items():
+            mean = sums[col] / n if n else 0.0
+            var = sq_sums[col] / n - mean ** 2 if n else 0.0
+            self.numeric[col] = (mean, float(np.sqrt(var)) if var > 1e-12 else 1.0)
+        for col, vc in value_counts.items():
+            self.categories[col] = vc.nlargest(MAX_CATEGORIES).index.tolist()
+
+        if len(targets) < MAX_CLASSES or target_is_text:
+            # Text/bool labels are compared as strings so mixed chunk dtypes agree
+            self.classes = (np.array(sorted({str(t) for t in targets})) if target_is_text
+                            else np.array(sorted(targets)))
+            self.target_is_text = target_is_text
+        elif y_count:
+            self.target_mean = y_sum / y_count
+            var = y_sq_sum / y_count - self.target_mean ** 2
+            self.target_std = float(np.sqrt(var)) if var > 1e-12 else 1.0
+        return self
+
+    @property
+    def n_features(self):
+        return len(self.numeric) + sum(len(c) + 1 for c in self.categories.values())
+
+    def transform(self, chunk):
+        """Return (X, y) as float arrays; rows with a missing target are dropped."""
+        chunk = chunk[chunk[self.target].notna()]
+        X = np.zeros((len(chunk), self.n_features), dtype=np.float32)
+        j = 0
+        for col, (mean, std) in self.numeric.items():
+            values = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=float) if col in chunk else np.full(len(chunk), mean)
+            X[:, j] = (np.where(np.isnan(values), mean, values) - mean) / std
+            j += 1
+        for col, cats in self.categories.items():
+            codes = pd.Index(cats).get_indexer(chunk[col].astype(str)) if col in chunk else np.full(len(chunk), -1)
+            codes = np.where(codes < 0, len(cats), codes)  # unseen/rare -> "other"
+            X[np.arange(len(chunk)), j + codes] = 1.0
+            j += len(cats) + 1
+
+        y = chunk[self.target]
+        if self.is_classification:
+            y = y.astype(str).to_numpy() if self.target_is_text else y.to_numpy()
+        else:
+            y = (y.to_numpy(dtype=float) - self.target_mean) / self.target_std
+        return X, y
+
+
+def _report_rows(chunks, progress, stage, **fields):
+    """Pass chunks through, calling ``progress(stage, rows=...)`` after each one."""
+    rows = 0
+    for chunk in chunks:
+        yield chunk
+        rows += len(chunk)
+        if progress is not None:
+            progress(stage, rows=rows, **fields)
+
+
+def scan(path, target, chunksize=CHUNKSIZE, progress=None):
+    return StreamEncoder(target).fit(_report_rows(_chunks(path, chunksize), progress, "scan"))
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def train(path, target, chunksize=CHUNKSIZE, epochs=2, seed=42, progress=None):
+    """Stream ``path`` and train the partial_fit candidates; return the results dict.
+
+    ``progress(stage, **fields)``, if given, is called after every chunk.
+    """
+    start = time.perf_counter()
+    encoder = scan(path, target, chunksize, progress)
+    scan_seconds = time.perf_counter() - start
+    models = _candidates(encoder.is_classification)
+
+    # 1. Training passes over the train rows of every chunk
+    fit_start = time.perf_counter()
+    for epoch in range(epochs):
+        chunks = _report_rows(_chunks(path, chunksize), progress, "fit", epoch=epoch + 1, epochs=epochs,
+                              total_rows=encoder.rows)
+        for i, chunk in enumerate(chunks):
+            test_mask = _split_mask(len(chunk), i, seed)
+            X, y = encoder.transform(chunk[~test_mask])
+            if len(y) == 0:
+                continue
+            for model in models.values():
+                if encoder.is_classification:
+                    model.partial_fit(X, y, classes=encoder.classes)
+                else:
+                    model.partial_fit(X, y)
+    fit_seconds = time.perf_counter() - fit_start
+
+    # 2. One streaming pass over the held-out rows
+    n_test = 0
+    correct = dict.fromkeys(models, 0)
+    sq_err = dict.fromkeys(models, 0.0)
+    y_sum = y_sq_sum = 0.0
+    chunks = _report_rows(_chunks(path, chunksize), progress, "evaluate", total_rows=encoder.rows)
+    for i, chunk in enumerate(chunks):
+        test_mask = _split_mask(len(chunk), i, seed)
+        X, y = encoder.transform(chunk[test_mask])
+        if len(y) == 0:
+            continue
+        n_test += len(y)
+        if not encoder.is_classification:
+            y = y * encoder.target_std + encoder.target_mean
+            y_sum += y.sum()
+            y_sq_sum += (y ** 2).sum()
+        for name, model in models.items():
+            pred = model.predict(X)
+            if encoder.is_classification:
+                correct[name] += int((pred == y).sum())
+            else:
+                pred = pred * encoder.target_std + encoder.target_mean
+                sq_err[name] += float(((y - pred) ** 2).sum())
+
+    results = {"mode": "incremental", "rows": encoder.rows, "test_rows": n_test,
+               "epochs": epochs, "chunksize": chunksize, "fit_seconds": fit_seconds,
+               "scan_seconds": scan_seconds}
+    if encoder.is_classification:
+        scores = {name: correct[name] / n_test if n_test else 0.0 for name in models}
+        best = max(scores, key=scores.get)
+        results.update({"type": "Classification", "accuracy": scores[best], "model": best,
+                        "candidates": {name: {"accuracy": s} for name, s in scores.items()}})
+    else:
+        total_ss = y_sq_sum - y_sum ** 2 / n_test if n_test else 0.0
+        scores = {name: {"mse": sq_err[name] / n_test if n_test else 0.0,
+                         "r2": 1 - sq_err[name] / total_ss if total_ss > 0 else 0.0}
+                  for name in models}
+        best = min(scores, key=lambda name: scores[name]["mse"])
+        results.update({"type": "Regression", "mse": scores[best]["mse"], "r2": scores[best]["r2"],
+                        "model": best, "candidates": scores})
+    results["peak_rss_mb"] = _peak_rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train partial_fit models on a CSV streamed in chunks.")
+    parser.add_argument("path")
+    parser.add_argument("--target", required=True)
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        parser.error(f"{args.path} not found")
+    print(json.dumps(train(args.path, args.target, args.chunksize, args.epochs, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
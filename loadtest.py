@@ -0,0 +1,515 @@
+"""
+Load test of the whole app on localhost, with synthetic data only.
+
+Three services are started as local processes (or ``--no-start`` uses ones
+already running at the ``--*-url`` addresses):
+
+    frontend   the Flask page (app.py) serving templates/ and static/
+    api        the FastAPI backend (api.py), run in a scratch working directory
+               so its uploads/ never touch the repository
+    predictor  the Titanic predictor (web_app.py) behind serve_prefork.py,
+               serving a voting ensemble (train_and_save_model.py,
+               ``--predictor-backend``) trained on PREDICTOR_ROWS synthetic
+               rows and published to a scratch model registry
+
+and driven by two kinds of traffic at once:
+
+1. flow users: each virtual user repeats what static/script.js does in the
+   browser — load the page and its assets, upload a CSV (datagen.py Titanic
+   rows, one of ``--datasets`` different files), analyze, visualize (and fetch
+   the plot PNGs), preprocess and train a model — with an exponential think
+   time between steps. A flow stops at its first failed step. How many users
+   are active follows ``--profile``:
+       constant  ``--users`` from the start
+       ramp      0 to ``--users`` linearly over the first half of the run
+       step      ``--users`` / 4 more every quarter of the run
+       spike     one user, ``--users`` during the middle third, one again
+2. predictions: single-passenger POST /predict calls to the predictor as an
+   open-loop Poisson process at ``--predict-rate`` per second, rising to
+   ``--burst-rate`` for ``--burst-length`` seconds every ``--burst-every``
+   seconds. Arrivals are sent whether or not earlier calls have returned (up
+   to ``--max-in-flight``; arrivals beyond that are counted as dropped), so
+   queueing in the server shows up as latency instead of a lower send rate.
+
+A request counts as an error on a connection error, a timeout, an HTTP status
+of 400 or more, an SSE "error" event, or a /model result with an "error"
+field. Requests send ``Cache-Control: no-cache`` with ``--cold``, so the
+result cache does not answer repeated datasets.
+
+The report has, per (service, step), requests, error rate, throughput and
+p50/p90/p99/max latency, and a timeline (every ``--interval`` seconds) of
+active users, requests/s, errors, p95 latency and the RSS/PSS of each
+service's process tree (workers and training subprocesses included, read from
+/proc as in serve_prefork.py). It is printed and saved as JSON to
+benchmark_results/.
+
+api.py keeps the current dataset in one process-wide variable, so concurrent
+flow users overwrite each other's upload; all datasets share the Titanic
+columns, so the flow still completes, but what a user trains on may be
+another user's file.
+
+Requires httpx.
+
+Examples:
+    python loadtest.py                                  # 4 users, ramp, 60 s
+    python loadtest.py --users 16 --profile step --duration 300 --cold
+    python loadtest.py --users 0 --predict-rate 20 --burst-rate 200 --predict-workers 2
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark import BASE_DIR, RESULTS_DIR
+from serve_prefork import child_pids, read_memory
+
+PROFILES = ("constant", "ramp", "step", "spike")
+DEFAULT_URLS = {"frontend": "http://127.0.0.1:5000", "api": "http://127.0.0.1:8000",
+                "predictor": "http://127.0.0.1:7860"}
+READY_PATHS = {"frontend": "/", "api": "/ready", "predictor": "/ready"}
+PAGE_ASSETS = ("/", "/static/script.js", "/static/style.css")
+TARGET = "Survived"
+STARTUP_TIMEOUT = 120  # seconds
+PREDICTOR_ROWS = 5000
+
+
+# ---------------------------------------------------------------------------
+# Services
+# ---------------------------------------------------------------------------
+
+class Service:
+    """One locally started server process; its log goes to ``<workdir>/<name>.log``."""
+
+    def __init__(self, name, url, command, cwd, workdir, env=None):
+        self.name = name
+        self.url = url
+        self.command = command
+        self.cwd = cwd
+        self.env = env
+        self.log_path = os.path.join(workdir, f"{name}.log")
+        self.process = None
+
+    def start(self):
+        log = open(self.log_path, "wb")
+        # A session of its own, so stop() also reaches uvicorn/prefork workers and training scripts
+        self.process = subprocess.Popen(self.command, cwd=self.cwd, env=self.env, stdout=log,
+                                        stderr=subprocess.STDOUT, start_new_session=True)
+        log.close()
+
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def stop(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            os.killpg(self.process.pid, signal.SIGKILL)
+            self.process.wait()
+        except ProcessLookupError:
+            pass
+
+
+def train_predictor(registry_dir, backend, seed):
+    """Fit the voting ensemble on synthetic rows and publish it as the registry's current version."""
+    import model_registry
+    from benchmark import synthesize
+    from train_and_save_model import build_model_pipeline, features, target
+
+    df = synthesize("titanic", PREDICTOR_ROWS, seed)
+    model = build_model_pipeline(backend).fit(df[features], df[target])
+    return model_registry.publish(model, extra={"features": features, "target": target, "backend": backend,
+                                                "data": f"synthetic ({PREDICTOR_ROWS} rows)"},
+                                  registry_dir=registry_dir)
+
+
+def start_services(urls, workdir, predict_workers, predictor_backend, seed):
+    """Start frontend, api and predictor on the ports of ``urls``."""
+    port = {name: url.rsplit(":", 1)[1].split("/")[0] for name, url in urls.items()}
+    api_dir = os.path.join(workdir, "api")
+    os.makedirs(api_dir, exist_ok=True)
+    registry_dir = os.path.join(workdir, "models")
+    train_predictor(registry_dir, predictor_backend, seed)
+    env = {**os.environ, "PYTHONPATH": BASE_DIR + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    return [
+        Service("frontend", urls["frontend"],
+                [sys.executable, "-m", "flask", "--app", "app", "run", "--port", port["frontend"]],
+                BASE_DIR, workdir),
+        Service("api", urls["api"],
+                [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", port["api"],
+                 "--log-level", "warning"],
+                api_dir, workdir, env),
+        Service("predictor", urls["predictor"],
+                [sys.executable, os.path.join(BASE_DIR, "serve_prefork.py"), "--workers", str(predict_workers),
+                 "--port", port["predictor"], "--report-interval", "0"],
+                BASE_DIR, workdir, {**os.environ, "MODEL_REGISTRY_DIR": registry_dir}),
+    ]
+
+
+async def wait_ready(client, urls, timeout=STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    for name, url in urls.items():
+        while True:
+            try:
+                if (await client.get(url + READY_PATHS[name], timeout=5)).status_code == 200:
+                    break
+            except Exception:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{name} at {url} not ready after {timeout}s")
+            await asyncio.sleep(0.5)
+
+
+def tree_memory(pid):
+    """(RSS, PSS) in bytes summed over ``pid`` and all its descendants."""
+    rss = pss = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        memory = read_memory(current)
+        if memory:
+            rss += memory["rss"]
+            pss += memory["pss"]
+        stack.extend(child_pids(current))
+    return rss, pss
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def synthetic_csvs(n_datasets, rows, seed):
+    import datagen
+    files = []
+    for i in range(n_datasets):
+        buffer = io.StringIO()
+        datagen.generate_frame("titanic", rows, seed=seed + i).to_csv(buffer, index=False)
+        files.append(buffer.getvalue().encode("utf-8"))
+    return files
+
+
+def synthetic_passengers(n, seed):
+    """Bodies for POST /predict, drawn from the same synthetic Titanic rows."""
+    import datagen
+    df = datagen.generate_frame("titanic", n, seed=seed)
+    df["Age"] = df["Age"].fillna(28.0)
+    df["Fare"] = df["Fare"].fillna(14.45)
+    df["Embarked"] = df["Embarked"].fillna("S")
+    columns = ["Pclass", "Sex", "Age", "SibSp", "Parch", "Fare", "Embarked"]
+    return json.loads(df[columns].to_json(orient="records"))
+
+
+# ---------------------------------------------------------------------------
+# Load
+# ---------------------------------------------------------------------------
+
+def active_users(profile, users, t, duration):
+    if profile == "constant":
+        return users
+    if profile == "ramp":
+        return min(users, int(users * t / (duration / 2)) + 1) if users else 0
+    if profile == "step":
+        return min(users, -(-users * (int(4 * t / duration) + 1) // 4))
+    if profile == "spike":
+        return users if duration / 3 <= t < 2 * duration / 3 else min(users, 1)
+    raise ValueError(f"profile must be one of {', '.join(PROFILES)}")
+
+
+class Recorder:
+    def __init__(self):
+        self.start = time.monotonic()
+        self.requests = []   # (t, service, step, seconds, ok, detail)
+        self.memory = []     # (t, service, rss, pss)
+        self.users = []      # (t, active users)
+        self.dropped = 0
+
+    def now(self):
+        return time.monotonic() - self.start
+
+    def add(self, t, service, step, seconds, ok, detail=None):
+        self.requests.append((t, service, step, seconds, ok, detail))
+
+
+def _sse_outcome(text):
+    """(ok, detail) of an event-stream body: an "error" event or a result with "error" fails."""
+    event = None
+    for line in text.splitlines():
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: ") and event in ("error", "result"):
+            data = json.loads(line[6:])
+            if event == "error":
+                return False, data.get("detail")
+            if isinstance(data, dict) and data.get("error"):
+                return False, data["error"]
+    return True, None
+
+
+async def timed(recorder, client, service, step, method, url, **kwargs):
+    """Send one request and record it; returns the response, or None if it failed."""
+    t = recorder.now()
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok, detail = response.status_code < 400, f"HTTP {response.status_code}"
+        if ok and response.headers.get("content-type", "").startswith("text/event-stream"):
+            ok, detail = _sse_outcome(response.text)
+        elif ok and step == "model" and response.json().get("error"):
+            ok, detail = False, response.json()["error"]
+    except Exception as e:
+        response, ok, detail = None, False, type(e).__name__
+    recorder.add(t, service, step, time.perf_counter() - start, ok, None if ok else detail)
+    return response if ok else None
+
+
+async def flow(client, recorder, urls, csv, think, cold, model_mode, rng):
+    """One pass of the browser flow; stops at the first failure."""
+    headers = {"Cache-Control": "no-cache"} if cold else {}
+    stream = {**headers, "Accept": "text/event-stream"}
+
+    async def pause():
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+    for path in PAGE_ASSETS:
+        if not await timed(recorder, client, "frontend", "page", "GET", urls["frontend"] + path):
+            return
+    await pause()
+    api = urls["api"]
+    steps = [
+        ("upload", "POST", "/upload", {"files": {"file": ("synthetic_titanic.csv", csv, "text/csv")}}),
+        ("analyze", "GET", "/analyze", {"headers": stream}),
+        ("visualize", "GET", "/visualize?inline=false", {"headers": headers}),
+        ("preprocess", "POST", "/preprocess", {"headers": stream}),
+        ("model", "POST", "/model", {"headers": stream, "data": {
+            "target_column": TARGET, "importances": "false", "mode": model_mode, "budget_seconds": "30"}}),
+    ]
+    for step, method, path, kwargs in steps:
+        response = await timed(recorder, client, "api", step, method, api + path, **kwargs)
+        if response is None:
+            return
+        if step == "visualize":
+            for plot in response.json().get("plots", []):
+                if plot.get("url") and not await timed(recorder, client, "api", "plot", "GET", api + plot["url"]):
+                    return
+        await pause()
+
+
+async def flow_user(index, client, recorder, urls, csvs, args, deadline):
+    rng = random.Random(args.seed * 1000 + index)
+    while time.monotonic() < deadline:
+        if index >= active_users(args.profile, args.users, recorder.now(), args.duration):
+            await asyncio.sleep(0.25)
+            continue
+        await flow(client, recorder, urls, csvs[index % len(csvs)], args.think, args.cold, args.model_mode, rng)
+
+
+async def prediction_traffic(client, recorder, url, passengers, args, deadline):
+    rng = random.Random(args.seed)
+    in_flight = set()
+    i = 0
+    while True:
+        t = recorder.now()
+        bursting = args.burst_every > 0 and t % args.burst_every < args.burst_length
+        rate = args.burst_rate if bursting else args.predict_rate
+        if rate <= 0:
+            await asyncio.sleep(0.1)
+        else:
+            await asyncio.sleep(rng.expovariate(rate))
+        if time.monotonic() >= deadline:
+            break
+        if rate <= 0:
+            continue
+        if len(in_flight) >= args.max_in_flight:
+            recorder.dropped += 1
+            continue
+        body = passengers[i % len(passengers)]
+        i += 1
+        task = asyncio.create_task(timed(recorder, client, "predictor", "predict", "POST", url + "/predict",
+                                         json=body))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.wait(in_flight)
+
+
+async def sample(recorder, services, args, deadline, period=1.0):
+    while time.monotonic() < deadline:
+        t = recorder.now()
+        recorder.users.append((t, active_users(args.profile, args.users, t, args.duration)))
+        for service in services:
+            if service.pid():
+                rss, pss = tree_memory(service.pid())
+                recorder.memory.append((t, service.name, rss, pss))
+        await asyncio.sleep(period)
+
+
+async def run_load(args, urls, services):
+    import httpx
+
+    csvs = synthetic_csvs(args.datasets, args.rows, args.seed)
+    passengers = synthetic_passengers(1000, args.seed + 10_000)
+    limits = httpx.Limits(max_connections=args.users * 2 + args.max_in_flight + 8)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        await wait_ready(client, urls)
+        recorder = Recorder()
+        deadline = time.monotonic() + args.duration
+        tasks = [flow_user(i, client, recorder, urls, csvs, args, deadline) for i in range(args.users)]
+        tasks.append(prediction_traffic(client, recorder, urls["predictor"], passengers, args, deadline))
+        tasks.append(sample(recorder, services, args, deadline))
+        await asyncio.gather(*tasks)
+        recorder.elapsed = recorder.now()  # flows in progress at the deadline are allowed to finish
+    return recorder
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def _percentiles(seconds):
+    import numpy as np
+    if not seconds:
+        return {"p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}
+    p50, p90, p99 = np.percentile(seconds, [50, 90, 99]) * 1000
+    return {"p50_ms": round(float(p50), 1), "p90_ms": round(float(p90), 1), "p99_ms": round(float(p99), 1),
+            "max_ms": round(max(seconds) * 1000, 1)}
+
+
+def summarize(recorder):
+    groups = {}
+    for _, service, step, seconds, ok, detail in recorder.requests:
+        groups.setdefault((service, step), []).append((seconds, ok, detail))
+    steps = []
+    for (service, step), entries in groups.items():
+        errors = [detail for _, ok, detail in entries if not ok]
+        steps.append({
+            "service": service,
+            "step": step,
+            "requests": len(entries),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(entries), 4),
+            "rps": round(len(entries) / recorder.elapsed, 2),
+            **_percentiles([s for s, ok, _ in entries if ok]),
+            "error_kinds": {kind: errors.count(kind) for kind in sorted(set(map(str, errors)))},
+        })
+    return steps
+
+
+def timeline(recorder, interval):
+    buckets = []
+    for b in range(int(recorder.elapsed // interval) + 1):
+        lo, hi = b * interval, (b + 1) * interval
+        requests = [r for r in recorder.requests if lo <= r[0] < hi]
+        if not requests and lo >= recorder.elapsed:
+            break
+        bucket = {
+            "t": lo,
+            "users": max((n for t, n in recorder.users if lo <= t < hi), default=None),
+            "rps": round(len(requests) / interval, 2),
+            "errors": sum(1 for r in requests if not r[4]),
+            "p95_ms": None,
+            "memory_mb": {},
+        }
+        ok = [r[3] for r in requests if r[4]]
+        if ok:
+            import numpy as np
+            bucket["p95_ms"] = round(float(np.percentile(ok, 95)) * 1000, 1)
+        for t, name, rss, pss in recorder.memory:
+            if lo <= t < hi:
+                peak = bucket["memory_mb"].setdefault(name, {"rss": 0.0, "pss": 0.0})
+                peak["rss"] = max(peak["rss"], round(rss / 2 ** 20, 1))
+                peak["pss"] = max(peak["pss"], round(pss / 2 ** 20, 1))
+        buckets.append(bucket)
+    return buckets
+
+
+def format_report(steps, buckets):
+    header = ["service", "step", "requests", "errors", "error_rate", "rps", "p50_ms", "p90_ms", "p99_ms", "max_ms"]
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    for s in sorted(steps, key=lambda s: (s["service"], s["step"])):
+        lines.append("| " + " | ".join("" if s[h] is None else str(s[h]) for h in header) + " |")
+    names = sorted({name for b in buckets for name in b["memory_mb"]})
+    header = ["t", "users", "rps", "errors", "p95_ms", *[f"{n}_rss_mb" for n in names]]
+    lines += ["", "| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    for b in buckets:
+        cells = [f"{b['t']:.0f}", str(b["users"] if b["users"] is not None else ""), str(b["rps"]),
+                 str(b["errors"]), "" if b["p95_ms"] is None else str(b["p95_ms"]),
+                 *[str(b["memory_mb"].get(n, {}).get("rss", "")) for n in names]]
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=4, help="flow users at the peak of the profile")
+    parser.add_argument("--profile", choices=PROFILES, default="ramp")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of load")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds between a user's steps")
+    parser.add_argument("--rows", type=int, default=2000, help="rows per uploaded CSV")
+    parser.add_argument("--datasets", type=int, default=4, help="distinct CSVs shared by the users")
+    parser.add_argument("--cold", action="store_true", help="bypass the api result cache")
+    parser.add_argument("--model-mode", choices=("auto", "select", "incremental"), default="auto")
+    parser.add_argument("--predict-rate", type=float, default=5, help="predictions/s outside bursts")
+    parser.add_argument("--burst-rate", type=float, default=50, help="predictions/s during bursts")
+    parser.add_argument("--burst-every", type=float, default=15, help="seconds between burst starts (0 = none)")
+    parser.add_argument("--burst-length", type=float, default=3, help="seconds per burst")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="open prediction requests")
+    parser.add_argument("--predict-workers", type=int, default=1, help="serve_prefork.py workers")
+    parser.add_argument("--predictor-backend", choices=("exact", "fast"), default="exact")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds per request")
+    parser.add_argument("--interval", type=float, default=5, help="seconds per timeline row")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-start", action="store_true", help="use services that are already running")
+    for name, url in DEFAULT_URLS.items():
+        parser.add_argument(f"--{name}-url", default=url)
+    parser.add_argument("--json", default=None, help="write the report to this file (default: benchmark_results/)")
+    args = parser.parse_args()
+
+    urls = {name: getattr(args, f"{name}_url").rstrip("/") for name in DEFAULT_URLS}
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        services = [] if args.no_start else start_services(urls, workdir, args.predict_workers,
+                                                                  args.predictor_backend, args.seed)
+        try:
+            for service in services:
+                service.start()
+            print(f"load: {args.users} users ({args.profile}), {args.predict_rate}/s predictions "
+                  f"(bursts of {args.burst_rate}/s), {args.duration:.0f}s ...", flush=True)
+            recorder = asyncio.run(run_load(args, urls, services))
+        except Exception:
+            for service in services:
+                if not os.path.exists(service.log_path):
+                    continue  # never started
+                print(f"--- {service.log_path}")
+                with open(service.log_path, errors="replace") as f:
+                    print(f.read()[-2000:])
+            raise
+        finally:
+            for service in services:
+                service.stop()
+
+    steps, buckets = summarize(recorder), timeline(recorder, args.interval)
+    print()
+    print(format_report(steps, buckets))
+    if recorder.dropped:
+        print(f"\n{recorder.dropped} prediction arrivals dropped (--max-in-flight {args.max_in_flight} reached)")
+
+    report = {"config": vars(args), "elapsed_seconds": round(recorder.elapsed, 3),
+              "dropped_predictions": recorder.dropped, "steps": steps, "timeline": buckets}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.json or os.path.join(RESULTS_DIR, time.strftime("loadtest_%Y%m%d_%H%M%S.json"))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
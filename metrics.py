@@ -0,0 +1,235 @@
+"""
+Lightweight instrumentation for the FastAPI service.
+
+- ``span("csv_parse")`` times one stage of a request (histogram per stage and,
+  optionally, a ``Server-Timing`` response header entry)
+- ``install(app)`` adds request counters and histograms of latency, request
+  and response size, and peak traced memory per request
+- ``/metrics`` (registered by ``install``) renders everything in the
+  Prometheus text exposition format
+
+Configuration (environment variables):
+    API_METRICS=0          disable everything; span() becomes a shared no-op
+    API_SERVER_TIMING=1    add a Server-Timing header with per-stage durations
+    API_METRICS_MEMORY=1   track peak Python heap per request with tracemalloc
+                           (costly; process-wide, so approximate under concurrency)
+
+Latency, response size and peak memory are recorded when the last body chunk
+has been sent, so streamed (SSE) responses are measured in full. Server-Timing
+is a header, though: for a streamed response it can only report the stages
+finished before the headers went out, and its ``total`` is the time to headers.
+"""
+import contextvars
+import os
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+
+ENABLED = os.environ.get("API_METRICS", "1") != "0"
+SERVER_TIMING = os.environ.get("API_SERVER_TIMING", "0") == "1"
+TRACK_MEMORY = os.environ.get("API_METRICS_MEMORY", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+# Spans recorded for the request currently being handled (for Server-Timing)
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(key + (('le', _fmt(bound)),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_labels(key)} {series[-1]}")
+        return lines
+
+
+def _fmt(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key):
+    if not key:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+    return "{" + body + "}"
+
+
+REQUESTS = Counter("api_requests_total", "HTTP requests by method, route and status.")
+ERRORS = Counter("api_request_errors_total", "Requests that raised or returned 5xx.")
+LATENCY = Histogram("api_request_duration_seconds", "End-to-end request latency.", LATENCY_BUCKETS)
+REQUEST_SIZE = Histogram("api_request_size_bytes", "Request body size (Content-Length).", SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram("api_response_size_bytes", "Response body size (Content-Length).", SIZE_BUCKETS)
+PEAK_MEMORY = Histogram("api_request_peak_memory_bytes", "Peak traced Python heap during the request.", SIZE_BUCKETS)
+STAGE = Histogram("api_stage_duration_seconds", "Duration of instrumented stages within a request.", LATENCY_BUCKETS)
+
+REGISTRY = [REQUESTS, ERRORS, LATENCY, REQUEST_SIZE, RESPONSE_SIZE, PEAK_MEMORY, STAGE]
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Context manager timing one stage, e.g. ``with span("describe"): ...``."""
+    return _Span(name) if ENABLED else _NOOP
+
+
+def record(name, seconds):
+    """Record a stage duration measured elsewhere (e.g. reported by a subprocess)."""
+    if not ENABLED:
+        return
+    STAGE.observe(seconds, stage=name)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+def render_prometheus():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _server_timing(spans):
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in spans)
+
+
+def install(app):
+    """Register the metrics middleware and the ``/metrics`` endpoint on a FastAPI app."""
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    if not ENABLED:
+        return
+
+    if TRACK_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    @app.middleware("http")
+    async def metrics_middleware(request: Request, call_next):
+        spans = []
+        token = _request_spans.set(spans)
+        if TRACK_MEMORY:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+
+        def observe(status, response_bytes):
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            if path == "/metrics":
+                return
+            REQUESTS.inc(method=request.method, route=path, status=status)
+            LATENCY.observe(time.perf_counter() - start, route=path)
+            if status >= 500:
+                ERRORS.inc(route=path)
+            if request.headers.get("content-length"):
+                REQUEST_SIZE.observe(int(request.headers["content-length"]), route=path)
+            if response_bytes is not None:
+                RESPONSE_SIZE.observe(response_bytes, route=path)
+            if TRACK_MEMORY:
+                PEAK_MEMORY.observe(tracemalloc.get_traced_memory()[1], route=path)
+
+        try:
+            response = await call_next(request)
+        except BaseException:
+            observe(500, None)
+            raise
+        finally:
+            _request_spans.reset(token)
+        if SERVER_TIMING:
+            elapsed = time.perf_counter() - start
+            response.headers["Server-Timing"] = _server_timing(spans + [("total", elapsed)])
+
+        # The body is produced after call_next returns; finish the measurement once it is sent
+        body = response.body_iterator
+
+        async def measured_body():
+            sent = 0
+            try:
+                async for chunk in body:
+                    sent += len(chunk)
+                    yield chunk
+            finally:
+                observe(response.status_code, sent)
+
+        response.body_iterator = measured_body()
+        return response
@@ -0,0 +1,227 @@
+"""
+Model selection for /model?mode=select: successive halving under a wall-clock budget.
+
+Candidates from the model families used in the notebooks and
+train_and_save_model.py (logistic/ridge regression, random forest, histogram
+gradient boosting, KNN, SVC/SVR; a few configurations each) race on nested
+random subsamples of the training split:
+
+    rung 0   every candidate is fit on the smallest subsample (at least MIN_ROWS)
+    rung k   the best 1/ETA of rung k-1, on ETA times more rows
+    last     the survivor(s) on all training rows
+
+and are scored on a fixed validation split (accuracy, or R^2 for regression).
+Small data gets fewer rungs (see ``schedule``), so every rung really sees ETA
+times more rows than the one before; below ETA * MIN_ROWS fit rows there is a
+single rung, i.e. a plain comparison of every candidate on all rows, and the
+report says so (``halving`` is false).
+
+The candidates of a rung are fit in parallel, one core each. Rung 0 runs in
+batches of one candidate per core: from the second batch on, if the time per
+batch so far says the next one would overrun ``budget``, the remaining
+candidates are skipped. Before each later rung its duration is estimated from
+the previous one (ETA times the rows, 1/ETA of the candidates); if it would
+overrun the budget the race stops and the best candidate of the last finished
+rung wins. The winner is then refit on the whole training split if that fits
+in what is left of the budget.
+
+``race`` returns the leaderboard (every candidate with the last rung it
+reached, its score there and its fit/predict seconds) plus the fitted winner.
+sklearn's HalvingRandomSearchCV covers one estimator's hyperparameters with
+cross-validation and no time limit, hence this small loop.
+"""
+import math
+import os
+import time
+
+ETA = 3
+MIN_ROWS = 100
+VALIDATION_SIZE = 0.2
+DEFAULT_BUDGET = 60.0   # seconds
+
+
+def n_jobs():
+    if os.environ.get("MODEL_RACE_JOBS"):
+        return max(1, int(os.environ["MODEL_RACE_JOBS"]))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not Linux
+        return os.cpu_count() or 1
+
+
+def candidates(is_classification, seed=42):
+    """{name: unfitted estimator}; models that need it are imputed and scaled."""
+    from sklearn.ensemble import (HistGradientBoostingClassifier, HistGradientBoostingRegressor,
+                                  RandomForestClassifier, RandomForestRegressor)
+    from sklearn.impute import SimpleImputer
+    from sklearn.linear_model import LogisticRegression, Ridge
+    from sklearn.neighbors import KNeighborsClassifier, KNeighborsRegressor
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.svm import SVC, SVR
+
+    def scaled(estimator):
+        return make_pipeline(SimpleImputer(strategy="median"), StandardScaler(), estimator)
+
+    if is_classification:
+        return {
+            "logistic_C0.1": scaled(LogisticRegression(C=0.1, max_iter=1000)),
+            "logistic_C1": scaled(LogisticRegression(C=1.0, max_iter=1000)),
+            "random_forest_100": RandomForestClassifier(n_estimators=100, random_state=seed),
+            "random_forest_depth8": RandomForestClassifier(n_estimators=100, max_depth=8, random_state=seed),
+            "hist_gb_lr0.1": HistGradientBoostingClassifier(learning_rate=0.1, random_state=seed),
+            "hist_gb_lr0.05_leaves15": HistGradientBoostingClassifier(learning_rate=0.05, max_leaf_nodes=15,
+                                                                      random_state=seed),
+            "knn_5": scaled(KNeighborsClassifier(n_neighbors=5)),
+            "knn_15": scaled(KNeighborsClassifier(n_neighbors=15)),
+            "svc_rbf_C1": scaled(SVC(C=1.0)),
+            "svc_rbf_C10": scaled(SVC(C=10.0)),
+        }
+    return {
+        "ridge_1": scaled(Ridge(alpha=1.0)),
+        "ridge_10": scaled(Ridge(alpha=10.0)),
+        "random_forest_100": RandomForestRegressor(n_estimators=100, random_state=seed),
+        "random_forest_depth8": RandomForestRegressor(n_estimators=100, max_depth=8, random_state=seed),
+        "hist_gb_lr0.1": HistGradientBoostingRegressor(learning_rate=0.1, random_state=seed),
+        "hist_gb_lr0.05_leaves15": HistGradientBoostingRegressor(learning_rate=0.05, max_leaf_nodes=15,
+                                                                 random_state=seed),
+        "knn_5": scaled(KNeighborsRegressor(n_neighbors=5)),
+        "knn_15": scaled(KNeighborsRegressor(n_neighbors=15)),
+        "svr_rbf_C1": scaled(SVR(C=1.0)),
+        "svr_rbf_C10": scaled(SVR(C=10.0)),
+    }
+
+
+def schedule(n_candidates, n_rows, eta=ETA, min_rows=MIN_ROWS):
+    """[(candidates, rows)] per rung; the last rung uses all ``n_rows``.
+
+    There are only as many rungs as the data allows each to have ETA times the
+    rows of the one before (the first at least ``min_rows``); with fewer rungs
+    than halvings, more than one candidate reaches the last rung.
+    """
+    n_rungs = 1 + math.ceil(math.log(n_candidates, eta)) if n_candidates > 1 else 1
+    by_rows = 1
+    while n_rows // eta ** by_rows >= min_rows:
+        by_rows += 1
+    n_rungs = min(n_rungs, by_rows)
+    rungs = []
+    for r in range(n_rungs):
+        rows = n_rows // eta ** (n_rungs - 1 - r)
+        rungs.append((max(1, math.ceil(n_candidates / eta ** r)), rows))
+    return rungs
+
+
+def _score(model, X, y, is_classification):
+    from sklearn.metrics import accuracy_score, r2_score
+    start = time.perf_counter()
+    pred = model.predict(X)
+    predict_seconds = time.perf_counter() - start
+    score = accuracy_score(y, pred) if is_classification else r2_score(y, pred)
+    return float(score), predict_seconds
+
+
+def _fit_score(name, estimator, X, y, X_val, y_val, is_classification):
+    start = time.perf_counter()
+    estimator.fit(X, y)
+    fit_seconds = time.perf_counter() - start
+    score, predict_seconds = _score(estimator, X_val, y_val, is_classification)
+    return name, estimator, score, fit_seconds, predict_seconds
+
+
+def race(X, y, is_classification, budget=DEFAULT_BUDGET, jobs=None, seed=42, progress=None):
+    """Successive halving over ``candidates``; returns (fitted winner, name, report dict)."""
+    import numpy as np
+    from joblib import Parallel, delayed
+    from sklearn.base import clone
+    from sklearn.model_selection import train_test_split
+
+    start = time.perf_counter()
+    deadline = start + budget
+    jobs = jobs or n_jobs()
+    progress = progress or (lambda stage, **fields: None)
+
+    X = np.asarray(X, dtype=float)  # numpy arrays are memory-mapped, not copied, into the workers
+    y = np.asarray(y)
+    stratify = y if is_classification and np.unique(y, return_counts=True)[1].min() >= 2 else None
+    X_fit, X_val, y_fit, y_val = train_test_split(X, y, test_size=VALIDATION_SIZE, random_state=seed,
+                                                  stratify=stratify)
+    order = np.random.default_rng(seed).permutation(len(X_fit))
+
+    pool = candidates(is_classification, seed)
+    board = {name: {"model": name, "rung": None, "rows": 0, "score": None, "fit_seconds": None,
+                    "predict_seconds": None} for name in pool}
+    alive = list(pool)
+    fitted = {}
+    rungs = []
+    stopped = None
+    plan = schedule(len(pool), len(X_fit))
+    with Parallel(n_jobs=jobs, backend="loky", inner_max_num_threads=1) as parallel:
+        for r, (n_keep, n_rows) in enumerate(plan):
+            alive = alive[:n_keep]
+            if rungs:
+                # Rows grow by ETA; models scale at least linearly, so assume rung time grows by rows ratio
+                last = rungs[-1]
+                estimate = last["seconds"] * (n_rows / last["rows"]) * math.ceil(len(alive) / jobs) \
+                    / math.ceil(last["candidates"] / jobs)
+                if time.perf_counter() + estimate > deadline:
+                    stopped = f"budget: rung {r} estimated at {estimate:.1f}s"
+                    break
+            progress("race", rung=r, candidates=len(alive), rows=n_rows)
+            rung_start = time.perf_counter()
+            idx = order[:n_rows]
+
+            def fit_all(names):
+                return parallel(delayed(_fit_score)(name, clone(pool[name]), X_fit[idx], y_fit[idx], X_val, y_val,
+                                                    is_classification) for name in names)
+
+            if r == 0:
+                # Nothing to extrapolate from yet: go one batch at a time and stop when the next would overrun
+                results = []
+                for b in range(0, len(alive), jobs):
+                    if results:
+                        per_batch = (time.perf_counter() - rung_start) / (b // jobs)
+                        if time.perf_counter() + per_batch > deadline:
+                            stopped = f"budget: rung 0 stopped after {len(results)} of {len(alive)} candidates"
+                            break
+                    results += fit_all(alive[b:b + jobs])
+                alive = [name for name, *_ in results]
+            else:
+                results = fit_all(alive)
+            for name, model, score, fit_seconds, predict_seconds in results:
+                board[name].update({"rung": r, "rows": n_rows, "score": round(score, 6),
+                                    "fit_seconds": round(fit_seconds, 4),
+                                    "predict_seconds": round(predict_seconds, 4)})
+                fitted[name] = model
+            alive.sort(key=lambda name: board[name]["score"], reverse=True)
+            rungs.append({"rung": r, "candidates": len(results), "rows": n_rows,
+                          "seconds": round(time.perf_counter() - rung_start, 3), "best": alive[0]})
+            if stopped:
+                break
+
+    winner = alive[0]
+    model = fitted[winner]
+    refit = False
+    # The winner has seen the fit split only; add the validation rows if there is time
+    fit_seconds = board[winner]["fit_seconds"] * (len(X) / board[winner]["rows"])
+    if time.perf_counter() + fit_seconds < deadline:
+        progress("race", status="refit", model=winner, rows=len(X))
+        model = clone(pool[winner]).fit(X, y)
+        refit = True
+
+    leaderboard = sorted(board.values(), key=lambda e: (e["rung"] if e["rung"] is not None else -1,
+                                                       e["score"] if e["score"] is not None else -math.inf),
+                         reverse=True)
+    report = {
+        "budget_seconds": budget,
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+        "n_jobs": jobs,
+        "eta": ETA,
+        "validation_rows": len(X_val),
+        "scoring": "accuracy" if is_classification else "r2",
+        "rungs": rungs,
+        "halving": len(plan) > 1,
+        "stopped_early": stopped,
+        "refit_on_all_rows": refit,
+        "leaderboard": leaderboard,
+    }
+    return model, winner, report
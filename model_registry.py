@@ -0,0 +1,278 @@
+"""
+Local filesystem model registry and a hot-reloading model holder.
+
+Layout (``MODEL_REGISTRY_DIR``, default ``models/`` next to this file):
+
+    models/
+        v0001/model.pkl     the joblib artifact
+        v0001/meta.json     version, created, data_sha256, metrics, fit_seconds, ...
+        v0002/...
+        CURRENT             name of the version being served
+        promotions.log      one "<unix time> <version>" line per promotion, with a
+                            third field "rollback" when a rollback made it
+
+``publish`` writes a new version into a temporary directory and renames it into
+place, and ``promote`` replaces ``CURRENT`` with ``os.replace``, so readers
+never see a half-written artifact. ``rollback`` re-promotes the version that
+was served before the current one; a version that was rolled back from is
+dropped from the history, so repeated rollbacks keep walking back.
+
+``ModelHolder`` serves one (version, model) pair to request handlers. A
+watcher thread polls ``CURRENT``; when it changes, the new version is loaded
+and warmed in the background and then swapped in with a single attribute
+assignment, so in-flight requests finish on the old model and no request waits
+for a load. A version that fails to load or warm is not swapped in (the old
+one keeps serving, and it is not retried until CURRENT changes again); the
+error is reported in ``status()``.
+
+CLI:
+    python model_registry.py list
+    python model_registry.py promote v0003
+    python model_registry.py rollback
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", os.path.join(BASE_DIR, "models"))
+POLL_SECONDS = float(os.environ.get("MODEL_POLL_SECONDS", "5"))
+ARTIFACT = "model.pkl"
+META = "meta.json"
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(d for d in os.listdir(registry_dir)
+                  if d.startswith("v") and os.path.isfile(os.path.join(registry_dir, d, META)))
+
+
+def read_meta(version, registry_dir=REGISTRY_DIR):
+    with open(os.path.join(registry_dir, version, META), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def current_version(registry_dir=REGISTRY_DIR):
+    try:
+        with open(os.path.join(registry_dir, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def promote(version, registry_dir=REGISTRY_DIR, tag=None):
+    if version not in list_versions(registry_dir):
+        raise ValueError(f"Unknown model version: {version}")
+    _write_atomic(os.path.join(registry_dir, "CURRENT"), version + "\n")
+    with open(os.path.join(registry_dir, "promotions.log"), "a", encoding="utf-8") as f:
+        f.write(f"{time.time():.0f} {version}{f' {tag}' if tag else ''}\n")
+    return version
+
+
+def _served_history(registry_dir):
+    """Versions served so far, oldest first, without the ones that were rolled back from."""
+    stack = []
+    try:
+        with open(os.path.join(registry_dir, "promotions.log"), encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 2:
+                    continue
+                version = fields[1]
+                if fields[2:3] == ["rollback"] and version in stack:
+                    while stack[-1] != version:
+                        stack.pop()
+                else:
+                    stack.append(version)
+    except FileNotFoundError:
+        pass
+    return stack
+
+
+def rollback(registry_dir=REGISTRY_DIR):
+    """Promote the version that was served before the current one."""
+    current = current_version(registry_dir)
+    versions = list_versions(registry_dir)
+    history = _served_history(registry_dir)
+    while history and (history[-1] == current or history[-1] not in versions):
+        history.pop()
+    if not history:
+        raise ValueError("No earlier version to roll back to")
+    return promote(history[-1], registry_dir, tag="rollback")
+
+
+def publish(model, data_path=None, metrics=None, fit_seconds=None, extra=None,
+            registry_dir=REGISTRY_DIR, make_current=True):
+    """Save ``model`` as the next version and (by default) promote it. Returns the version."""
+    import joblib
+    import sklearn
+
+    os.makedirs(registry_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".publish-", dir=registry_dir)
+    try:
+        joblib.dump(model, os.path.join(tmp_dir, ARTIFACT))
+        meta = {
+            "created": time.time(),
+            "data_path": data_path,
+            "data_sha256": file_sha256(data_path) if data_path and os.path.exists(data_path) else None,
+            "metrics": metrics or {},
+            "fit_seconds": fit_seconds,
+            "sklearn_version": sklearn.__version__,
+            **(extra or {}),
+        }
+        # Claim the next free version name; rename fails if another publisher got it first
+        while True:
+            versions = list_versions(registry_dir)
+            version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+            meta["version"] = version
+            with open(os.path.join(tmp_dir, META), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+            try:
+                os.rename(tmp_dir, os.path.join(registry_dir, version))
+                break
+            except OSError:
+                if not os.path.exists(os.path.join(registry_dir, version)):
+                    raise
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    if make_current:
+        promote(version, registry_dir)
+    return version
+
+
+class ModelHolder:
+    """The model being served, replaced atomically when the registry's CURRENT changes."""
+
+    def __init__(self, registry_dir=REGISTRY_DIR, fallback_path=None, warm=None, poll_seconds=POLL_SECONDS):
+        self.registry_dir = registry_dir
+        self.fallback_path = fallback_path  # legacy single .pkl, used while the registry is empty
+        self.warm = warm                    # callable(model) run before a new model is swapped in
+        self.poll_seconds = poll_seconds
+        self.error = None
+        self.swapped_at = None
+        self._current = (None, None)        # (version, model), replaced as one object
+        self._failed = None                 # version that failed to load; not retried
+        self._load_lock = threading.Lock()
+        self._watcher = None
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    def get(self):
+        """Return (version, model); read once per request so both belong together."""
+        return self._current
+
+    def swap(self, model, version):
+        self._current = (version, model)
+        self.swapped_at = time.time()
+
+    def _target(self):
+        version = current_version(self.registry_dir)
+        if version:
+            return version, os.path.join(self.registry_dir, version, ARTIFACT)
+        if self.fallback_path and os.path.exists(self.fallback_path):
+            return "legacy", self.fallback_path
+        return None, None
+
+    def refresh(self):
+        """Load, warm and swap in the registry's current version if it is not already served."""
+        with self._load_lock:
+            version, path = self._target()
+            if version is None or version in (self.version, self._failed):
+                return False
+            import joblib
+            try:
+                model = joblib.load(path)
+                if self.warm is not None:
+                    self.warm(model)
+            except Exception as e:
+                self.error = f"{version}: {type(e).__name__}: {e}"
+                self._failed = version
+                if self.version is None:
+                    raise
+                return False
+            self.error = self._failed = None
+            self.swap(model, version)
+            return True
+
+    def load(self):
+        """Block until a model is served (first load); returns it, or None if there is none."""
+        if self.version is None:
+            self.refresh()
+        return self._current[1]
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.refresh()
+            except Exception:
+                pass  # recorded in self.error; keep serving the old model
+
+    def start_watching(self):
+        if self._watcher is None and self.poll_seconds > 0:
+            self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+        return self
+
+    def status(self):
+        version = self.version
+        meta = None
+        if version and version != "legacy":
+            try:
+                meta = read_meta(version, self.registry_dir)
+            except (OSError, ValueError):
+                pass
+        return {"version": version, "registry_current": current_version(self.registry_dir),
+                "swapped_at": self.swapped_at, "error": self.error, "meta": meta}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and switch model versions in the local registry.")
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    p = sub.add_parser("promote")
+    p.add_argument("version")
+    sub.add_parser("rollback")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        current = current_version(args.registry)
+        for version in list_versions(args.registry):
+            meta = read_meta(version, args.registry)
+            marker = "*" if version == current else " "
+            data = (meta.get("data_sha256") or "-")[:12]
+            print(f"{marker} {version}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(meta['created']))}"
+                  f"  data={data}  fit={meta.get('fit_seconds') or 0:.1f}s  metrics={json.dumps(meta.get('metrics', {}))}")
+    elif args.command == "promote":
+        print(f"CURRENT -> {promote(args.version, args.registry)}")
+    else:
+        print(f"CURRENT -> {rollback(args.registry)}")
+
+
+if __name__ == "__main__":
+    main()
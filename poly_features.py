@@ -0,0 +1,429 @@
+"""
+Polynomial and interaction features without the dense expanded matrix.
+
+The regression notebooks (8_polynominal_Feature, Plus_5/Plus_6) build
+``PolynomialFeatures(degree).fit_transform(X)`` on the whole dataset. On the
+wine data (11 features) degree 3 gives 363 columns, i.e. 29 GB of float64 for
+10M rows before the model even starts. Here:
+
+1. ``PolynomialStage`` expands only a given list of terms (tuples of column
+   indices, ``(3, 3, 7)`` = x3^2 * x7), one chunk at a time. Each product is
+   built from its prefix (x3*x3, then *x7), so no term is recomputed from
+   scratch. Sparse input (e.g. one-hot columns) gives sparse output. It is a
+   stateless sklearn transformer, so it also fits in a notebook's Pipeline.
+2. ``screen`` scores candidate terms on a sample by absolute correlation with
+   the target, a block of terms at a time, so only the best ``keep``
+   non-linear terms are ever materialized (linear terms are always kept).
+3. ``train`` streams the CSV in chunks and fits linear regression on the
+   expanded, standardized chunks, either
+       normal   exact ridge least squares from the accumulated Z'Z and Z'y
+                (one pass, memory ~ n_terms^2), or
+       sgd      SGDRegressor.partial_fit over ``epochs`` passes, on a target
+                centered by the sample mean, with a constant step of
+                1 / (largest squared row norm of the sample) and averaging from
+                the end of roughly the first sample's worth of rows. The loss
+                on a held-back slice of the sample is reported per epoch; if it
+                diverges (not finite, or worse than predicting the mean) the
+                result is an error instead of an R^2, and ``converged`` says
+                whether the last epoch still improved it by more than SGD_TOL.
+   Rows go to train or test by a seeded draw per chunk, as in incremental.py.
+
+Peak memory is one expanded chunk (chunksize x n_terms) plus the screening
+sample, whatever the row count.
+
+``python poly_features.py --rows 1m --degree 3`` compares time, peak RSS and
+test R^2 of the dense sklearn pipeline against the streaming variants, each in
+a fresh process (the dense one is expected to fail at 10M rows).
+
+Examples:
+    python poly_features.py --rows 1m,10m --degree 3 --keep 60
+    python poly_features.py --csv big_wine.csv --target quality --methods stream_screened
+"""
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import queue as queue_module
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+CHUNKSIZE = 50_000
+TEST_SIZE = 0.2
+SCREEN_ROWS = 50_000    # rows sampled for screening and for the scaling statistics
+TERM_BLOCK = 128        # terms expanded at once while screening
+METHODS = ("dense", "stream", "stream_screened", "stream_sgd")
+CHECK_ROWS = 5000       # sample rows the SGD loss is tracked on
+SGD_TOL = 1e-3          # relative loss change per epoch below which SGD counts as converged
+
+
+def terms(n_features, degree=2, interaction_only=False):
+    """All terms of degree 1..``degree``, ordered like sklearn's PolynomialFeatures."""
+    combine = itertools.combinations if interaction_only else itertools.combinations_with_replacement
+    return [t for d in range(1, degree + 1) for t in combine(range(n_features), d)]
+
+
+def term_names(selected, names):
+    def name(term):
+        counts = {}
+        for i in term:
+            counts[i] = counts.get(i, 0) + 1
+        return " ".join(names[i] if c == 1 else f"{names[i]}^{c}" for i, c in counts.items())
+    return [name(t) for t in selected]
+
+
+class PolynomialStage(TransformerMixin, BaseEstimator):
+    """Expansion restricted to ``selected`` terms; stateless, so it applies to any chunk."""
+
+    def __init__(self, selected=()):
+        self.selected = selected
+
+    @property
+    def terms(self):
+        # Shorter terms first, so a term's prefix is computed before the term
+        return sorted((tuple(sorted(t)) for t in self.selected), key=lambda t: (len(t), t))
+
+    def fit(self, X, y=None):
+        return self
+
+    def get_feature_names_out(self, input_features=None):
+        n_features = 1 + max((i for t in self.terms for i in t), default=-1)
+        names = list(input_features) if input_features is not None else [f"x{i}" for i in range(n_features)]
+        return np.asarray(term_names(self.terms, names), dtype=object)
+
+    def transform(self, X):
+        from scipy import sparse
+        terms = self.terms
+        if sparse.issparse(X):
+            X = X.tocsc()
+            feature, multiply = (lambda i: X[:, [i]]), (lambda a, b: a.multiply(b))
+            out = None
+        else:
+            X = np.asarray(X, dtype=float)
+            feature, multiply = (lambda i: X[:, i]), np.multiply
+            out = np.empty((X.shape[0], len(terms)))
+        columns = {}    # term or prefix -> its column (a view into ``out`` for selected terms)
+        stacked = []
+        for j, term in enumerate(terms):
+            value = feature(term[0])
+            for end in range(2, len(term) + 1):
+                prefix = term[:end]
+                if prefix not in columns:
+                    columns[prefix] = multiply(value, feature(term[end - 1]))
+                value = columns[prefix]
+            if out is None:
+                stacked.append(value)
+            else:
+                out[:, j] = value
+                if len(term) > 1:
+                    columns[term] = out[:, j]
+        return sparse.hstack(stacked, format="csr") if out is None else out
+
+
+def screen(X, y, candidates, keep, block=TERM_BLOCK):
+    """The ``keep`` non-linear terms most correlated with ``y`` on this sample, plus every linear term."""
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    yc = y - y.mean()
+    y_norm = np.sqrt((yc ** 2).sum()) or 1.0
+    linear = [t for t in candidates if len(t) == 1]
+    higher = [t for t in candidates if len(t) > 1]
+    scores = {}
+    for start in range(0, len(higher), block):
+        stage = PolynomialStage(higher[start:start + block])
+        Z = stage.transform(X)
+        Zc = Z - Z.mean(axis=0)
+        norms = np.sqrt((Zc ** 2).sum(axis=0))
+        norms[norms == 0] = np.inf
+        scores.update(zip(stage.terms, np.abs(Zc.T @ yc) / (norms * y_norm)))
+    best = sorted(scores, key=scores.get, reverse=True)[:keep]
+    return linear + sorted(best, key=lambda t: (len(t), t)), {t: float(scores[t]) for t in best}
+
+
+def _chunks(source, chunksize):
+    if isinstance(source, str):
+        return pd.read_csv(source, chunksize=chunksize, low_memory=False)
+    return source()   # a callable returning a fresh iterator of DataFrames
+
+
+def _split_mask(n_rows, chunk_index, seed, test_size=TEST_SIZE):
+    return np.random.default_rng([seed, chunk_index]).random(n_rows) < test_size
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class PolynomialRegression:
+    """Linear model on standardized ``stage`` output; ``predict`` takes raw feature rows."""
+
+    def __init__(self, stage, mean, scale, coef, intercept, sgd=None, offset=0.0):
+        self.stage, self.mean, self.scale = stage, mean, scale
+        self.coef, self.intercept, self.sgd, self.offset = coef, intercept, sgd, offset
+
+    def predict(self, X):
+        Z = (self.stage.transform(X) - self.mean) / self.scale
+        return self.sgd.predict(Z) + self.offset if self.sgd is not None else Z @ self.coef + self.intercept
+
+
+def train(source, target, degree=2, interaction_only=False, keep=None, solver="normal", alpha=1e-3,
+          chunksize=CHUNKSIZE, epochs=5, seed=42, progress=None):
+    """Stream ``source`` (CSV path or chunk factory); return (model, results dict)."""
+    progress = progress or (lambda stage, **fields: None)
+    start = time.perf_counter()
+
+    # 1. Screening sample: the train rows of the first chunks
+    sample = []
+    n_sample = 0
+    for i, chunk in enumerate(_chunks(source, chunksize)):
+        train_rows = chunk[~_split_mask(len(chunk), i, seed)]
+        sample.append(train_rows)
+        n_sample += len(train_rows)
+        if n_sample >= SCREEN_ROWS:
+            break
+    sample = pd.concat(sample).iloc[:SCREEN_ROWS]
+    features = [c for c in sample.columns if c != target]
+    X_sample, y_sample = sample[features].to_numpy(dtype=float), sample[target].to_numpy(dtype=float)
+    candidates = terms(len(features), degree, interaction_only)
+    scores = {}
+    if keep is not None and keep < len(candidates) - len(features):
+        progress("screen", candidates=len(candidates), keep=keep, rows=len(sample))
+        selected, scores = screen(X_sample, y_sample, candidates, keep)
+    else:
+        selected = candidates
+    stage = PolynomialStage(selected)
+    Z_sample = stage.transform(X_sample)
+    mean = Z_sample.mean(axis=0)
+    scale = Z_sample.std(axis=0)
+    scale[scale == 0] = 1.0
+    # Step size for SGD: safe for the largest (standardized) row of the sample
+    max_sq_norm = float((((Z_sample - mean) / scale) ** 2).sum(axis=1).max())
+    del Z_sample
+    screen_seconds = time.perf_counter() - start
+
+    def train_chunks():
+        for i, chunk in enumerate(_chunks(source, chunksize)):
+            rows = chunk[~_split_mask(len(chunk), i, seed)]
+            yield i, (stage.transform(rows[features].to_numpy(dtype=float)) - mean) / scale, \
+                rows[target].to_numpy(dtype=float)
+
+    # 2. Fit
+    fit_start = time.perf_counter()
+    k = len(stage.terms)
+    n_train = 0
+    if solver == "normal":
+        # [1, Z]' [1, Z] and [1, Z]' y accumulated per chunk; the intercept is not penalized
+        gram = np.zeros((k + 1, k + 1))
+        moment = np.zeros(k + 1)
+        for i, Z, y in train_chunks():
+            Z1 = np.hstack([np.ones((len(Z), 1)), Z])
+            gram += Z1.T @ Z1
+            moment += Z1.T @ y
+            n_train += len(y)
+            progress("fit", chunk=i, rows=n_train)
+        penalty = alpha * n_train * np.eye(k + 1)
+        penalty[0, 0] = 0.0
+        w = np.linalg.solve(gram + penalty, moment)
+        model = PolynomialRegression(stage, mean, scale, w[1:], w[0])
+    elif solver == "sgd":
+        from sklearn.linear_model import SGDRegressor
+        y_mean = float(y_sample.mean())
+        Z_check = (stage.transform(X_sample[-CHECK_ROWS:]) - mean) / scale
+        y_check = y_sample[-CHECK_ROWS:] - y_mean
+        baseline = float((y_check ** 2).mean())
+        sgd = SGDRegressor(alpha=alpha, learning_rate="constant", eta0=1.0 / max(max_sq_norm, 1.0),
+                           average=len(X_sample), random_state=seed)
+        epoch_loss = []
+        for epoch in range(1, epochs + 1):
+            n_train = 0
+            for _, Z, y in train_chunks():
+                sgd.partial_fit(Z, y - y_mean)
+                n_train += len(y)
+            epoch_loss.append(float(((sgd.predict(Z_check) - y_check) ** 2).mean()))
+            progress("fit", epoch=epoch, epochs=epochs, rows=n_train, loss=epoch_loss[-1])
+            if not np.isfinite(epoch_loss[-1]):
+                break
+        model = PolynomialRegression(stage, mean, scale, sgd.coef_, sgd.intercept_[0] + y_mean, sgd=sgd,
+                                     offset=y_mean)
+    else:
+        raise ValueError(f"unknown solver {solver!r}; expected normal or sgd")
+    fit_seconds = time.perf_counter() - fit_start
+
+    # 3. One pass over the held-out rows
+    n_test = 0
+    sq_err = y_sum = y_sq_sum = 0.0
+    for i, chunk in enumerate(_chunks(source, chunksize)):
+        rows = chunk[_split_mask(len(chunk), i, seed)]
+        if len(rows) == 0:
+            continue
+        y = rows[target].to_numpy(dtype=float)
+        pred = model.predict(rows[features].to_numpy(dtype=float))
+        sq_err += float(((y - pred) ** 2).sum())
+        y_sum += y.sum()
+        y_sq_sum += (y ** 2).sum()
+        n_test += len(y)
+    total_ss = y_sq_sum - y_sum ** 2 / n_test if n_test else 0.0
+
+    names = term_names(stage.terms, features)
+    results = {
+        "type": "Regression",
+        "solver": solver,
+        "degree": degree,
+        "terms": k,
+        "candidate_terms": len(candidates),
+        "rows": n_train + n_test,
+        "test_rows": n_test,
+        "mse": sq_err / n_test if n_test else 0.0,
+        "r2": float(1 - sq_err / total_ss) if total_ss > 0 else 0.0,
+        "screen_seconds": screen_seconds,
+        "fit_seconds": fit_seconds,
+        "seconds": time.perf_counter() - start,
+        "screened_terms": {names[stage.terms.index(t)]: round(score, 4) for t, score in scores.items()},
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    if solver == "sgd":
+        results["epoch_loss"] = epoch_loss
+        final = epoch_loss[-1]
+        if not np.isfinite(final) or final > baseline:
+            results.update({"converged": False, "mse": None, "r2": None,
+                            "error": f"SGD diverged (sample loss {final:.4g} vs {baseline:.4g} for the mean)"})
+        else:
+            previous = epoch_loss[-2] if len(epoch_loss) > 1 else np.inf
+            results["converged"] = bool(abs(previous - final) <= SGD_TOL * max(previous, 1e-12))
+    return model, results
+
+
+# ---------------------------------------------------------------------------
+# Dense vs streaming comparison
+# ---------------------------------------------------------------------------
+
+def _dense(path, target, degree, seed):
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import mean_squared_error, r2_score
+    from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+
+    start = time.perf_counter()
+    parts = list(pd.read_csv(path, chunksize=CHUNKSIZE))
+    test = np.concatenate([_split_mask(len(c), i, seed) for i, c in enumerate(parts)])
+    df = pd.concat(parts, ignore_index=True)
+    del parts
+    X = df.drop(columns=[target]).to_numpy(dtype=float)
+    y = df[target].to_numpy(dtype=float)
+    del df
+    Z = StandardScaler().fit_transform(PolynomialFeatures(degree, include_bias=False).fit_transform(X))
+    fit_start = time.perf_counter()
+    model = LinearRegression().fit(Z[~test], y[~test])
+    fit_seconds = time.perf_counter() - fit_start
+    pred = model.predict(Z[test])
+    return {"terms": Z.shape[1], "rows": len(y), "test_rows": int(test.sum()),
+            "mse": float(mean_squared_error(y[test], pred)), "r2": float(r2_score(y[test], pred)),
+            "fit_seconds": fit_seconds, "seconds": time.perf_counter() - start, "peak_rss_mb": _peak_rss_mb()}
+
+
+def measure(method, path, target, degree, keep, seed=42):
+    if method == "dense":
+        return _dense(path, target, degree, seed)
+    options = {"stream": {}, "stream_screened": {"keep": keep}, "stream_sgd": {"keep": keep, "solver": "sgd"}}
+    _, results = train(path, target, degree=degree, seed=seed, **options[method])
+    results.pop("screened_terms")
+    return results
+
+
+def _child(queue, *args):
+    try:
+        queue.put(measure(*args))
+    except MemoryError:
+        queue.put({"error": "MemoryError"})
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run(method, path, target, degree, keep, timeout):
+    """``measure`` in a fresh process, so peak RSS belongs to this method alone."""
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(queue, method, path, target, degree, keep))
+    proc.start()
+    # Read before joining: a child blocks on exit until its queued result is consumed
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            result = queue.get(timeout=1)
+            break
+        except queue_module.Empty:
+            if not proc.is_alive():
+                try:
+                    result = queue.get(timeout=1)
+                except queue_module.Empty:
+                    result = {"error": f"exit code {proc.exitcode} (killed: out of memory?)"}
+                break
+            if time.monotonic() > deadline:
+                proc.terminate()
+                proc.join()
+                return {"method": method, "error": f"timeout after {timeout:.0f}s"}
+    proc.join()
+    return {"method": method, **result}
+
+
+def format_table(results):
+    header = ["rows", "method", "terms", "seconds", "fit_seconds", "peak_rss_mb", "r2"]
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    for r in results:
+        if "error" in r:
+            cells = [f"{r['n_rows']:,}", r["method"], r["error"]] + [""] * (len(header) - 3)
+        else:
+            cells = [f"{r['n_rows']:,}", r["method"], str(r["terms"]), f"{r['seconds']:.1f}",
+                     f"{r['fit_seconds']:.1f}", f"{r['peak_rss_mb']:.0f}",
+                     f"{r['r2']:.4f}" + (" (not converged)" if r.get("converged") is False else "")]
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+def main():
+    from benchmark import RESULTS_DIR, parse_size
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="100k", help="synthetic wine rows (datagen.py), comma separated")
+    parser.add_argument("--csv", default=None, help="use this CSV instead of synthetic wine data")
+    parser.add_argument("--target", default="quality")
+    parser.add_argument("--degree", type=int, default=3)
+    parser.add_argument("--keep", type=int, default=60, help="non-linear terms kept by screening")
+    parser.add_argument("--methods", default=",".join(METHODS))
+    parser.add_argument("--timeout", type=float, default=3600, help="seconds per method")
+    parser.add_argument("--json", default=None, help="write results to this file (default: benchmark_results/)")
+    args = parser.parse_args()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    if args.csv:
+        sources = [(sum(len(c) for c in pd.read_csv(args.csv, chunksize=CHUNKSIZE)), args.csv)]
+    else:
+        import datagen
+        sources = []
+        for size in args.rows.split(","):
+            n_rows = parse_size(size)
+            path = os.path.join(RESULTS_DIR, f"wine_{n_rows}.csv")
+            if not os.path.exists(path):
+                print(f"Generating {n_rows:,} wine rows ...", flush=True)
+                datagen.write(datagen.load_profile("wine"), n_rows, path)
+            sources.append((n_rows, path))
+
+    results = []
+    for n_rows, path in sources:
+        for method in args.methods.split(","):
+            print(f"{method} @ {n_rows:,} rows ...", flush=True)
+            results.append({"n_rows": n_rows, **run(method, path, args.target, args.degree, args.keep, args.timeout)})
+
+    print()
+    print(format_table(results))
+    output = args.json or os.path.join(RESULTS_DIR, time.strftime("poly_%Y%m%d_%H%M%S.json"))
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Bounded LRU + TTL cache for single-passenger predictions.
+
+Predictor inputs are low-cardinality (Pclass, Sex, Embarked, small SibSp/Parch)
+plus Age and Fare, and most traffic repeats earlier queries, so results are
+memoised on the normalised feature tuple. Age and Fare can optionally be
+quantised so near-identical queries share an entry; the model is then also
+called with the quantised values, so a key always maps to the same answer.
+
+Entries belong to one model version: when the served version changes the
+cache is emptied, and the version is part of the key as well, so a result
+computed by the old model is never returned for the new one.
+
+Configuration (environment variables):
+    PREDICTION_CACHE_SIZE=10000   max entries (0 disables the cache)
+    PREDICTION_CACHE_TTL=3600     seconds an entry stays valid (0 = no expiry)
+    PREDICTION_AGE_STEP=0         quantise Age to this step (0 = exact)
+    PREDICTION_FARE_STEP=0        quantise Fare to this step (0 = exact)
+
+Hit/miss/eviction counters are exported through ``metrics.render_prometheus``.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "3600"))
+AGE_STEP = float(os.environ.get("PREDICTION_AGE_STEP", "0"))
+FARE_STEP = float(os.environ.get("PREDICTION_FARE_STEP", "0"))
+
+LOOKUPS = metrics.Counter("prediction_cache_lookups_total", "Prediction cache lookups by result (hit/miss).")
+EVICTIONS = metrics.Counter("prediction_cache_evictions_total", "Entries dropped by reason (size/ttl/model_change).")
+metrics.REGISTRY.extend([LOOKUPS, EVICTIONS])
+
+
+def _quantize(value, step):
+    return round(round(value / step) * step, 6) if step > 0 else value
+
+
+def normalize(pclass, sex, age, sibsp, parch, fare, embarked, age_step=AGE_STEP, fare_step=FARE_STEP):
+    """Canonical feature tuple: typed, case-folded and (optionally) quantised."""
+    return (
+        int(pclass),
+        str(sex).strip().lower(),
+        _quantize(float(age), age_step),
+        int(sibsp),
+        int(parch),
+        _quantize(float(fare), fare_step),
+        str(embarked).strip().upper(),
+    )
+
+
+class PredictionCache:
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # (version, features) -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        # Called with the lock held
+        if version != self.version:
+            if self._entries:
+                EVICTIONS.inc(len(self._entries), reason="model_change")
+            self._entries.clear()
+            self.version = version
+
+    def get(self, version, features):
+        """Return the cached value or None."""
+        if self.maxsize <= 0:
+            return None
+        key = (version, features)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and entry[0] < time.monotonic():
+                del self._entries[key]
+                EVICTIONS.inc(reason="ttl")
+                entry = None
+            if entry is None:
+                self.misses += 1
+                LOOKUPS.inc(result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        LOOKUPS.inc(result="hit")
+        return entry[1]
+
+    def put(self, version, features, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._check_version(version)
+            self._entries[(version, features)] = (expires_at, value)
+            self._entries.move_to_end((version, features))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                EVICTIONS.inc(reason="size")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "model_version": self.version,
+                "age_step": AGE_STEP, "fare_step": FARE_STEP}
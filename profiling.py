@@ -0,0 +1,387 @@
+"""
+On-demand profiling for the API and the generated training script.
+
+A profile is a sampling CPU profile plus a tracemalloc allocation profile,
+stored under ``profiles/<profile_id>/`` in the collapsed-stack ("folded")
+format understood by flamegraph.pl, speedscope and similar tools:
+
+    cpu.folded          samples per stack (CPU, sampled every few ms)
+    alloc.folded        bytes still allocated per stack at the end
+    alloc.txt           top allocation sites, human readable
+    train_*.folded      the same for the /model training subprocess
+    meta.json           timing and sampler settings
+
+Enable on the server with ``API_PROFILING=1`` and opt a single request in with
+the ``X-Profile`` header (or ``?profile=``):
+
+    X-Profile: cpu      sampling CPU profile only (a few percent overhead)
+    X-Profile: 1        CPU + allocation profile (tracemalloc hooks every
+                        allocation, expect the request to run several times slower)
+
+The profile covers the whole request: the event-loop thread for async code and,
+while they work for the profiled request, the worker threads that run plain
+``def`` endpoints and synchronous streaming generators (see ``track``). For a
+streaming response it ends when the last chunk has been sent, not at the
+headers. The response carries an ``X-Profile-Id`` header; files are served from
+``/profiles/<id>/<file>`` (only registered when profiling is enabled). Only the newest ``PROFILE_MAX_STORED`` profiles are
+kept; older directories are removed after each write.
+
+Overhead is bounded: only one profile runs at a time (other requests are not
+profiled), sampling stops after ``PROFILE_MAX_SECONDS``, tracemalloc keeps
+``PROFILE_TRACE_FRAMES`` frames per allocation and folded output is capped at
+the heaviest ``MAX_FOLDED_STACKS`` stacks.
+
+Run a script (e.g. the generated training script) under the profiler; its
+top-level imports are loaded before profiling starts so they do not dominate:
+    python profiling.py --id <profile_id> --prefix train_ uploads/generated_model.py
+"""
+import argparse
+import ast
+import contextlib
+import contextvars
+import functools
+import importlib
+import json
+import os
+import re
+import runpy
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+ENABLED = os.environ.get("API_PROFILING", "0") == "1"
+SAMPLE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.005"))
+MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "120"))
+TRACE_FRAMES = int(os.environ.get("PROFILE_TRACE_FRAMES", "4"))
+MAX_FOLDED_STACKS = 5000
+MAX_STORED_PROFILES = int(os.environ.get("PROFILE_MAX_STORED", "64"))
+
+SAFE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+# (profile id, mode) of the request currently being handled, None when not profiled
+current_profile_id = contextvars.ContextVar("current_profile_id", default=None)
+
+# Only one profile at a time keeps the overhead bounded
+_busy = threading.Lock()
+# The Profile currently recording a request, if any
+_active = None
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the stacks of a set of threads at a fixed interval from a daemon thread."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL, max_seconds=MAX_SECONDS):
+        self.threads = {thread_id}
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            for thread_id in list(self.threads):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common(MAX_FOLDED_STACKS))
+
+
+class AllocationProfiler:
+    """tracemalloc snapshot of live allocations, grouped by traceback."""
+
+    def __init__(self, frames=TRACE_FRAMES):
+        self.frames = frames
+        self._started_here = False
+        self.snapshot = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_here = True
+        return self
+
+    def stop(self):
+        self.snapshot = tracemalloc.take_snapshot()
+        self.peak = tracemalloc.get_traced_memory()[1]
+        if self._started_here:
+            tracemalloc.stop()
+
+    def folded(self):
+        lines = []
+        for stat in self.snapshot.statistics("traceback")[:MAX_FOLDED_STACKS]:
+            frames = [f"{os.path.basename(f.filename)}:{f.lineno}" for f in reversed(stat.traceback)]
+            lines.append(f"{';'.join(frames)} {stat.size}\n")
+        return "".join(lines)
+
+    def report(self, limit=30):
+        lines = [f"Peak traced memory: {self.peak / 1e6:.1f} MB", ""]
+        for stat in self.snapshot.statistics("lineno")[:limit]:
+            lines.append(str(stat))
+        return "\n".join(lines) + "\n"
+
+
+def new_profile_id():
+    return uuid.uuid4().hex[:12]
+
+
+def profile_path(profile_id, name=None):
+    if not SAFE_NAME.match(profile_id) or (name is not None and not SAFE_NAME.match(name)):
+        raise ValueError("invalid profile id or file name")
+    path = os.path.join(PROFILE_DIR, profile_id)
+    return os.path.join(path, name) if name else path
+
+
+def _prune():
+    """Remove all but the MAX_STORED_PROFILES most recently written profiles."""
+    try:
+        stored = sorted((e for e in os.scandir(PROFILE_DIR) if e.is_dir()), key=lambda e: e.stat().st_mtime)
+    except FileNotFoundError:
+        return
+    for entry in stored[:-MAX_STORED_PROFILES]:
+        shutil.rmtree(entry.path, ignore_errors=True)  # the API and a training subprocess may both prune
+
+
+class Profile:
+    """Context manager that profiles the calling thread and writes the results on exit."""
+
+    def __init__(self, profile_id, prefix="", thread_id=None, allocations=True):
+        self.profile_id = profile_id
+        self.prefix = prefix
+        self.thread_id = thread_id or threading.get_ident()
+        self.allocations = allocations
+
+    def __enter__(self):
+        self.start = time.time()
+        self.alloc = AllocationProfiler().start() if self.allocations else None
+        self.cpu = SamplingProfiler(self.thread_id).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.cpu.stop()
+        out_dir = profile_path(self.profile_id)
+        os.makedirs(out_dir, exist_ok=True)
+        files = {f"{self.prefix}cpu.folded": self.cpu.folded()}
+        if self.alloc:
+            self.alloc.stop()
+            files[f"{self.prefix}alloc.folded"] = self.alloc.folded()
+            files[f"{self.prefix}alloc.txt"] = self.alloc.report()
+        for name, content in files.items():
+            with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+                f.write(content)
+        meta_path = os.path.join(out_dir, f"{self.prefix}meta.json")
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"profile_id": self.profile_id, "started": self.start,
+                       "duration": time.time() - self.start, "samples": self.cpu.samples,
+                       "interval": self.cpu.interval,
+                       "peak_traced_bytes": self.alloc.peak if self.alloc else None,
+                       "pid": os.getpid()}, f, indent=2)
+        _prune()
+        return False
+
+
+@contextlib.contextmanager
+def track():
+    """Sample the calling thread while it works for the request being profiled.
+
+    Worker threads inherit the request's context, so ``current_profile_id`` tells
+    whether the code they run belongs to the profiled request.
+    """
+    profile = _active
+    thread_id = threading.get_ident()
+    if profile is None or current_profile_id.get() is None or thread_id in profile.cpu.threads:
+        yield
+        return
+    profile.cpu.threads.add(thread_id)
+    try:
+        yield
+    finally:
+        profile.cpu.threads.discard(thread_id)
+
+
+def tracked(func):
+    """Wrap a plain function so its worker thread is sampled (see ``track``)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with track():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def tracked_iter(iterable):
+    """Wrap a synchronous iterator whose items are produced on worker threads."""
+    iterator = iter(iterable)
+    while True:
+        with track():
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def _finish(profile):
+    """Write ``profile`` and let the next request be profiled; safe to call twice."""
+    global _active
+    if _active is not profile:
+        return
+    _active = None
+    try:
+        profile.__exit__(None, None, None)
+    finally:
+        _busy.release()
+
+
+def install(app):
+    """Register the opt-in profiling middleware and the /profiles endpoints.
+
+    Does nothing unless profiling is enabled. Call it before the routes are
+    declared: plain ``def`` endpoints are wrapped with ``tracked`` as they are added.
+    """
+    if not ENABLED:
+        return
+    import inspect
+
+    from fastapi import HTTPException, Request
+    from fastapi.responses import FileResponse
+    from fastapi.routing import APIRoute
+
+    class TrackedRoute(APIRoute):
+        def __init__(self, path, endpoint, **kwargs):
+            if not inspect.iscoroutinefunction(endpoint):
+                endpoint = tracked(endpoint)
+            super().__init__(path, endpoint, **kwargs)
+
+    app.router.route_class = TrackedRoute
+
+    @app.get("/profiles", include_in_schema=False)
+    async def list_profiles():
+        if not os.path.isdir(PROFILE_DIR):
+            return {"profiles": []}
+        return {"profiles": sorted(os.listdir(PROFILE_DIR))}
+
+    @app.get("/profiles/{profile_id}", include_in_schema=False)
+    async def list_profile_files(profile_id: str):
+        try:
+            path = profile_path(profile_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not os.path.isdir(path):
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return {"profile_id": profile_id, "files": sorted(os.listdir(path))}
+
+    @app.get("/profiles/{profile_id}/{name}", include_in_schema=False)
+    async def download_profile(profile_id: str, name: str):
+        try:
+            path = profile_path(profile_id, name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail="Profile file not found")
+        return FileResponse(path, media_type="text/plain", filename=f"{profile_id}_{name}")
+
+    @app.middleware("http")
+    async def profiling_middleware(request: Request, call_next):
+        global _active
+        mode = request.headers.get("x-profile") or request.query_params.get("profile")
+        stale = _active
+        if stale is not None and time.time() - stale.start > MAX_SECONDS:
+            _finish(stale)  # a stream whose body was never sent
+        if mode not in ("1", "cpu") or not _busy.acquire(blocking=False):
+            return await call_next(request)
+        profile_id = new_profile_id()
+        token = current_profile_id.set((profile_id, mode))
+        # async endpoints run on the event loop thread, i.e. this one
+        profile = Profile(profile_id, allocations=(mode == "1")).__enter__()
+        _active = profile
+        try:
+            response = await call_next(request)
+        except BaseException:
+            _finish(profile)
+            raise
+        finally:
+            current_profile_id.reset(token)
+
+        # The body is produced after call_next returns; keep profiling until it is sent
+        body = response.body_iterator
+
+        async def profiled_body():
+            try:
+                async for chunk in body:
+                    yield chunk
+            finally:
+                _finish(profile)
+
+        response.body_iterator = profiled_body()
+        response.headers["X-Profile-Id"] = profile_id
+        return response
+
+
+def preimport(script):
+    """Import the script's top-level modules so import time is not profiled."""
+    with open(script, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        names = []
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a Python script under the sampling and allocation profilers.")
+    parser.add_argument("--id", default=None, help="profile id (default: random)")
+    parser.add_argument("--prefix", default="", help="prefix for the output file names")
+    parser.add_argument("--cpu-only", action="store_true", help="skip the allocation profile")
+    parser.add_argument("--profile-imports", action="store_true", help="also profile top-level imports")
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    profile_id = args.id or new_profile_id()
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    if not args.profile_imports:
+        preimport(args.script)
+    with Profile(profile_id, prefix=args.prefix, allocations=not args.cpu_only):
+        runpy.run_path(args.script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
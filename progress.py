@@ -0,0 +1,108 @@
+"""
+Progress events for long-running API calls, delivered as server-sent events.
+
+A client opts in per request with ``Accept: text/event-stream`` (or
+``?stream=1``); the endpoint then returns a ``text/event-stream`` body of
+
+    event: progress     {"stage": "csv_parse", "status": "started"|"finished", ...}
+    event: partial      intermediate results (e.g. statistics of the rows read so far)
+    event: result       the same JSON the endpoint returns without streaming
+    event: error        {"detail": "..."} (the HTTP status is already 200 by then)
+
+Training scripts run as subprocesses report progress on stderr with ``emit``,
+one ``PROGRESS {json}`` line per event; ``run_streaming`` turns those lines
+into events while the script runs.
+"""
+import asyncio
+import json
+import sys
+import time
+
+PREFIX = "PROGRESS "
+MIN_PARTIAL_INTERVAL = 0.25     # seconds between "partial" events
+
+
+def wants_stream(request):
+    return ("text/event-stream" in request.headers.get("accept", "")
+            or request.query_params.get("stream") in ("1", "true"))
+
+
+def sse(event, data):
+    import responses
+    return f"event: {event}\ndata: {responses.dumps(data).decode('utf-8')}\n\n"
+
+
+def sse_raw(event, body):
+    """Event whose data is an already serialized JSON body (bytes)."""
+    return f"event: {event}\ndata: {body.decode('utf-8')}\n\n"
+
+
+def stage(name, status, **fields):
+    return sse("progress", {"stage": name, "status": status, **fields})
+
+
+def event_stream(generator):
+    from fastapi.responses import StreamingResponse
+
+    import profiling
+    if not hasattr(generator, "__aiter__"):
+        # Synchronous generators run on worker threads; sample them when profiled
+        generator = profiling.tracked_iter(generator)
+    # X-Accel-Buffering stops nginx-style proxies from holding events back
+    return StreamingResponse(generator, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+class Throttle:
+    """``ready()`` is true at most once per ``interval`` seconds."""
+
+    def __init__(self, interval=MIN_PARTIAL_INTERVAL):
+        self.interval = interval
+        self._last = 0.0
+
+    def ready(self):
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
+
+
+def emit(stage, **fields):
+    """For subprocess scripts: report progress to the API on stderr."""
+    print(PREFIX + json.dumps({"stage": stage, **fields}), file=sys.stderr, flush=True)
+
+
+def strip_progress(stderr):
+    """stderr of a finished script without its PROGRESS lines."""
+    return "".join(line for line in stderr.splitlines(keepends=True) if not line.startswith(PREFIX))
+
+
+async def run_streaming(command):
+    """Run ``command``; yield ("progress", dict) per PROGRESS line, then ("exit", (code, stdout, stderr)).
+
+    If the generator is closed early (the client of the stream went away), the
+    process is killed.
+    """
+    proc = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE,
+                                                stderr=asyncio.subprocess.PIPE)
+    stdout_task = asyncio.ensure_future(proc.stdout.read())
+    try:
+        stderr_lines = []
+        async for raw in proc.stderr:
+            line = raw.decode("utf-8", errors="replace")
+            if line.startswith(PREFIX):
+                try:
+                    yield "progress", json.loads(line[len(PREFIX):])
+                    continue
+                except ValueError:
+                    pass
+            stderr_lines.append(line)
+        stdout = (await stdout_task).decode("utf-8", errors="replace")
+        code = await proc.wait()
+        yield "exit", (code, stdout, "".join(stderr_lines))
+    finally:
+        stdout_task.cancel()
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
@@ -0,0 +1,225 @@
+"""
+Response helpers for DataFrame-derived payloads.
+
+- ``dumps`` serialises once, straight from NumPy values, with orjson when it is
+  installed (NaN/inf become ``null``); the stdlib fallback produces the same JSON
+- ``respond`` negotiates ``Content-Encoding`` (brotli if the ``brotli`` package is
+  installed, else gzip) for bodies above ``MIN_COMPRESS_BYTES``
+- ``summarize`` builds the /analyze payload for one page of columns without
+  the ``to_json`` -> ``json.loads`` -> re-serialise round trip
+- ``summary_columnar`` / ``summary_arrow`` are compact variants for wide data
+  (the Arrow one needs the optional ``pyarrow`` package, see ``arrow_available``)
+- ``RunningStats`` keeps count/mean/std/min/max over chunks, for partial results
+
+NumPy is imported inside the functions so importing this module stays cheap
+(see warmup.py).
+"""
+import gzip
+import importlib.util
+import json
+import math
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+DEFAULT_COLUMN_LIMIT = 100
+DESCRIBE_STATS = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+
+def _clean(obj):
+    """Fallback conversion of NumPy values and NaN/inf for the stdlib encoder."""
+    import numpy as np
+    if isinstance(obj, dict):
+        return {str(k): _clean(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_clean(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _clean(obj.tolist())
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return obj
+
+
+def _default(obj):
+    import numpy as np
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)  # timestamps, decimals, ...
+
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_clean(obj), default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header; ``*`` stands for any coding not listed."""
+    accepted = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def arrow_available():
+    """Whether ``summary_arrow`` can run (checked without importing pyarrow)."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def respond(request, body, media_type="application/json", headers=None):
+    """Return ``body`` (bytes or a JSON-serialisable object), compressed if the client accepts it."""
+    if not isinstance(body, (bytes, bytearray)):
+        body = dumps(body)
+    headers = dict(headers or {})
+    accepted = accepted_encodings(request.headers.get("accept-encoding", "")) if request is not None else {}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        codings = (["br"] if brotli is not None else []) + ["gzip"]
+        q = {c: accepted.get(c, accepted.get("*", 0.0)) for c in codings}
+        coding = max(codings, key=q.get)    # the first (br) on a tie
+        if q[coding] > 0 and coding == "br":
+            body = brotli.compress(body, quality=4)
+            headers["Content-Encoding"] = "br"
+        elif q[coding] > 0:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _page(df, offset, limit):
+    total = df.shape[1]
+    limit = DEFAULT_COLUMN_LIMIT if limit is None else limit
+    offset = max(0, min(offset, total))
+    end = total if limit <= 0 else min(total, offset + limit)
+    page = {"offset": offset, "limit": limit, "total_columns": total,
+            "next_offset": end if end < total else None}
+    return df.iloc[:, offset:end], page
+
+
+def _describe(df):
+    """Return (columns, stats matrix) for the numeric columns of ``df``."""
+    import numpy as np
+    numeric = df.select_dtypes(include="number")
+    if numeric.shape[1] == 0:
+        return [], np.empty((0, len(DESCRIBE_STATS)))
+    desc = numeric.describe()
+    return list(desc.columns), desc.loc[DESCRIBE_STATS].to_numpy(dtype=float).T
+
+
+def _head(df, n=5):
+    head = df.head(n)
+    data = head.astype(object).where(head.notna(), None).to_numpy().tolist()
+    return {"columns": list(head.columns), "index": head.index.tolist(), "data": data}
+
+
+def summarize(df, offset=0, limit=None):
+    """/analyze payload for one page of columns, same shape as the original endpoint."""
+    page_df, page = _page(df, offset, limit)
+    columns, stats = _describe(page_df)
+    description = {col: dict(zip(DESCRIBE_STATS, row)) for col, row in zip(columns, stats.tolist())}
+    missing = page_df.isna().sum()
+    info = {
+        "columns": list(page_df.columns),
+        "dtypes": {col: str(dtype) for col, dtype in page_df.dtypes.items()},
+        "shape": df.shape,
+        "missing_values": dict(zip(missing.index, missing.to_numpy())),
+    }
+    return {"head": _head(page_df), "description": description, "info": info, "page": page}
+
+
+def summary_columnar(df, offset=0, limit=None):
+    """Compact variant: each block is a column list plus a values matrix."""
+    page_df, page = _page(df, offset, limit)
+    columns, stats = _describe(page_df)
+    return {
+        "head": _head(page_df),
+        "description": {"stats": DESCRIBE_STATS, "columns": columns, "values": stats},
+        "info": {
+            "columns": list(page_df.columns),
+            "dtypes": [str(d) for d in page_df.dtypes],
+            "missing_values": page_df.isna().sum().to_numpy(),
+            "shape": df.shape,
+        },
+        "page": page,
+    }
+
+
+def summary_arrow(df, offset=0, limit=None):
+    """Binary variant: describe() plus dtype/missing per column as an Arrow IPC stream."""
+    import numpy as np
+    import pyarrow as pa
+
+    page_df, _ = _page(df, offset, limit)
+    columns, stats = _describe(page_df)
+    stat_rows = dict(zip(columns, stats))
+    empty = np.full(len(DESCRIBE_STATS), np.nan)
+    table = pa.table({
+        "column": [str(c) for c in page_df.columns],
+        "dtype": [str(d) for d in page_df.dtypes],
+        "missing": page_df.isna().sum().to_numpy(),
+        **{stat: [float(stat_rows.get(c, empty)[i]) for c in page_df.columns]
+           for i, stat in enumerate(DESCRIBE_STATS)},
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class RunningStats:
+    """Per-column statistics accumulated chunk by chunk (numeric columns only)."""
+
+    def __init__(self):
+        self.rows = 0
+        self.missing = {}
+        self._numeric = {}  # column -> [count, sum, sum of squares, min, max]
+
+    def update(self, chunk):
+        import numpy as np
+        self.rows += len(chunk)
+        for col, n in chunk.isna().sum().items():
+            self.missing[col] = self.missing.get(col, 0) + int(n)
+        for col in chunk.select_dtypes(include="number").columns:
+            values = chunk[col].to_numpy(dtype=float)
+            values = values[~np.isnan(values)]
+            if len(values) == 0:
+                continue
+            acc = self._numeric.setdefault(col, [0, 0.0, 0.0, np.inf, -np.inf])
+            acc[0] += len(values)
+            acc[1] += values.sum()
+            acc[2] += (values ** 2).sum()
+            acc[3] = min(acc[3], values.min())
+            acc[4] = max(acc[4], values.max())
+
+    def summary(self):
+        description = {}
+        for col, (count, total, sq_total, lo, hi) in self._numeric.items():
+            mean = total / count
+            # Sample std, as in DataFrame.describe()
+            var = (sq_total - count * mean ** 2) / (count - 1) if count > 1 else float("nan")
+            description[col] = {"count": count, "mean": mean, "std": math.sqrt(max(var, 0.0)) if count > 1 else None,
+                                "min": lo, "max": hi}
+        return {"rows_processed": self.rows, "description": description, "missing_values": self.missing}
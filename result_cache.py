@@ -0,0 +1,108 @@
+"""
+Size-bounded disk cache of endpoint results, keyed on what determines them.
+
+The key is the sha256 of (dataset digest, operation, parameters), e.g.
+``("3f1c...", "model", {"target_column": "Survived", "mode": "full"})``, so an
+identical request on identical data is answered from disk, whatever the
+uploaded file was called. Values are the serialized response bodies.
+
+Eviction is least-recently-used by file mtime (a hit touches the entry): when
+the cache grows past ``max_bytes`` the oldest entries are deleted until it is
+below 90% of the limit. ``RESULT_CACHE_VERSION`` is part of every key; bump it
+when an endpoint's output format or computation changes.
+
+Requests sent with ``Cache-Control: no-cache`` bypass the lookup (the fresh
+result is still stored).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import metrics
+
+RESULT_CACHE_VERSION = 1
+MAX_BYTES = int(float(os.environ.get("RESULT_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+LOOKUPS = metrics.Counter("result_cache_lookups_total", "Result cache lookups by operation and result (hit/miss).")
+EVICTIONS = metrics.Counter("result_cache_evictions_total", "Result cache entries evicted to stay under the size limit.")
+metrics.REGISTRY.extend([LOOKUPS, EVICTIONS])
+
+
+def bypass(request):
+    return "no-cache" in request.headers.get("cache-control", "")
+
+
+class ResultCache:
+    def __init__(self, root, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(dataset_digest, operation, params=None):
+        raw = json.dumps([RESULT_CACHE_VERSION, dataset_digest, operation, params or {}], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key, operation="result"):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+        except FileNotFoundError:
+            LOOKUPS.inc(operation=operation, result="miss")
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        LOOKUPS.inc(operation=operation, result="hit")
+        return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        os.replace(tmp, self._path(key))
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.root):
+                if entry.name.startswith("."):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            target = self.max_bytes * 0.9
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                total -= size
+                EVICTIONS.inc()
+
+    def stats(self):
+        sizes = [e.stat().st_size for e in os.scandir(self.root) if not e.name.startswith(".")]
+        return {"entries": len(sizes), "bytes": sum(sizes), "max_bytes": self.max_bytes}
@@ -0,0 +1,488 @@
+"""
+Run the project's notebooks in parallel, reusing cached cell outputs.
+
+Every *.ipynb under the repo (plus the ones generated by BUILDERS, e.g.
+Spaceship_Titanic/create_presentation.py) is executed in its own kernel, up to
+``--jobs`` notebooks at a time, each with a total ``--timeout``. The source
+notebooks are left untouched; executed copies go to notebook_runs/. Builders
+write into notebook_runs/generated/<their directory>/ (not over the committed
+notebooks), and what they generate runs in the builder's directory.
+
+Cell cache
+    Each code cell gets a key chained from everything that can change its
+    result: the previous cell's key and the cell's own source, seeded with the
+    environment (Python version and installed packages), the kernel name and
+    the files the notebook reads or imports. Those are found by parsing its
+    code cells: literal paths passed to ``read_*``/``load*``/``open`` calls
+    (directly, through ``os.path.join`` or a variable assigned a literal), and
+    local modules it imports, next to the notebook or at the repo root, plus
+    what those modules import in turn. Paths built at run time are not seen;
+    add them with ``--watch`` globs. Markdown cells are not part of the chain.
+    Successful cells store their outputs and duration under notebook_runs/cache/.
+
+    - All cells cached: the notebook is not run at all; outputs are restored.
+    - A changed cell (or a new package version) invalidates it and every cell
+      after it. The unchanged prefix still has to rebuild the kernel's state,
+      so its cells are re-run, unless a state snapshot exists: after a cell
+      that took at least ``--snapshot-min`` seconds the kernel namespace is
+      saved with dill (when installed in the kernel), and a later run restores
+      the latest snapshot in the unchanged prefix and starts from there.
+      Namespaces that dill cannot pickle (open files, some plot objects) just
+      get no snapshot.
+
+Report
+    Per notebook: status (ok / cached / error / timeout), wall time and the
+    time saved by the cache; per cell: cached or executed and its seconds.
+    Written to notebook_runs/report.json; the slowest cells are printed.
+
+When several notebooks run at once, BLAS/OpenMP and joblib (n_jobs=-1) in each
+kernel are limited to cpu_count / jobs threads so the kernels do not fight over
+cores.
+
+Needs nbclient, nbformat and ipykernel (pip install nbclient ipykernel dill).
+
+Examples:
+    python run_notebooks.py                         # everything, cpu_count jobs
+    python run_notebooks.py 3_SVM.ipynb "Spaceship_Titanic/*.ipynb" --jobs 2
+    python run_notebooks.py --no-cache --timeout 3600
+"""
+import argparse
+import ast
+import concurrent.futures
+import fnmatch
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RUNS_DIR = os.path.join(ROOT, "notebook_runs")
+CACHE_DIR = os.path.join(RUNS_DIR, "cache")
+GENERATED = "generated"
+BUILDERS = [os.path.join("Spaceship_Titanic", "create_presentation.py")]
+READ_CALL = re.compile(r"^(read_\w+|load\w*|open|genfromtxt|loadtxt|exists|isfile)$")
+DEFAULT_TIMEOUT = 1800          # seconds per notebook
+SNAPSHOT_MIN_SECONDS = 10.0
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "LOKY_MAX_CPU_COUNT")
+
+SNAPSHOT_CODE = """\
+try:
+    import dill as _dill
+    (getattr(_dill, "dump_module", None) or _dill.dump_session)({path!r})
+except Exception:
+    pass
+"""
+RESTORE_CODE = """\
+try:
+    import dill as _dill
+    (getattr(_dill, "load_module", None) or _dill.load_session)({path!r})
+    print("restored")
+except Exception as _e:
+    print("failed", _e)
+"""
+
+
+def discover(patterns=None):
+    """Notebook paths relative to ROOT, sorted; ``patterns`` are globs relative to ROOT."""
+    found = set()
+    for pattern in patterns or ["**/*.ipynb"]:
+        for path in glob.glob(os.path.join(ROOT, pattern), recursive=True):
+            rel = os.path.relpath(path, ROOT)
+            if ".ipynb_checkpoints" in rel or rel.startswith("notebook_runs"):
+                continue
+            if rel.endswith(".ipynb"):
+                found.add(rel)
+    return sorted(found)
+
+
+def build_generated(timeout=300):
+    """Run the scripts that write notebooks; returns the names of what they wrote."""
+    names = []
+    for script in BUILDERS:
+        path = os.path.join(ROOT, script)
+        if not os.path.exists(path):
+            continue
+        out_dir = os.path.join(RUNS_DIR, GENERATED, os.path.dirname(script))
+        os.makedirs(out_dir, exist_ok=True)
+        result = subprocess.run([sys.executable, path], cwd=out_dir, capture_output=True, text=True, timeout=timeout)
+        if result.returncode != 0:
+            print(f"{script} failed:\n{result.stderr}", file=sys.stderr)
+        names += [os.path.join(GENERATED, os.path.dirname(script), n)
+                  for n in sorted(os.listdir(out_dir)) if n.endswith(".ipynb")]
+    return names
+
+
+def locate(name):
+    """(notebook file, directory it runs in) for a name from ``discover`` or ``build_generated``."""
+    if name.startswith(GENERATED + os.sep):
+        return os.path.join(RUNS_DIR, name), os.path.join(ROOT, os.path.dirname(name[len(GENERATED) + 1:]))
+    path = os.path.join(ROOT, name)
+    return path, os.path.dirname(path)
+
+
+def environment_fingerprint():
+    from importlib import metadata
+    packages = sorted(f"{d.metadata['Name']}=={d.version}".lower() for d in metadata.distributions()
+                      if d.metadata["Name"])
+    return hashlib.sha256("\n".join([sys.version, *packages]).encode("utf-8")).hexdigest()
+
+
+def _parse(source):
+    """AST of a code cell or module; IPython magics and shell lines are dropped."""
+    lines = [line for line in source.splitlines() if not line.lstrip().startswith(("%", "!"))]
+    try:
+        return ast.parse("\n".join(lines))
+    except SyntaxError:
+        return None
+
+
+def _call_name(call):
+    return getattr(call.func, "attr", getattr(call.func, "id", ""))
+
+
+def _literal_paths(node, constants):
+    """The paths ``node`` may evaluate to when built from string literals only.
+
+    A name assigned several literals (e.g. in if/else branches) yields each of
+    them; ``os.getcwd()`` is the notebook's directory, i.e. "".
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value.replace("\\", "/")]
+    if isinstance(node, ast.Name):
+        return constants.get(node.id, [])
+    if isinstance(node, ast.Call) and _call_name(node) == "getcwd":
+        return [""]
+    if isinstance(node, ast.Call) and _call_name(node) == "join" and node.args:
+        combos = [""]
+        for arg in node.args:
+            parts = _literal_paths(arg, constants)
+            combos = [os.path.join(a, b) if a else b for a in combos for b in parts][:32]
+        return combos
+    return []
+
+
+def read_paths(trees):
+    """Literal paths the code reads: arguments of read_*/load*/open/exists calls (not open for writing).
+
+    ``trees`` share one namespace, like the cells of a notebook.
+    """
+    constants, paths = {}, []
+    nodes = [node for tree in trees for node in ast.walk(tree)]
+    for node in nodes:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            values = _literal_paths(node.value, constants)
+            if values:
+                constants.setdefault(node.targets[0].id, []).extend(values)
+    for node in nodes:
+        if not isinstance(node, ast.Call) or not READ_CALL.match(_call_name(node)):
+            continue
+        if _call_name(node) == "open":
+            mode = node.args[1] if len(node.args) > 1 else next((k.value for k in node.keywords if k.arg == "mode"), None)
+            if isinstance(mode, ast.Constant) and any(c in str(mode.value) for c in "wax"):
+                continue
+        for arg in node.args[:1] + [k.value for k in node.keywords if k.arg in ("filepath_or_buffer", "path", "file", "fname")]:
+            paths.extend(p for p in _literal_paths(arg, constants) if p)
+    return paths
+
+
+def imported_modules(tree):
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+    return names
+
+
+def _local_module(name, search):
+    """File of module ``name`` if it lives in one of the ``search`` directories."""
+    base = name.replace(".", os.sep)
+    for directory in search:
+        for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+            path = os.path.join(directory, candidate)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def notebook_inputs(nb, directory):
+    """Files a notebook running in ``directory`` reads or imports (local modules, recursively)."""
+    search = [directory] if os.path.abspath(directory) == ROOT else [directory, ROOT]
+    trees = [tree for tree in (_parse(cell.source) for cell in nb.cells if cell.cell_type == "code") if tree]
+    paths = {os.path.join(directory, p) for p in read_paths(trees)}
+    pending = [name for tree in trees for name in imported_modules(tree)]
+    seen = set()
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        module = _local_module(name, search)
+        if module is None:
+            continue
+        paths.add(module)
+        with open(module, encoding="utf-8") as f:
+            tree = _parse(f.read())
+        if tree:
+            pending.extend(imported_modules(tree))
+    return paths
+
+
+def inputs_fingerprint(nb, directory, watch=()):
+    """Hash of the files a notebook in ``directory`` reads or imports, plus ``watch`` globs."""
+    paths = notebook_inputs(nb, directory)
+    for pattern in watch:
+        paths.update(glob.glob(os.path.join(ROOT, pattern), recursive=True))
+    h = hashlib.sha256()
+    for path in sorted(os.path.abspath(p) for p in paths if os.path.isfile(p)):
+        h.update(os.path.relpath(path, ROOT).encode("utf-8"))
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def cell_keys(nb, seed):
+    """Chained key per code cell (None for other cells)."""
+    keys = []
+    previous = seed
+    for cell in nb.cells:
+        if cell.cell_type != "code":
+            keys.append(None)
+            continue
+        previous = hashlib.sha256((previous + "\0" + cell.source).encode("utf-8")).hexdigest()
+        keys.append(previous)
+    return keys
+
+
+class CellCache:
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, key[:2], key + ext)
+
+    def get(self, key):
+        try:
+            with open(self._path(key, ".json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key, outputs, execution_count, seconds):
+        path = self._path(key, ".json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"outputs": outputs, "execution_count": execution_count, "seconds": seconds}, f)
+        os.replace(tmp, path)
+
+    def snapshot_path(self, key):
+        path = self._path(key, ".pkl")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def has_snapshot(self, key):
+        return os.path.exists(self._path(key, ".pkl"))
+
+
+def _kernel_run(client, code, index):
+    """Run helper code in the kernel outside the notebook; returns its stdout."""
+    import nbformat
+    cell = nbformat.v4.new_code_cell(code)
+    original = client.nb.cells[index]
+    try:
+        client.execute_cell(cell, index, store_history=False)
+    finally:
+        client.nb.cells[index] = original  # execute_cell stores the cell it ran at ``index``
+    return "".join(o.get("text", "") for o in cell.outputs if o.get("output_type") == "stream")
+
+
+def run_notebook(name, seed, options):
+    """Execute one notebook with the cell cache; returns its report (runs in a worker process)."""
+    import nbformat
+    from nbclient import NotebookClient
+    from nbclient.exceptions import CellExecutionError, CellTimeoutError
+
+    start = time.perf_counter()
+    deadline = time.monotonic() + options["timeout"]
+    path, directory = locate(name)
+    report = {"notebook": name, "status": "ok", "seconds": 0.0, "saved_s": 0.0, "cells": [], "error": None}
+
+    nb = nbformat.read(path, as_version=4)
+    seed = hashlib.sha256((seed + options["kernel"] + inputs_fingerprint(nb, directory, options["watch"])).encode("utf-8")).hexdigest()
+    keys = cell_keys(nb, seed)
+    code_cells = [i for i, cell in enumerate(nb.cells) if cell.cell_type == "code"]
+    cache = CellCache(options["cache_dir"])
+
+    # 1. Longest cached prefix, and the latest snapshot inside it
+    cached = []
+    if options["use_cache"]:
+        for i in code_cells:
+            entry = cache.get(keys[i])
+            if entry is None:
+                break
+            cached.append(entry)
+    resume = 0
+    if options["snapshots"] and len(cached) < len(code_cells):
+        for n in range(len(cached), 0, -1):
+            if cache.has_snapshot(keys[code_cells[n - 1]]):
+                resume = n
+                break
+
+    def restore(n):
+        for i, entry in zip(code_cells[:n], cached):
+            nb.cells[i].outputs = [nbformat.from_dict(o) for o in entry["outputs"]]
+            nb.cells[i].execution_count = entry["execution_count"]
+            report["cells"].append({"index": i, "status": "cached", "seconds": 0.0,
+                                    "cached_seconds": entry["seconds"]})
+            report["saved_s"] += entry["seconds"]
+
+    # 2. Nothing changed: no kernel needed
+    if len(cached) == len(code_cells):
+        restore(len(cached))
+        report["status"] = "cached"
+        return _finish(nb, report, start)
+
+    # 3. Start a kernel, jump over the snapshotted prefix, run the rest
+    client = NotebookClient(nb, kernel_name=options["kernel"], timeout=int(options["timeout"]),
+                            resources={"metadata": {"path": directory}})
+    client.reset_execution_trackers()
+    log_path = os.path.join(RUNS_DIR, name + ".kernel.log")
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    try:
+        with open(log_path, "wb") as log, client.setup_kernel(stdout=log, stderr=log):
+            if resume:
+                snapshot = cache.snapshot_path(keys[code_cells[resume - 1]])
+                if not _kernel_run(client, RESTORE_CODE.format(path=snapshot), 0).startswith("restored"):
+                    resume = 0
+            restore(resume)
+            for position, i in enumerate(code_cells[resume:], resume):
+                cell = nb.cells[i]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CellTimeoutError(f"notebook timeout of {options['timeout']:.0f}s reached")
+                client.timeout = math.ceil(remaining)
+                t0 = time.perf_counter()
+                try:
+                    client.execute_cell(cell, i, execution_count=client.code_cells_executed + 1)
+                except CellTimeoutError:
+                    report["cells"].append({"index": i, "status": "timeout",
+                                            "seconds": round(time.perf_counter() - t0, 3)})
+                    raise
+                except CellExecutionError:
+                    report["cells"].append({"index": i, "status": "error",
+                                            "seconds": round(time.perf_counter() - t0, 3)})
+                    raise
+                seconds = time.perf_counter() - t0
+                report["cells"].append({"index": i, "status": "executed", "seconds": round(seconds, 3)})
+                cache.put(keys[i], cell.outputs, cell.execution_count, round(seconds, 3))
+                is_last = position == len(code_cells) - 1
+                if options["snapshots"] and seconds >= options["snapshot_min"] and not is_last:
+                    _kernel_run(client, SNAPSHOT_CODE.format(path=cache.snapshot_path(keys[i])), i)
+    except CellTimeoutError as e:
+        report["status"], report["error"] = "timeout", str(e).strip().splitlines()[0]
+    except CellExecutionError as e:
+        report["status"], report["error"] = "error", f"{e.ename}: {e.evalue}"
+    except Exception as e:  # kernel failed to start, died, ...
+        report["status"], report["error"] = "error", f"{type(e).__name__}: {e}"
+    return _finish(nb, report, start)
+
+
+def _finish(nb, report, start):
+    import nbformat
+    output = os.path.join(RUNS_DIR, report["notebook"])
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    nbformat.write(nb, output)
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    report["saved_s"] = round(report["saved_s"], 3)
+    return report
+
+
+def limit_threads(jobs):
+    """Split the cores between concurrently running kernels (inherited through the environment)."""
+    per_kernel = str(max(1, (os.cpu_count() or 1) // jobs))
+    for name in THREAD_VARIABLES:
+        os.environ.setdefault(name, per_kernel)
+
+
+def format_report(reports, slowest=10):
+    lines = ["| notebook | status | seconds | saved_s | executed | cached |", "|---|---|---|---|---|---|"]
+    for r in reports:
+        executed = sum(1 for c in r["cells"] if c["status"] == "executed")
+        cached = sum(1 for c in r["cells"] if c["status"] == "cached")
+        status = r["status"] if not r["error"] else f"{r['status']}: {r['error'][:80]}"
+        lines.append(f"| {r['notebook']} | {status} | {r['seconds']} | {r['saved_s']} | {executed} | {cached} |")
+    cells = sorted(((c["seconds"], r["notebook"], c["index"]) for r in reports for c in r["cells"]
+                    if c["status"] != "cached"), reverse=True)[:slowest]
+    if cells:
+        lines += ["", "Slowest cells:", "| notebook | cell | seconds |", "|---|---|---|"]
+        lines += [f"| {notebook} | {index} | {seconds} |" for seconds, notebook, index in cells]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("notebooks", nargs="*", help="globs relative to the repo (default: all notebooks)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="notebooks run at once")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="seconds per notebook")
+    parser.add_argument("--kernel", default="python3", help="kernel for every notebook")
+    parser.add_argument("--exclude", action="append", default=[], help="glob of notebooks to skip")
+    parser.add_argument("--no-cache", action="store_true", help="run every cell (the cache is still refreshed)")
+    parser.add_argument("--no-snapshots", action="store_true", help="do not save or restore kernel state")
+    parser.add_argument("--snapshot-min", type=float, default=SNAPSHOT_MIN_SECONDS,
+                        help="snapshot the kernel after cells slower than this (seconds)")
+    parser.add_argument("--no-build", action="store_true", help="skip the notebook-generating scripts")
+    parser.add_argument("--watch", action="append", default=[],
+                        help="glob (relative to the repo) of more inputs that invalidate the cache")
+    parser.add_argument("--json", default=os.path.join(RUNS_DIR, "report.json"))
+    args = parser.parse_args()
+
+    notebooks = discover(args.notebooks)
+    if not args.no_build:
+        notebooks += [n for n in build_generated()
+                      if not args.notebooks or any(fnmatch.fnmatch(n, p) for p in args.notebooks)]
+    notebooks = [n for n in notebooks if not any(fnmatch.fnmatch(n, pattern) for pattern in args.exclude)]
+    if not notebooks:
+        parser.error("no notebooks matched")
+
+    jobs = max(1, min(args.jobs, len(notebooks)))
+    limit_threads(jobs)
+    seed = environment_fingerprint()
+    options = {"timeout": args.timeout, "kernel": args.kernel, "use_cache": not args.no_cache,
+               "snapshots": not args.no_snapshots, "snapshot_min": args.snapshot_min, "cache_dir": CACHE_DIR,
+               "watch": args.watch}
+
+    print(f"Running {len(notebooks)} notebooks, {jobs} at a time", flush=True)
+    reports = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(run_notebook, n, seed, options): n for n in notebooks}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                report = future.result()
+            except Exception as e:  # the worker itself crashed
+                report = {"notebook": futures[future], "status": "error", "seconds": 0.0, "saved_s": 0.0,
+                          "cells": [], "error": f"{type(e).__name__}: {e}"}
+            print(f"{report['status']:8} {report['seconds']:8.1f}s  {report['notebook']}", flush=True)
+            reports.append(report)
+
+    reports.sort(key=lambda r: r["notebook"])
+    print()
+    print(format_report(reports))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(reports, f, indent=2, ensure_ascii=False)
+    print(f"\nSaved {args.json}")
+    sys.exit(1 if any(r["status"] in ("error", "timeout") for r in reports) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Preforking launcher: one model in memory, shared by N uvicorn workers.
+
+Plain ``uvicorn --workers N`` starts N interpreters that each load their own
+copy of the voting pipeline. Here the parent process
+
+1. imports the app module and runs its warm-up (model load plus one
+   prediction) synchronously, with the cyclic GC disabled so the heap is not
+   compacted into fresh pages while loading,
+2. calls ``gc.freeze()``, which moves every object into the permanent
+   generation so later collections in the workers never write to their GC
+   headers (a collection would otherwise dirty, and so un-share, every page
+   that holds an object),
+3. binds the listening socket and forks the workers, which serve it with
+   uvicorn and restart if one dies.
+
+The model's NumPy buffers (trees, support vectors, the KNN training set) are
+never written after loading, so their pages stay shared copy-on-write between
+all workers. Refcount updates still dirty the pages holding the small Python
+objects that requests touch, which is why the report shows some private memory
+per worker.
+
+Memory per process is read from /proc/<pid>/smaps_rollup (Linux):
+    RSS   resident set, counting shared pages in full for every process
+    PSS   shared pages divided among the processes that map them
+    USS   private pages only: what the host frees if the worker exits
+``GET /workers/memory`` on any worker returns the report for the parent and all
+workers; the parent also prints it every ``--report-interval`` seconds.
+
+A new model version published to the registry is picked up by each worker's
+watcher, but is loaded separately in every worker (not shared) until the
+launcher is restarted.
+
+Requires os.fork (Linux/macOS).
+
+Example:
+    python serve_prefork.py --workers 4 --port 7860
+    curl localhost:7860/workers/memory
+"""
+import argparse
+import gc
+import importlib
+import inspect
+import os
+import signal
+import socket
+import sys
+import time
+
+
+def read_memory(pid):
+    """{"rss", "pss", "uss", "shared"} in bytes from smaps_rollup, or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_report(parent_pid):
+    processes = [{"pid": parent_pid, "role": "parent", **(read_memory(parent_pid) or {})}]
+    for pid in child_pids(parent_pid):
+        processes.append({"pid": pid, "role": "worker", **(read_memory(pid) or {})})
+    workers = [p for p in processes if p["role"] == "worker"]
+    total_rss = sum(p.get("rss", 0) for p in processes)
+    total_pss = sum(p.get("pss", 0) for p in processes)
+    return {
+        "processes": processes,
+        "workers": len(workers),
+        "total_rss": total_rss,     # what naive per-process accounting would suggest
+        "total_pss": total_pss,     # what the host actually spends
+        "sharing_ratio": round(total_rss / total_pss, 2) if total_pss else None,
+    }
+
+
+def format_report(report):
+    mb = 1024 * 1024
+    lines = [f"{'pid':>8} {'role':7} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8} {'shared MB':>10}"]
+    for p in report["processes"]:
+        if "rss" not in p:
+            lines.append(f"{p['pid']:>8} {p['role']:7}   (smaps_rollup unavailable)")
+            continue
+        lines.append(f"{p['pid']:>8} {p['role']:7} {p['rss'] / mb:8.1f} {p['pss'] / mb:8.1f} "
+                     f"{p['uss'] / mb:8.1f} {p['shared'] / mb:10.1f}")
+    lines.append(f"total RSS {report['total_rss'] / mb:.1f} MB, total PSS {report['total_pss'] / mb:.1f} MB"
+                 f" (sharing ratio {report['sharing_ratio']})")
+    return "\n".join(lines)
+
+
+def load_app(target, parent_pid):
+    """Import ``module:attr`` and build the app in the parent, with /workers/memory added.
+
+    ``attr`` is either a factory function (called, with ``extra_routes`` when it
+    accepts it) or an app instance such as ``api:app``, used as it is.
+    """
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name)
+
+    def extra_routes(app):
+        @app.get("/workers/memory")
+        async def workers_memory():
+            return memory_report(parent_pid)
+
+    obj = getattr(module, attr or "create_app")
+    if not (inspect.isfunction(obj) or inspect.ismethod(obj)):
+        app = obj  # an ASGI app instance is callable too, but not a factory
+        if hasattr(app, "add_api_route"):
+            extra_routes(app)
+    elif "extra_routes" in inspect.signature(obj).parameters:
+        app = obj(extra_routes=extra_routes)
+    else:
+        app = obj()  # no hook: the app is served without /workers/memory
+    return module, app
+
+
+def serve_worker(app, sock, module, args):
+    import uvicorn
+
+    # The GC stays frozen for the objects inherited from the parent; collect new garbage normally
+    gc.enable()
+    holder = getattr(module, "HOLDER", None)
+    if holder is not None:
+        holder.start_watching()  # threads do not survive fork
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=5)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="web_app:create_app", help="module:factory returning the ASGI app, or module:app")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7860)
+    parser.add_argument("--report-interval", type=float, default=60, help="seconds between memory reports (0 = off)")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        parser.error("serve_prefork.py needs os.fork; on Windows run web_app.py instead")
+
+    parent_pid = os.getpid()
+
+    # 1. Load and warm everything in the parent
+    gc.disable()
+    start = time.perf_counter()
+    module, app = load_app(args.app, parent_pid)
+    warmup = getattr(module, "WARMUP", None)
+    if warmup is not None:
+        warmup.run()
+        if warmup.error:
+            print(f"Warm-up failed: {warmup.error}", file=sys.stderr)
+    print(f"Loaded {args.app} in {time.perf_counter() - start:.1f}s")
+
+    # 2. Keep the inherited heap out of every future collection
+    gc.collect()
+    gc.freeze()
+
+    # 3. Listen once, fork the workers
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    workers = set()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                serve_worker(app, sock, module, args)
+            finally:
+                os._exit(0)
+        workers.add(pid)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        spawn()
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers (parent pid {parent_pid})")
+
+    next_report = time.monotonic() + args.report_interval if args.report_interval > 0 else None
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            workers.discard(pid)
+            if not stopping:
+                print(f"Worker {pid} exited ({status}); starting a replacement", file=sys.stderr)
+                spawn()
+            continue
+        if next_report is not None and time.monotonic() >= next_report:
+            print(format_report(memory_report(parent_pid)), flush=True)
+            next_report = time.monotonic() + args.report_interval
+        time.sleep(0.5)
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Import-time breakdown for the services' cold start.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter and
+aggregates the import time per top-level package, so regressions in worker
+start-up (e.g. a heavy import creeping back into module scope) are easy to spot.
+
+Examples:
+    python startup_report.py                 # api and web_app
+    python startup_report.py api --top 15
+    python startup_report.py web_app --json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def import_profile(module):
+    """Return (wall seconds, total import us, [(package, self_us)]) for importing ``module``.
+
+    Self time is summed per top-level package, so the rows do not overlap and
+    add up to the total import time.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=BASE_DIR, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    packages = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, name = int(m.group(1)), int(m.group(2)), m.group(3)
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0) + self_us
+        if name == module:
+            total_us = cumulative_us
+    rows = sorted(packages.items(), key=lambda r: -r[1])
+    return wall, total_us, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["api", "web_app"])
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    report = {}
+    for module in args.modules:
+        try:
+            wall, total_us, rows = import_profile(module)
+        except RuntimeError as e:
+            report[module] = {"error": str(e)}
+            continue
+        report[module] = {
+            "wall_seconds": round(wall, 3),
+            "import_ms": round(total_us / 1000, 1),
+            "packages": [{"package": p, "self_ms": round(us / 1000, 1)} for p, us in rows[:args.top]],
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for module, r in report.items():
+        if "error" in r:
+            print(f"{module}: import failed ({r['error']})\n")
+            continue
+        print(f"{module}: import {r['import_ms']:.0f} ms, {r['wall_seconds']:.2f}s wall (interpreter start included)")
+        print(f"  {'package':24s} {'ms':>10s}")
+        for row in r["packages"]:
+            print(f"  {row['package']:24s} {row['self_ms']:10.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,63 @@
 const API_URL = "http://localhost:8000";
 
+class ApiError extends Error {}
+
+// Calls a streaming endpoint (server-sent events over fetch, so POST works too).
+// onEvent(event, data) is called for every "progress"/"partial" event; resolves
+// with the data of the final "result" event.
+async function streamEvents(url, options, onEvent) {
+    const response = await fetch(url, {
+        ...options,
+        headers: { ...(options.headers || {}), 'Accept': 'text/event-stream' }
+    });
+    if (!response.ok) {
+        const data = await response.json();
+        throw new ApiError(typeof data.detail === 'string' ? data.detail : JSON.stringify(data.detail));
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let result = null;
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) >= 0) {
+            const block = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            let event = "message";
+            let data = "";
+            block.split("\n").forEach(line => {
+                if (line.startsWith("event: ")) event = line.slice(7);
+                else if (line.startsWith("data: ")) data += line.slice(6);
+            });
+            const parsed = JSON.parse(data);
+            if (event === "error") throw new ApiError(parsed.detail);
+            if (event === "result") result = parsed;
+            else onEvent(event, parsed);
+        }
+    }
+    return result;
+}
+
+function progressText(p) {
+    let text = `${p.stage}`;
+    if (p.status) text += ` ${p.status}`;
+    if (p.trees_built) text += `: ${p.trees_built}/${p.n_trees} trees`;
+    if (p.rung !== undefined) text += ` rung ${p.rung}, ${p.candidates} candidates`;
+    if (p.epoch) text += ` (epoch ${p.epoch}/${p.epochs})`;
+    if (p.rows !== undefined) text += `: ${p.rows.toLocaleString()}${p.total_rows ? "/" + p.total_rows.toLocaleString() : ""} rows`;
+    if (p.done) text += `: ${p.done}/${p.columns} columns`;
+    return text;
+}
+
+function errorHtml(error) {
+    const label = error instanceof ApiError ? "Error" : "Connection Error";
+    return `<span class="text-danger">${label}: ${error.message}</span>`;
+}
+
 document.getElementById('uploadBtn').addEventListener('click', async () => {
     const fileInput = document.getElementById('fileInput');
     if (fileInput.files.length === 0) {
@@ -36,33 +94,41 @@ document.getElementById('analyzeBtn').addEventListener('click', async () => {
     resultDiv.innerHTML = "Analyzing...";
 
     try {
-        const response = await fetch(`${API_URL}/analyze`);
-        const data = await response.json();
+        const data = await streamEvents(`${API_URL}/analyze`, {}, (event, payload) => {
+            if (event === "partial") {
+                // Statistics of the rows read so far
+                let html = `<p class="text-muted">Read ${payload.rows_processed.toLocaleString()} rows...</p>`;
+                html += "<table class='table table-sm'><thead><tr><th>column</th><th>mean</th><th>min</th><th>max</th></tr></thead><tbody>";
+                for (const [col, st] of Object.entries(payload.description)) {
+                    html += `<tr><td>${col}</td><td>${st.mean.toFixed(3)}</td><td>${st.min}</td><td>${st.max}</td></tr>`;
+                }
+                html += "</tbody></table>";
+                resultDiv.innerHTML = html;
+            } else {
+                resultDiv.innerHTML = `<p class="text-muted">${progressText(payload)}</p>`;
+            }
+        });
 
-        if (response.ok) {
-            // Render Head
-            let html = "<h6>First 5 Rows:</h6><div class='table-responsive'><table class='table table-sm table-striped table-bordered'><thead><tr>";
-            data.head.columns.forEach(col => html += `<th>${col}</th>`);
-            html += "</tr></thead><tbody>";
-            data.head.data.forEach(row => {
-                html += "<tr>";
-                row.forEach(cell => html += `<td>${cell}</td>`);
-                html += "</tr>";
-            });
-            html += "</tbody></table></div>";
+        // Render Head
+        let html = "<h6>First 5 Rows:</h6><div class='table-responsive'><table class='table table-sm table-striped table-bordered'><thead><tr>";
+        data.head.columns.forEach(col => html += `<th>${col}</th>`);
+        html += "</tr></thead><tbody>";
+        data.head.data.forEach(row => {
+            html += "<tr>";
+            row.forEach(cell => html += `<td>${cell}</td>`);
+            html += "</tr>";
+        });
+        html += "</tbody></table></div>";
 
-            // Render Info
-            html += "<h6 class='mt-3'>Dataset Info:</h6><ul>";
-            html += `<li>Shape: ${data.info.shape[0]} rows, ${data.info.shape[1]} columns</li>`;
-            html += "</ul>";
+        // Render Info
+        html += "<h6 class='mt-3'>Dataset Info:</h6><ul>";
+        html += `<li>Shape: ${data.info.shape[0]} rows, ${data.info.shape[1]} columns</li>`;
+        html += "</ul>";
 
-            resultDiv.innerHTML = html;
-            document.getElementById('vizSection').classList.remove('d-none');
-        } else {
-            resultDiv.innerHTML = `<span class="text-danger">Error: ${data.detail}</span>`;
-        }
+        resultDiv.innerHTML = html;
+        document.getElementById('vizSection').classList.remove('d-none');
     } catch (error) {
-        resultDiv.innerHTML = `<span class="text-danger">Connection Error: ${error.message}</span>`;
+        resultDiv.innerHTML = errorHtml(error);
     }
 });
 
@@ -71,7 +137,7 @@ document.getElementById('vizBtn').addEventListener('click', async () => {
     resultDiv.innerHTML = "Generating Plots...";
 
     try {
-        const response = await fetch(`${API_URL}/visualize`);
+        const response = await fetch(`${API_URL}/visualize?inline=false`);
         const data = await response.json();
 
         if (response.ok) {
@@ -82,7 +148,7 @@ document.getElementById('vizBtn').addEventListener('click', async () => {
                     <div class="card">
                         <div class="card-body text-center">
                             <h6>${plot.name}</h6>
-                            <img src="data:image/png;base64,${plot.image}" class="img-fluid">
+                            <img src="${plot.url ? API_URL + plot.url : 'data:image/png;base64,' + plot.image}" class="img-fluid">
                         </div>
                     </div>
                 </div>`;
@@ -102,26 +168,71 @@ document.getElementById('preprocessBtn').addEventListener('click', async () => {
     resultDiv.innerHTML = "Preprocessing...";
 
     try {
-        const response = await fetch(`${API_URL}/preprocess`, { method: 'POST' });
-        const data = await response.json();
+        const data = await streamEvents(`${API_URL}/preprocess`, { method: 'POST' }, (event, payload) => {
+            resultDiv.innerHTML = `<p class="text-muted">Preprocessing... ${progressText(payload)}</p>`;
+        });
 
-        if (response.ok) {
-            resultDiv.innerHTML = `
-                <div class="alert alert-success">
-                    ${data.message}<br>
-                    Initial Shape: ${data.initial_shape}<br>
-                    Final Shape: ${data.final_shape}<br>
-                    Saved as: ${data.processed_file}
-                </div>`;
-            document.getElementById('modelSection').classList.remove('d-none');
-        } else {
-            resultDiv.innerHTML = `<span class="text-danger">Error: ${data.detail}</span>`;
-        }
+        resultDiv.innerHTML = `
+            <div class="alert alert-success">
+                ${data.message}<br>
+                Initial Shape: ${data.initial_shape}<br>
+                Final Shape: ${data.final_shape}<br>
+                Saved as: ${data.processed_file}
+            </div>`;
+        document.getElementById('modelSection').classList.remove('d-none');
+        document.getElementById('clusterSection').classList.remove('d-none');
     } catch (error) {
-        resultDiv.innerHTML = `<span class="text-danger">Connection Error: ${error.message}</span>`;
+        resultDiv.innerHTML = errorHtml(error);
     }
 });
 
+document.getElementById('clusterBtn').addEventListener('click', async () => {
+    const resultDiv = document.getElementById('clusterResult');
+    const params = new URLSearchParams({
+        k: document.getElementById('clusterK').value,
+        method: document.getElementById('clusterMethod').value
+    });
+    resultDiv.innerHTML = "Clustering...";
+
+    try {
+        const data = await streamEvents(`${API_URL}/cluster?${params}`, {}, (event, payload) => {
+            resultDiv.innerHTML = `<p class="text-muted">Clustering... ${progressText(payload)}</p>`;
+        });
+
+        const converged = data.method === "kmeans"
+            ? `${data.convergence.length} epochs, ${data.converged ? "converged" : "not converged"}`
+            : `${data.subclusters} subclusters (threshold ${data.threshold})`;
+        const rows = data.clusters.map(c =>
+            `<tr><td>${c.cluster}</td><td>${c.size.toLocaleString()}</td><td>${(100 * c.fraction).toFixed(1)}%</td></tr>`).join("");
+        resultDiv.innerHTML = `
+            <p>${data.method} on ${data.rows.toLocaleString()} rows, ${data.columns.length} columns: ${converged}, ${data.seconds}s</p>
+            ${data.projection ? projectionSvg(data.projection) : ""}
+            <table class="table table-sm"><thead><tr><th>Cluster</th><th>Size</th><th>Share</th></tr></thead>
+            <tbody>${rows}</tbody></table>`;
+    } catch (error) {
+        resultDiv.innerHTML = errorHtml(error);
+    }
+});
+
+// Scatter of the sample's 2-D PCA projection, coloured by cluster; centroids as crosses
+function projectionSvg(projection, size = 400) {
+    const all = projection.points.concat(projection.centroids);
+    const xs = all.map(p => p[0]), ys = all.map(p => p[1]);
+    const [minX, maxX, minY, maxY] = [Math.min(...xs), Math.max(...xs), Math.min(...ys), Math.max(...ys)];
+    const sx = x => 10 + (size - 20) * (x - minX) / ((maxX - minX) || 1);
+    const sy = y => size - 10 - (size - 20) * (y - minY) / ((maxY - minY) || 1);
+    const colour = c => `hsl(${(c * 137) % 360}, 65%, 50%)`;
+    const points = projection.points.map(([x, y, c]) =>
+        `<circle cx="${sx(x).toFixed(1)}" cy="${sy(y).toFixed(1)}" r="2" fill="${colour(c)}" fill-opacity="0.6"/>`).join("");
+    const centroids = projection.centroids.map(([x, y], c) =>
+        `<text x="${sx(x).toFixed(1)}" y="${sy(y).toFixed(1)}" text-anchor="middle" dominant-baseline="central"
+              font-size="18" font-weight="bold" fill="${colour(c)}" stroke="black" stroke-width="0.5">&times;</text>`).join("");
+    const [v1, v2] = projection.explained_variance_ratio.map(v => (100 * v).toFixed(1));
+    return `
+        <h6>Sample projection (PC1 ${v1}%, PC2 ${v2}% of variance):</h6>
+        <svg width="${size}" height="${size}" class="border bg-white mb-3">${points}${centroids}</svg>`;
+}
+
 document.getElementById('modelBtn').addEventListener('click', async () => {
     const target = document.getElementById('targetColumn').value;
     if (!target) {
@@ -136,39 +247,90 @@ document.getElementById('modelBtn').addEventListener('click', async () => {
     resultDiv.innerHTML = "Generating Code & Training Model... (This may take a moment)";
     codeBlock.classList.add('d-none');
 
+    const importancesDiv = document.getElementById('importancesResult');
+    importancesDiv.innerHTML = "";
+
     const formData = new FormData();
     formData.append("target_column", target);
+    formData.append("importances", document.getElementById('importancesCheck').checked);
+    formData.append("mode", document.getElementById('modelMode').value);
+    formData.append("budget_seconds", document.getElementById('selectBudget').value);
 
     try {
-        const response = await fetch(`${API_URL}/model`, {
-            method: 'POST',
-            body: formData
+        const data = await streamEvents(`${API_URL}/model`, { method: 'POST', body: formData }, (event, payload) => {
+            resultDiv.innerHTML = `Generating Code & Training Model... <span class="text-muted">${progressText(payload)}</span>`;
         });
-        const data = await response.json();
 
-        if (response.ok) {
-            // Show Results
-            let metricsHtml = "<h6>Model Results:</h6><ul>";
-            for (const [key, value] of Object.entries(data.results)) {
-                metricsHtml += `<li><strong>${key}:</strong> ${value}</li>`;
-            }
-            metricsHtml += "</ul>";
+        if (data.error) {
+            resultDiv.innerHTML = `<span class="text-danger">${data.error}</span><pre class="small">${data.stderr}</pre>`;
+            return;
+        }
 
-            resultDiv.innerHTML = `
-                <div class="alert alert-success">
-                    ${data.message}
-                </div>
-                ${metricsHtml}
-            `;
+        // Show Results
+        let metricsHtml = "<h6>Model Results:</h6><ul>";
+        for (const [key, value] of Object.entries(data.results)) {
+            if (key === 'selection') continue;
+            const shown = typeof value === 'object' ? JSON.stringify(value) : value;
+            metricsHtml += `<li><strong>${key}:</strong> ${shown}</li>`;
+        }
+        metricsHtml += "</ul>";
+        if (data.results.selection) metricsHtml += leaderboardHtml(data.results.selection);
 
-            // Show Code
-            generatedCode.textContent = data.code_preview;
-            codeBlock.classList.remove('d-none');
+        resultDiv.innerHTML = `
+            <div class="alert alert-success">
+                ${data.message}
+            </div>
+            ${metricsHtml}
+        `;
 
-        } else {
-            resultDiv.innerHTML = `<span class="text-danger">Error: ${data.detail}</span>`;
-        }
+        // Show Code
+        generatedCode.textContent = data.code_preview;
+        codeBlock.classList.remove('d-none');
+
+        if (data.importances) pollImportances(data.importances.url, importancesDiv);
     } catch (error) {
-        resultDiv.innerHTML = `<span class="text-danger">Connection Error: ${error.message}</span>`;
+        resultDiv.innerHTML = errorHtml(error);
     }
 });
+
+function leaderboardHtml(selection) {
+    const rows = selection.leaderboard.map(e => `
+        <tr><td>${e.model}</td><td>${e.rung ?? ""}</td><td>${e.rows}</td><td>${e.score ?? ""}</td>
+        <td>${e.fit_seconds ?? ""}</td><td>${e.predict_seconds ?? ""}</td></tr>`).join("");
+    const stopped = selection.stopped_early ? ` (stopped early: ${selection.stopped_early})` : "";
+    const halving = selection.halving === false ? " (too few rows for halving: every model compared on all rows)" : "";
+    return `
+        <h6>Leaderboard (${selection.scoring} on ${selection.validation_rows} validation rows,
+            ${selection.elapsed_seconds}s of ${selection.budget_seconds}s${stopped}${halving}):</h6>
+        <table class="table table-sm">
+            <thead><tr><th>Model</th><th>Rung</th><th>Rows</th><th>Score</th><th>Fit s</th><th>Predict s</th></tr></thead>
+            <tbody>${rows}</tbody>
+        </table>`;
+}
+
+// Permutation importances are computed after /model returns; poll until ready
+async function pollImportances(url, div) {
+    try {
+        while (true) {
+            const response = await fetch(`${API_URL}${url}`);
+            const data = await response.json();
+            if (!response.ok) throw new ApiError(data.detail);
+            if (data.status === "failed") throw new ApiError(data.error);
+            if (data.status === "done") {
+                // Features the time budget left unscored have mean/std null
+                let rows = data.features.map(f => f.mean === null
+                    ? `<tr><td>${f.feature}</td><td colspan="2" class="text-muted">not scored (time budget)</td></tr>`
+                    : `<tr><td>${f.feature}</td><td>${f.mean.toFixed(4)}</td><td>${f.std.toFixed(4)}</td></tr>`).join("");
+                div.innerHTML = `
+                    <h6>Permutation Importances (${data.scoring} drop, ${data.repeats_done} repeats on ${data.eval_rows} rows):</h6>
+                    <table class="table table-sm"><thead><tr><th>Feature</th><th>Mean</th><th>Std</th></tr></thead>
+                    <tbody>${rows}</tbody></table>`;
+                return;
+            }
+            div.innerHTML = `<span class="text-muted">Permutation importances ${data.status}...</span>`;
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    } catch (error) {
+        div.innerHTML = errorHtml(error);
+    }
+}
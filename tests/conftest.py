@@ -0,0 +1,25 @@
+"""
+Shared fixtures. The modules under test are top-level scripts of the repo, so
+the repo root goes on sys.path. Run from the repo root with ``python -m pytest``.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def numeric_csv(tmp_path):
+    """Small all-numeric CSV with two well separated groups of rows."""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    rows = 300
+    centre = np.repeat([[0.0, 0.0, 0.0], [10.0, 10.0, 10.0]], rows // 2, axis=0)
+    df = pd.DataFrame(centre + rng.normal(size=(rows, 3)), columns=["a", "b", "c"])
+    df["d"] = rng.integers(0, 5, size=rows)
+    path = tmp_path / "numeric.csv"
+    df.to_csv(path, index=False)
+    return path
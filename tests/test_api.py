@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+fastapi = pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+from upload_store import UploadStore  # noqa: E402
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(api, "STORE", UploadStore(str(tmp_path / "blobs")))
+    monkeypatch.setattr(api, "RESULTS", ResultCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(api, "CURRENT_FILE", None)
+    return TestClient(api.app)
+
+
+@pytest.fixture
+def uploaded(client, numeric_csv):
+    with open(numeric_csv, "rb") as f:
+        response = client.post("/upload", files={"file": ("numeric.csv", f, "text/csv")})
+    assert response.status_code == 200
+    return client
+
+
+def events(response):
+    frames = [f for f in response.text.split("\n\n") if f]
+    return [(f.split("\n")[0][len("event: "):], json.loads(f.split("\n")[1][len("data: "):])) for f in frames]
+
+
+@pytest.mark.parametrize("path", ["/analyze", "/cluster"])
+def test_requires_an_upload(client, path):
+    assert client.get(path).status_code == 400
+
+
+def test_analyze_describes_and_caches(uploaded):
+    first = uploaded.get("/analyze")
+    assert first.status_code == 200 and first.headers["x-cache"] == "miss"
+    body = first.json()
+    assert body["info"]["shape"] == [300, 4]
+    assert set(body["description"]) == {"a", "b", "c", "d"}
+    second = uploaded.get("/analyze")
+    assert second.headers["x-cache"] == "hit" and second.json() == body
+
+
+def test_analyze_pages_columns(uploaded):
+    body = uploaded.get("/analyze", params={"offset": 1, "limit": 2}).json()
+    assert body["info"]["columns"] == ["b", "c"]
+    assert body["page"]["next_offset"] == 3
+
+
+def test_analyze_stream_ends_with_the_result(uploaded):
+    response = uploaded.get("/analyze", params={"stream": 1}, headers={"Cache-Control": "no-cache"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    stream = events(response)
+    assert stream[-1][0] == "result"
+    assert stream[-1][1] == uploaded.get("/analyze").json()
+
+
+@pytest.mark.parametrize("method", ["kmeans", "birch"])
+def test_cluster_finds_the_two_groups(uploaded, method):
+    response = uploaded.get("/cluster", params={"k": 2, "method": method, "columns": "a,b,c"})
+    assert response.status_code == 200
+    clusters = response.json()["clusters"]
+    assert sorted(c["size"] for c in clusters) == [150, 150]
+
+
+def test_cluster_stream_reports_progress(uploaded):
+    stream = events(uploaded.get("/cluster", params={"k": 2, "stream": 1}))
+    assert stream[0][0] == "progress" and stream[-1][0] == "result"
+
+
+def test_cluster_rejects_unknown_columns(uploaded):
+    assert uploaded.get("/cluster", params={"columns": "nope"}).status_code == 400
@@ -0,0 +1,55 @@
+import io
+import os
+import time
+
+from result_cache import ResultCache
+from upload_store import UploadStore
+
+
+def test_result_cache_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    key = ResultCache.key("digest", "analyze", {"offset": 0})
+    assert key == ResultCache.key("digest", "analyze", {"offset": 0})
+    assert key != ResultCache.key("digest", "analyze", {"offset": 1})
+    assert cache.get(key) is None
+    cache.put(key, b"body")
+    assert cache.get(key) == b"body"
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=3000)
+    keys = [ResultCache.key("digest", "op", {"i": i}) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, b"x" * 1000)
+        os.utime(cache._path(key), (time.time() - 100 + i, time.time() - 100 + i))
+    cache.get(keys[0])  # a hit makes the oldest entry the most recently used
+    cache.put(ResultCache.key("digest", "op", {"i": 3}), b"x" * 1000)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == b"x" * 1000
+    assert cache.stats()["bytes"] <= 3000
+
+
+def test_result_cache_skips_values_larger_than_the_limit(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10)
+    cache.put("key", b"x" * 11)
+    assert cache.get("key") is None
+
+
+def test_upload_store_keeps_identical_content_once(tmp_path):
+    store = UploadStore(str(tmp_path))
+    digest, path, existed = store.put_stream(io.BytesIO(b"a,b\n1,2\n"), "first.csv")
+    again, same_path, existed_again = store.put_stream(io.BytesIO(b"a,b\n1,2\n"), "second.CSV")
+    assert (again, same_path) == (digest, path)
+    assert (existed, existed_again) == (False, True)
+    assert store.digest(path) == digest
+    assert [n for n in os.listdir(str(tmp_path)) if n.startswith(".")] == []  # no temp files left
+
+
+def test_upload_store_put_file_moves_derived_output(tmp_path):
+    store = UploadStore(str(tmp_path))
+    tmp = store.temp_path()
+    with open(tmp, "wb") as f:
+        f.write(b"a\n1\n")
+    digest, path, existed = store.put_file(tmp)
+    assert not os.path.exists(tmp) and os.path.exists(path) and not existed
+    assert digest == store.put_stream(io.BytesIO(b"a\n1\n"))[0]
@@ -0,0 +1,44 @@
+import pytest
+
+import model_registry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return str(tmp_path / "models")
+
+
+def test_publish_promotes_new_versions(registry):
+    assert model_registry.publish({"name": "first"}, registry_dir=registry) == "v0001"
+    assert model_registry.publish({"name": "second"}, registry_dir=registry) == "v0002"
+    assert model_registry.list_versions(registry) == ["v0001", "v0002"]
+    assert model_registry.current_version(registry) == "v0002"
+
+
+def test_rollback_walks_back_through_served_versions(registry):
+    for name in ("first", "second", "third"):
+        model_registry.publish({"name": name}, registry_dir=registry)
+    assert model_registry.rollback(registry) == "v0002"
+    assert model_registry.rollback(registry) == "v0001"
+    with pytest.raises(ValueError):
+        model_registry.rollback(registry)
+    assert model_registry.current_version(registry) == "v0001"
+
+
+def test_rollback_after_manual_promotion(registry):
+    for name in ("first", "second", "third"):
+        model_registry.publish({"name": name}, registry_dir=registry, make_current=False)
+    model_registry.promote("v0001", registry)
+    model_registry.promote("v0003", registry)
+    # v0002 was never served, so it is not a rollback target
+    assert model_registry.rollback(registry) == "v0001"
+
+
+def test_holder_swaps_to_the_rolled_back_version(registry):
+    model_registry.publish({"name": "first"}, registry_dir=registry)
+    model_registry.publish({"name": "second"}, registry_dir=registry)
+    holder = model_registry.ModelHolder(registry_dir=registry, poll_seconds=0)
+    assert holder.load() == {"name": "second"}
+    model_registry.rollback(registry)
+    assert holder.refresh()
+    assert holder.get() == ("v0001", {"name": "first"})
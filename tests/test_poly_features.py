@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import PolynomialFeatures
+
+from poly_features import PolynomialStage, terms
+
+
+@pytest.mark.parametrize("degree, interaction_only", [(1, False), (2, False), (3, False), (3, True)])
+def test_transform_matches_polynomial_features(degree, interaction_only):
+    X = np.random.default_rng(0).normal(size=(50, 4))
+    expected = PolynomialFeatures(degree, interaction_only=interaction_only, include_bias=False).fit_transform(X)
+    stage = PolynomialStage(terms(4, degree, interaction_only))
+    np.testing.assert_allclose(stage.transform(X), expected)
+
+
+def test_transform_keeps_only_selected_terms():
+    X = np.random.default_rng(1).normal(size=(20, 3))
+    selected = [(2, 0), (1,), (0, 0, 2)]
+    full = PolynomialFeatures(3, include_bias=False).fit(X)
+    columns = [list(full.powers_.tolist()).index(p) for p in ([1, 0, 1], [0, 1, 0], [2, 0, 1])]
+    stage = PolynomialStage(selected)
+    # Terms come out shortest first: x1, x0*x2, x0^2*x2
+    np.testing.assert_allclose(stage.transform(X), full.transform(X)[:, [columns[1], columns[0], columns[2]]])
+
+
+def test_sparse_input_gives_the_same_values():
+    X = sparse.random(30, 5, density=0.3, format="csr", random_state=0)
+    stage = PolynomialStage(terms(5, 2))
+    out = stage.transform(X)
+    assert sparse.issparse(out)
+    np.testing.assert_allclose(out.toarray(), PolynomialFeatures(2, include_bias=False).fit_transform(X.toarray()))
+
+
+def test_stage_works_in_a_pipeline():
+    X = np.random.default_rng(2).normal(size=(100, 2))
+    y = 1 + X[:, 0] * X[:, 1]
+    model = make_pipeline(PolynomialStage(terms(2, 2)), LinearRegression()).fit(X, y)
+    assert model.score(X, y) == pytest.approx(1.0)
+    assert list(model[0].get_feature_names_out(["u", "v"])) == ["u", "v", "u^2", "u v", "v^2"]
@@ -0,0 +1,35 @@
+import json
+
+import progress
+
+
+def parse(stream):
+    """[(event, data)] from a text/event-stream body."""
+    events = []
+    for frame in stream.split("\n\n"):
+        if not frame:
+            continue
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_sse_frames_one_event():
+    frame = progress.sse("progress", {"stage": "csv_parse", "status": "started"})
+    assert frame.endswith("\n\n") and frame.count("\n") == 3
+    assert parse(frame) == [("progress", {"stage": "csv_parse", "status": "started"})]
+
+
+def test_sse_data_stays_on_one_line():
+    frame = progress.sse("result", {"text": "two\nlines", "value": float("nan")})
+    assert parse(frame) == [("result", {"text": "two\nlines", "value": None})]
+
+
+def test_sse_raw_and_stage():
+    body = progress.sse_raw("result", b'{"a":1}') + progress.stage("fit", "finished", rows=3)
+    assert parse(body) == [("result", {"a": 1}), ("progress", {"stage": "fit", "status": "finished", "rows": 3})]
+
+
+def test_strip_progress_keeps_other_stderr():
+    stderr = 'warning\nPROGRESS {"stage": "fit"}\nTraceback\n'
+    assert progress.strip_progress(stderr) == "warning\nTraceback\n"
@@ -0,0 +1,83 @@
+"""
+Content-addressed storage for uploaded and derived datasets.
+
+Files are stored as ``<root>/<sha256[:2]>/<sha256><ext>``: the same bytes are
+kept once however often (and under whatever name) they are uploaded, and the
+digest doubles as the dataset's identity for result memoization
+(see result_cache.py).
+
+Writes stream into a temporary file in the store while hashing, then
+``os.replace`` it into place, so a reader never sees a partial file and
+concurrent uploads of the same content are harmless.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+BLOCK_SIZE = 1 << 20
+DIGEST_NAME = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]+)?$")
+
+
+class UploadStore:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._digests = {}  # (path, size, mtime) -> digest, for files outside the store
+
+    def path_for(self, digest, ext=".csv"):
+        return os.path.join(self.root, digest[:2], digest + ext)
+
+    def _commit(self, tmp_path, digest, ext):
+        """Move a fully written temp file into place; returns (path, already_stored)."""
+        path = self.path_for(digest, ext)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return path, True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return path, False
+
+    def put_stream(self, stream, filename="upload.csv"):
+        """Store a binary file object; returns (digest, path, already_stored)."""
+        ext = os.path.splitext(filename)[1].lower() or ".csv"
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for block in iter(lambda: stream.read(BLOCK_SIZE), b""):
+                    digest.update(block)
+                    out.write(block)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        path, existed = self._commit(tmp_path, digest.hexdigest(), ext)
+        return digest.hexdigest(), path, existed
+
+    def put_file(self, src_path):
+        """Move an existing file (e.g. a freshly written processed CSV) into the store."""
+        digest = self.digest(src_path)
+        ext = os.path.splitext(src_path)[1].lower() or ".csv"
+        path, existed = self._commit(src_path, digest, ext)
+        return digest, path, existed
+
+    def temp_path(self, suffix=".csv"):
+        """A fresh path inside the store's directory, for output to be passed to ``put_file``."""
+        fd, path = tempfile.mkstemp(dir=self.root, prefix=".derived-", suffix=suffix)
+        os.close(fd)
+        return path
+
+    def digest(self, path):
+        """sha256 of ``path``; free for stored files (it is their name)."""
+        m = DIGEST_NAME.match(os.path.basename(path))
+        if m and os.path.dirname(os.path.abspath(path)).startswith(os.path.abspath(self.root)):
+            return m.group(1)
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._digests:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                    h.update(block)
+            self._digests[key] = h.hexdigest()
+        return self._digests[key]
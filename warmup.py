@@ -0,0 +1,78 @@
+"""
+Deferred initialisation helpers shared by api.py and web_app.py.
+
+Heavy dependencies (pandas, matplotlib, sklearn, the pickled model) are not
+imported at module load. A ``WarmUp`` runs the expensive steps in a
+background thread after the server starts accepting connections; the
+readiness endpoint reports 503 until every step has finished, so the
+autoscaler only routes traffic to warm workers. Request handlers that need a
+dependency before warm-up finishes simply import it themselves (imports are
+serialised by Python's import lock, so nothing is loaded twice).
+"""
+import os
+import threading
+import time
+
+# Process start as seen by this module; close enough to interpreter start
+PROCESS_START = time.perf_counter()
+
+
+class WarmUp:
+    """Run named initialisation steps once, in order, on a daemon thread."""
+
+    def __init__(self, steps):
+        self.steps = list(steps)    # [(name, callable), ...]
+        self.timings = {}
+        self.error = None
+        self.ready = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+        if os.environ.get("WARMUP", "1") == "0":
+            # Pure lazy mode: nothing is preloaded, the worker is ready at once
+            self.ready.set()
+            return self
+        threading.Thread(target=self._run, name="warmup", daemon=True).start()
+        return self
+
+    def run(self):
+        """Run the steps now, in the calling thread (e.g. in a prefork parent)."""
+        with self._lock:
+            self._started = True
+        self._run()
+        return self
+
+    def _run(self):
+        try:
+            for name, step in self.steps:
+                start = time.perf_counter()
+                step()
+                self.timings[name] = time.perf_counter() - start
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.ready.set()
+
+    def wait(self, timeout=None):
+        return self.ready.wait(timeout)
+
+    def status(self):
+        return {
+            "ready": self.ready.is_set() and self.error is None,
+            "warming_up": self._started and not self.ready.is_set(),
+            "error": self.error,
+            "steps": {name: round(sec, 4) for name, sec in self.timings.items()},
+            "seconds_since_start": round(time.perf_counter() - PROCESS_START, 3),
+        }
+
+
+def import_module(name):
+    """Step factory: import a module (and keep it in sys.modules)."""
+    def step():
+        __import__(name)
+    return step
@@ -1,66 +1,183 @@
-import gradio as gr
-import joblib
-import pandas as pd
-import numpy as np
-import os
+from model_registry import ModelHolder
+from prediction_cache import PredictionCache, normalize
+from warmup import WarmUp
 
 # Load model
+# The served model comes from the registry in models/ (CURRENT version), or the
+# legacy single pickle while the registry is empty. The pickle pulls in sklearn's
+# ensemble/SVM/neighbors modules, so it is loaded by a background warm-up after
+# the server is up (or on the first prediction). New versions published by
+# train_and_save_model.py are loaded, warmed and swapped in without a restart.
 model_path = "titanic_voting_model.pkl"
-if not os.path.exists(model_path):
-    print(f"Warning: {model_path} not found. Please ensure the model is trained.")
-    model = None
-else:
-    model = joblib.load(model_path)
+
+
+def _warm_model(model):
+    # One prediction so lazy imports and first-call allocations happen before traffic
+    _predict(model, 3, 'male', 25, 0, 0, 7.25, 'S')
+
+
+HOLDER = ModelHolder(fallback_path=model_path, warm=_warm_model)
+# Repeated queries are answered from here; emptied when HOLDER swaps models
+CACHE = PredictionCache()
+
+
+def load_model():
+    model = HOLDER.load()
+    if model is None:
+        print(f"Warning: no model in {HOLDER.registry_dir} and {model_path} not found. Please ensure the model is trained.")
+    return model
+
+
+def get_model():
+    return get_versioned_model()[1]
+
+
+def get_versioned_model():
+    version, model = HOLDER.get()
+    if model is None:
+        load_model()
+        version, model = HOLDER.get()
+    return version, model
+
+
+WARMUP = WarmUp([
+    ("pandas", lambda: __import__("pandas")),
+    ("load_model", load_model),
+])
+
+
+def _predict(model, pclass, sex, age, sibsp, parch, fare, embarked):
+    """Return (prediction, P(survived)) for one passenger."""
+    import pandas as pd
+    # Create DataFrame with correct column names and types
+    data = pd.DataFrame({
+        'Pclass': [int(pclass)],
+        'Sex': [sex],
+        'Age': [float(age)],
+        'SibSp': [int(sibsp)],
+        'Parch': [int(parch)],
+        'Fare': [float(fare)],
+        'Embarked': [embarked]
+    })
+
+    # Soft voting classifier supports predict_proba; its predict() is the argmax
+    # of the same probabilities, so one ensemble pass gives both
+    probs = model.predict_proba(data)[0]
+    prediction = model.classes_[probs.argmax()]
+    return prediction, probs[1]
+
+
+def predict_passenger(version, model, pclass, sex, age, sibsp, parch, fare, embarked):
+    """(prediction, P(survived)) through the prediction cache."""
+    features = normalize(pclass, sex, age, sibsp, parch, fare, embarked)
+    result = CACHE.get(version, features)
+    if result is None:
+        result = _predict(model, *features)
+        CACHE.put(version, features, result)
+    return result
+
 
 def predict_survival(pclass, sex, age, sibsp, parch, fare, embarked):
+    try:
+        version, model = get_versioned_model()
+    except Exception as e:
+        return f"Model load error: {str(e)}"
     if model is None:
         return "Model not loaded. Please train the model first."
-    
-    # Create DataFrame with correct column names and types
+
     try:
-        data = pd.DataFrame({
-            'Pclass': [int(pclass)],
-            'Sex': [sex],
-            'Age': [float(age)],
-            'SibSp': [int(sibsp)],
-            'Parch': [int(parch)],
-            'Fare': [float(fare)],
-            'Embarked': [embarked]
-        })
-        
-        # Predict
-        prediction = model.predict(data)[0]
-        # Soft voting classifier supports predict_proba
-        probs = model.predict_proba(data)[0]
-        prob_survived = probs[1]
-        
+        prediction, prob_survived = predict_passenger(version, model, pclass, sex, age, sibsp, parch, fare, embarked)
+
         if prediction == 1:
             return f"Survived (Probability: {prob_survived:.2%})"
         else:
             return f"Did Not Survive (Probability: {1-prob_survived:.2%})"
-            
+
     except Exception as e:
         return f"Prediction Error: {str(e)}"
 
-# Interface
-demo = gr.Interface(
-    fn=predict_survival,
-    inputs=[
-        gr.Dropdown(choices=[1, 2, 3], label="Pclass (Ticket Class)", value=3),
-        gr.Radio(choices=['male', 'female'], label="Sex", value='male'),
-        gr.Number(label="Age", value=25),
-        gr.Number(label="SibSp (Siblings/Spouses)", value=0),
-        gr.Number(label="Parch (Parents/Children)", value=0),
-        gr.Number(label="Fare", value=7.25),
-        gr.Radio(choices=['S', 'C', 'Q'], label="Embarked", value='S')
-    ],
-    outputs="text",
-    title="Titanic Survivor Prediction Service",
-    description="Predict whether a passenger would survive the Titanic disaster based on their details."
-)
+def build_demo():
+    """The Gradio interface; gradio is imported here so /predict-only users never pay for it."""
+    import gradio as gr
+    return gr.Interface(
+        fn=predict_survival,
+        inputs=[
+            gr.Dropdown(choices=[1, 2, 3], label="Pclass (Ticket Class)", value=3),
+            gr.Radio(choices=['male', 'female'], label="Sex", value='male'),
+            gr.Number(label="Age", value=25),
+            gr.Number(label="SibSp (Siblings/Spouses)", value=0),
+            gr.Number(label="Parch (Parents/Children)", value=0),
+            gr.Number(label="Fare", value=7.25),
+            gr.Radio(choices=['S', 'C', 'Q'], label="Embarked", value='S')
+        ],
+        outputs="text",
+        title="Titanic Survivor Prediction Service",
+        description="Predict whether a passenger would survive the Titanic disaster based on their details."
+    )
+
+
+def create_app(extra_routes=None):
+    """FastAPI app serving the Gradio UI at / plus /predict and the /ready and /startup probes.
+
+    ``extra_routes(app)`` may register more routes; they must be added before
+    Gradio is mounted at / (the mount matches every path).
+    """
+    import gradio as gr
+    from fastapi import FastAPI, HTTPException
+    from fastapi.responses import JSONResponse, PlainTextResponse
+    from pydantic import BaseModel
+    import metrics
+
+    app = FastAPI()
+
+    class Passenger(BaseModel):
+        Pclass: int
+        Sex: str
+        Age: float
+        SibSp: int = 0
+        Parch: int = 0
+        Fare: float
+        Embarked: str = 'S'
+
+    @app.post("/predict")
+    def predict(passenger: Passenger):
+        version, model = get_versioned_model()
+        if model is None:
+            raise HTTPException(status_code=503, detail="Model not loaded")
+        prediction, prob_survived = predict_passenger(
+            version, model, passenger.Pclass, passenger.Sex, passenger.Age, passenger.SibSp,
+            passenger.Parch, passenger.Fare, passenger.Embarked)
+        return {"survived": int(prediction), "probability": float(prob_survived), "model_version": version}
+
+    @app.get("/ready")
+    async def ready():
+        status = WARMUP.status()
+        return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+    @app.get("/startup")
+    async def startup_report():
+        return WARMUP.status()
+
+    @app.get("/model_version")
+    async def model_version():
+        return {**HOLDER.status(), "prediction_cache": CACHE.stats()}
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    if extra_routes is not None:
+        extra_routes(app)
+
+    return gr.mount_gradio_app(app, build_demo(), path="/")
+
 
 if __name__ == "__main__":
-    demo.launch(server_name="127.0.0.1", server_port=7860)
-    #demo.launch(server_name="0.0.0.0", server_port=7860)
+    import uvicorn
+    WARMUP.start()
+    HOLDER.start_watching()
+    uvicorn.run(create_app(), host="127.0.0.1", port=7860)
+    #uvicorn.run(create_app(), host="0.0.0.0", port=7860)
+
 
 